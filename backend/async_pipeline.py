@@ -0,0 +1,297 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+非同期ステージパイプライン
+CSV読み込み → Excel転記 → 保存 →（任意）PDF変換 →（任意）ZIP書き込み を段ごとのワーカーで重ねて実行する
+
+各段は上限付きキューでつながり、下流が詰まると上流が待つ（バックプレッシャー）ため
+同時に保持するワークブック数はキューサイズで頭打ちになる。
+重い処理はすべて executor 上で実行し、イベントループは段間の受け渡しだけを担う。
+PDF段は変換エンジン（Excel等）をパイプライン全体で1回だけ起動し、保存できたワークブックを順に渡す。
+"""
+
+import asyncio
+import queue
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Dict, Any, Iterator, List, Optional, Callable, Tuple
+
+from cancellation import CancellationToken, is_cancelled
+from excel_processor import TemplateCache, default_template_cache
+from jobs import (
+    JobContext,
+    JobError,
+    normalize_context,
+    parse_stage,
+    fill_stage,
+    save_stage,
+    notify_progress,
+    cancelled_result,
+)
+from summary import SummaryCollector
+from pdf_converter import PDFConverter
+from progress import ProgressCallback
+from zip_export import ZipExporter
+
+# 段の終端を示す番兵
+_END = object()
+
+
+class PdfSession:
+    """
+    PDF段の変換セッション
+
+    専用スレッドで PDFConverter.convert_to_pdf を1回だけ実行し、変換対象をイテレータで逐次渡す。
+    エンジンの確認・起動・終了は1回だけで（Windows の COM も同じスレッドで扱う）、
+    各ワークブックの結果は変換ループの item 通知で受け取る。
+
+    使用例:
+        session = PdfSession(converter, pdf_output_folder)
+        result = session.convert(result)   # PDF段のワーカーから1件ずつ
+        session.close()
+    """
+
+    def __init__(self, converter: PDFConverter, output_folder: str,
+                 cancel_token: Optional[CancellationToken] = None):
+        self._inbox: 'queue.SimpleQueue[Any]' = queue.SimpleQueue()
+        self._pending: Dict[str, List[Future]] = {}
+        self._lock = threading.Lock()
+        self._error: Optional[str] = None  # 変換が終了した後のエラー（以降の件はすべて失敗にする）
+        self._thread = threading.Thread(target=self._run, args=(converter, output_folder, cancel_token),
+                                        name='kinten-pdf-session', daemon=True)
+        self._thread.start()
+
+    def _paths(self) -> Iterator[str]:
+        while True:
+            path = self._inbox.get()
+            if path is _END:
+                return
+            yield path
+
+    def _on_progress(self, event: str, payload: Dict[str, Any]) -> None:
+        if event != 'item':
+            return
+        path = payload.get('excel_file') or payload.get('file')
+        with self._lock:
+            futures = self._pending.get(path) or []
+            future = futures.pop(0) if futures else None
+            if not futures:
+                self._pending.pop(path, None)
+        if future is None:
+            return
+        if payload.get('status') == 'converted':
+            future.set_result({'pdf_file': payload.get('pdf_file'), 'pdf_engine': payload.get('engine', ''),
+                               'pdf_elapsed_seconds': payload.get('elapsed_seconds')})
+        else:
+            future.set_result({'pdf_error': payload.get('error') or 'PDF変換エラー'})
+
+    def _run(self, converter: PDFConverter, output_folder: str,
+             cancel_token: Optional[CancellationToken]) -> None:
+        try:
+            pdf_result = converter.convert_to_pdf(self._paths(), output_folder,
+                                                  progress_callback=self._on_progress, cancel_token=cancel_token)
+            batch_errors = [f.get('error') for f in pdf_result.get('failed_files') or [] if f.get('file') == '(batch)']
+            error = batch_errors[0] if batch_errors else pdf_result.get('error') or 'PDF変換が終了しました'
+        except Exception as e:
+            error = f"PDF変換エラー: {str(e)}"
+        # エンジンの起動失敗・中断で変換が終わった場合、待っている件と以降の件は失敗にする
+        with self._lock:
+            self._error = error
+            pending = [future for futures in self._pending.values() for future in futures]
+            self._pending.clear()
+        for future in pending:
+            future.set_result({'pdf_error': error})
+
+    def convert(self, result: Dict[str, Any]) -> Dict[str, Any]:
+        """保存済みワークブックを変換し、結果に pdf_file / pdf_error を付加（変換が終わるまで待つ）"""
+        path = result['output_path']
+        future: Future = Future()
+        with self._lock:
+            if self._error is not None:
+                return dict(result, pdf_error=self._error)
+            self._pending.setdefault(path, []).append(future)
+        self._inbox.put(path)
+        return dict(result, **future.result())
+
+    def close(self) -> None:
+        """変換対象の終わりを伝え、エンジンの終了を待つ"""
+        self._inbox.put(_END)
+        self._thread.join()
+
+
+class AsyncPipeline:
+    """段ごとのワーカーと上限付きキューで構成するバッチパイプライン"""
+
+    def __init__(self,
+                 template_cache: Optional[TemplateCache] = None,
+                 pdf_converter: Optional[PDFConverter] = None,
+                 workers: int = 2,
+                 queue_size: int = 4):
+        self.template_cache = template_cache or default_template_cache
+        self.pdf_converter = pdf_converter
+        self.workers = max(1, int(workers))
+        self.queue_size = max(1, int(queue_size))
+
+    async def run(self,
+                  contexts: List[JobContext],
+                  pdf_output_folder: Optional[str] = None,
+                  progress_callback: Optional[ProgressCallback] = None,
+                  cancel_token: Optional[CancellationToken] = None,
+                  summary: Optional[SummaryCollector] = None,
+                  exporter: Optional[ZipExporter] = None) -> Dict[str, Any]:
+        """
+        パイプラインを実行
+
+        Args:
+            contexts: ジョブコンテキストのリスト
+            pdf_output_folder: 指定時は保存済みワークブックをPDF変換する出力先
+            progress_callback: 1件ごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）。中断後に取り出された件は処理しない
+            summary: 部署別集計のコレクター（任意）。保存できた件を加える
+            exporter: 引き渡し用ZIP（任意）。最終段で出力を順に書き込む（close は呼び出し側）
+
+        Returns:
+            結果辞書（KintenProcessor.process_batch と同じ形式 + stage_seconds）
+        """
+        loop = asyncio.get_running_loop()
+        total = len(contexts)
+        processed: Dict[int, Dict[str, Any]] = {}
+        failed: Dict[int, Dict[str, Any]] = {}
+        stage_seconds: Dict[str, float] = {}
+        stage_lock = threading.Lock()
+        started = time.perf_counter()
+
+        def _finish(position: int, result: Dict[str, Any]) -> None:
+            done = len(processed) + len(failed) + 1
+            if result.get('success'):
+                processed[position] = result
+                notify_progress(progress_callback, 'item', dict(result, status='processed', index=done, total=total))
+            else:
+                failed[position] = {'file': contexts[position].csv_path, 'error': result.get('error', '')}
+                if 'validation' in result:
+                    failed[position]['validation'] = result['validation']
+                notify_progress(progress_callback, 'item', dict(failed[position], status='failed', index=done, total=total))
+            notify_progress(progress_callback, 'progress', {'done': done, 'total': total})
+
+        def _timed(name: str, func: Callable[[Any], Any]) -> Callable[[Any], Any]:
+            def wrapper(payload: Any) -> Any:
+                t0 = time.perf_counter()
+                try:
+                    return func(payload)
+                finally:
+                    # 各段の累積処理時間（段が重なるため合計は経過時間を超えうる）
+                    with stage_lock:
+                        stage_seconds[name] = stage_seconds.get(name, 0.0) + (time.perf_counter() - t0)
+            return wrapper
+
+        stages: List[Tuple[str, Callable[[Any], Any], int]] = [
+            ('parse', _timed('parse', lambda ctx: (ctx, parse_stage(ctx))), self.workers),
+            ('fill', _timed('fill', lambda item: fill_stage(item[0], item[1], self.template_cache)), self.workers),
+            ('save', _timed('save', lambda filled: save_stage(filled, summary)), self.workers),
+        ]
+        session: Optional[PdfSession] = None
+        if pdf_output_folder:
+            session = PdfSession(self.pdf_converter or PDFConverter(), pdf_output_folder, cancel_token)
+            # Excel(COM/AppleScript)は並列に扱えないためPDF段は1ワーカー（エンジンはセッションで1回だけ起動）
+            stages.append(('pdf', _timed('pdf', session.convert), 1))
+        if exporter is not None:
+            # ZIPへの書き込みは1本の出力ストリームのため1ワーカー
+            stages.append(('export', _timed('export', lambda result: self._export(exporter, result)), 1))
+
+        queues = [asyncio.Queue(maxsize=self.queue_size) for _ in stages]
+        executor = ThreadPoolExecutor(max_workers=sum(w for _, _, w in stages))
+
+        async def _worker(index: int) -> None:
+            name, func, _ = stages[index]
+            in_q = queues[index]
+            out_q = queues[index + 1] if index + 1 < len(queues) else None
+            while True:
+                item = await in_q.get()
+                if item is _END:
+                    return
+                position, payload = item
+                if is_cancelled(cancel_token):
+                    # 中断後は処理せず読み捨てる（上流が詰まらないよう消費は続ける）
+                    continue
+                try:
+                    value = await loop.run_in_executor(executor, func, payload)
+                except JobError as e:
+                    _finish(position, e.to_result())
+                    continue
+                except Exception as e:
+                    _finish(position, {'success': False, 'error': f"処理エラー({name}): {str(e)}"})
+                    continue
+                if out_q is not None:
+                    await out_q.put((position, value))
+                else:
+                    _finish(position, value)
+
+        async def _stage(index: int) -> None:
+            await asyncio.gather(*(_worker(index) for _ in range(stages[index][2])))
+            if index + 1 < len(stages):
+                for _ in range(stages[index + 1][2]):
+                    await queues[index + 1].put(_END)
+
+        async def _feed() -> None:
+            for position, ctx in enumerate(contexts):
+                if is_cancelled(cancel_token):
+                    break
+                await queues[0].put((position, normalize_context(ctx)))
+            for _ in range(stages[0][2]):
+                await queues[0].put(_END)
+
+        try:
+            await asyncio.gather(_feed(), *(_stage(i) for i in range(len(stages))))
+        finally:
+            executor.shutdown(wait=True)
+            if session is not None:
+                session.close()
+
+        processed_files = [processed[i] for i in sorted(processed)]
+        failed_files = [failed[i] for i in sorted(failed)]
+        batch_result: Dict[str, Any] = {
+            'success': len(processed_files) > 0 or total == 0,
+            'processed_files': processed_files,
+            'failed_files': failed_files,
+            'total_processed': len(processed_files),
+            'total_failed': len(failed_files),
+            'elapsed_seconds': round(time.perf_counter() - started, 3),
+            'stage_seconds': {k: round(v, 3) for k, v in stage_seconds.items()}
+        }
+        if not batch_result['success']:
+            batch_result['error'] = 'すべてのCSVの処理に失敗しました'
+        finished = set(processed) | set(failed)
+        if len(finished) < total:
+            batch_result.update(cancelled_result(cancel_token))
+            batch_result['skipped_files'] = [ctx.csv_path for i, ctx in enumerate(contexts) if i not in finished]
+        return batch_result
+
+    def _export(self, exporter: ZipExporter, result: Dict[str, Any]) -> Dict[str, Any]:
+        """ZIP段: 保存したワークブックと変換したPDFをZIPへ追加"""
+        exporter.add(result.get('output_path'))
+        exporter.add(result.get('pdf_file'))
+        return result
+
+
+def run_pipeline(contexts: List[JobContext],
+                 template_cache: Optional[TemplateCache] = None,
+                 pdf_output_folder: Optional[str] = None,
+                 progress_callback: Optional[ProgressCallback] = None,
+                 cancel_token: Optional[CancellationToken] = None,
+                 workers: int = 2,
+                 queue_size: int = 4,
+                 summary: Optional[SummaryCollector] = None,
+                 pdf_converter: Optional[PDFConverter] = None,
+                 exporter: Optional[ZipExporter] = None) -> Dict[str, Any]:
+    """同期呼び出し用: 新しいイベントループでパイプラインを実行"""
+    pipeline = AsyncPipeline(template_cache=template_cache, pdf_converter=pdf_converter,
+                             workers=workers, queue_size=queue_size)
+    return asyncio.run(pipeline.run(
+        contexts,
+        pdf_output_folder=pdf_output_folder,
+        progress_callback=progress_callback,
+        cancel_token=cancel_token,
+        summary=summary,
+        exporter=exporter
+    ))
@@ -0,0 +1,207 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+勤怠データの内部表現
+時刻を分単位の整数配列で保持し、CSV 1件につき1回だけ構築して各出力処理で共有する
+"""
+
+from dataclasses import dataclass
+from typing import Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+
+# 解析済み日付（datetime64）を保持する列
+PARSED_DATE_COLUMN = '日付_dt'
+
+# 時刻が無い・解析できない場合の値
+MISSING_MINUTES = -1
+
+# 固定の休憩時間（始業・終業の両方がある日に適用）
+DEFAULT_BREAK_MINUTES = 60
+
+# 1日の分数（終業が始業より前の場合は翌日の終業とみなして加算する）
+MINUTES_PER_DAY = 24 * 60
+
+# 労働基準法の休憩時間（拘束6時間超は45分、8時間超は60分）
+STATUTORY_BREAK_TIERS: Tuple[Tuple[int, int], ...] = ((6 * 60, 45), (8 * 60, 60))
+
+# 勤怠種別コード
+DAY_TYPE_UNKNOWN = 0
+DAY_TYPE_WORK = 1
+DAY_TYPE_HOLIDAY = 2
+DAY_TYPE_PAID_LEAVE = 3
+DAY_TYPE_ABSENCE = 4
+
+# 勤怠種別の表記 → コード（部分一致。上から順に判定）
+DAY_TYPE_KEYWORDS = (
+    ('有給', DAY_TYPE_PAID_LEAVE),
+    ('有休', DAY_TYPE_PAID_LEAVE),
+    ('欠勤', DAY_TYPE_ABSENCE),
+    ('休日', DAY_TYPE_HOLIDAY),
+    ('公休', DAY_TYPE_HOLIDAY),
+    ('休', DAY_TYPE_HOLIDAY),
+    ('出勤', DAY_TYPE_WORK),
+    ('勤務', DAY_TYPE_WORK),
+)
+
+# HH:MM（HH:MM:SS の秒は無視。24時以降の表記 25:30 なども可）
+_TIME_PATTERN = r'^\s*(\d{1,2}):(\d{2})'
+
+
+@dataclass(frozen=True)
+class BreakRule:
+    """
+    休憩時間の規則
+
+    tiers が空の場合は始業・終業の両方がある日に fixed_minutes を適用する。
+    tiers を指定した場合は拘束時間（終業 - 始業）が閾値を超えた最も大きい段の休憩分を適用する。
+    """
+    fixed_minutes: int = DEFAULT_BREAK_MINUTES
+    tiers: Tuple[Tuple[int, int], ...] = ()  # (拘束時間の閾値（分）, 休憩時間（分）)
+
+    def apply(self, span_min: np.ndarray, has_times: np.ndarray) -> np.ndarray:
+        """拘束時間の配列から休憩時間（int16）を算出"""
+        if not self.tiers:
+            return np.where(has_times, self.fixed_minutes, 0).astype(np.int16)
+        minutes = np.zeros(len(span_min), dtype=np.int16)
+        for threshold, break_minutes in sorted(self.tiers):
+            minutes[span_min > threshold] = break_minutes
+        return np.where(has_times, minutes, 0).astype(np.int16)
+
+
+@dataclass(frozen=True)
+class AttendanceTable:
+    """
+    1か月分の勤怠（1行 = CSVの1行）
+
+    時刻は 0:00 からの経過分（int16、欠損は MISSING_MINUTES）、
+    勤務時間は分（int32）で保持するため、集計は誤差なく整数演算で行える。
+    """
+    date: np.ndarray        # datetime64[D]（解析できない日付は NaT）
+    start_min: np.ndarray   # int16
+    end_min: np.ndarray     # int16（日をまたぐ場合は +1440 済み）
+    break_min: np.ndarray   # int16
+    worked_min: np.ndarray  # int32（終業 - 始業 - 休憩、負の場合は0）
+    has_start: np.ndarray   # bool（始業に値がある）
+    has_end: np.ndarray     # bool（終業に値がある）
+    has_times: np.ndarray   # bool（始業・終業の両方に値がある）
+    overnight: np.ndarray   # bool（終業が始業より前のため日をまたぐ勤務とみなした）
+    day_type: np.ndarray    # int8（DAY_TYPE_*）
+
+    def __len__(self) -> int:
+        return len(self.worked_min)
+
+    @property
+    def total_worked_minutes(self) -> int:
+        return int(self.worked_min.sum())
+
+    @property
+    def working_days(self) -> int:
+        return int((self.worked_min > 0).sum())
+
+    def worked_hours(self, decimals: int = 2) -> np.ndarray:
+        """勤務時間（時間単位）。テンプレートの勤務時間式と同じく小数2桁に丸める"""
+        return np.round(self.worked_min / 60.0, decimals)
+
+
+def parse_minutes(values: pd.Series) -> np.ndarray:
+    """時刻文字列の列を 0:00 からの経過分（int16、欠損は MISSING_MINUTES）に一括変換"""
+    # 時刻の種類は行数よりはるかに少ないため、異なる値ごとに1回だけ解析する
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    parts = pd.Series(uniques, dtype='string').str.extract(_TIME_PATTERN).astype('float64')
+    minutes = parts[0] * 60 + parts[1]
+    minutes = minutes.where(parts[1] < 60).fillna(MISSING_MINUTES).to_numpy(dtype=np.int16)
+    # 欠損（コード -1）は末尾の MISSING_MINUTES を参照させる
+    return np.append(minutes, np.int16(MISSING_MINUTES))[codes]
+
+
+def has_value(values: pd.Series) -> np.ndarray:
+    """空欄以外の値があるかどうか"""
+    codes, uniques = pd.factorize(values, use_na_sentinel=True)
+    present = (pd.Series(uniques, dtype='string').str.strip() != '').fillna(False).to_numpy(dtype=bool)
+    return np.append(present, False)[codes]
+
+
+def _classify_label(text: str) -> int:
+    """勤怠種別の表記1つをコードに変換"""
+    for keyword, code in DAY_TYPE_KEYWORDS:
+        if keyword in text:
+            return code
+    return DAY_TYPE_UNKNOWN
+
+
+def classify_day_types(values: Optional[pd.Series], has_times: np.ndarray) -> np.ndarray:
+    """勤怠種別をコード化（表記ごとに1回だけ判定）。種別不明でも時刻があれば勤務日とする"""
+    codes = np.full(len(has_times), DAY_TYPE_UNKNOWN, dtype=np.int8)
+    if values is not None:
+        labels = values.astype('category')
+        mapped = np.array(
+            [_classify_label(str(label)) for label in labels.cat.categories] + [DAY_TYPE_UNKNOWN],
+            dtype=np.int8
+        )
+        # cat.codes は欠損が -1 のため末尾の UNKNOWN を参照させる
+        codes = mapped[labels.cat.codes.to_numpy()]
+    codes = codes.copy()
+    codes[(codes == DAY_TYPE_UNKNOWN) & has_times] = DAY_TYPE_WORK
+    return codes
+
+
+def build_attendance_table(df: pd.DataFrame,
+                           break_rule: Optional[BreakRule] = None,
+                           date_column: str = PARSED_DATE_COLUMN) -> AttendanceTable:
+    """
+    転記用DataFrame（始業時刻1/終業時刻1/勤怠種別 列）から AttendanceTable を構築
+
+    Args:
+        df: 標準列名のDataFrame
+        break_rule: 休憩時間の規則（省略時は固定1:00）
+        date_column: 解析済み日付の列名（無い場合は日付を NaT とする）
+    """
+    rule = break_rule or BreakRule()
+    n = len(df)
+    empty = pd.Series([None] * n, index=df.index, dtype='object')
+    start_values = df['始業時刻1'] if '始業時刻1' in df.columns else empty
+    end_values = df['終業時刻1'] if '終業時刻1' in df.columns else empty
+
+    start_min = parse_minutes(start_values)
+    end_min = parse_minutes(end_values)
+    has_start = has_value(start_values)
+    has_end = has_value(end_values)
+    has_times = has_start & has_end
+
+    # 終業が始業より前（例：22:00〜6:00）は日をまたいだ勤務とみなす
+    parsed = (start_min != MISSING_MINUTES) & (end_min != MISSING_MINUTES)
+    overnight = parsed & (end_min < start_min)
+    end_min = np.where(overnight, end_min + MINUTES_PER_DAY, end_min).astype(np.int16)
+    span = np.where(parsed, end_min.astype(np.int32) - start_min.astype(np.int32), 0)
+
+    break_min = rule.apply(span, has_times)
+    worked = span - break_min.astype(np.int32)
+    worked_min = np.where(parsed & has_times, np.maximum(worked, 0), 0).astype(np.int32)
+
+    if date_column in df.columns:
+        date = pd.to_datetime(df[date_column], errors='coerce').to_numpy(dtype='datetime64[D]')
+    else:
+        date = np.full(n, np.datetime64('NaT'), dtype='datetime64[D]')
+
+    day_type = classify_day_types(df['勤怠種別'] if '勤怠種別' in df.columns else None, has_times)
+
+    return AttendanceTable(
+        date=date,
+        start_min=start_min,
+        end_min=end_min,
+        break_min=break_min,
+        worked_min=worked_min,
+        has_start=has_start,
+        has_end=has_end,
+        has_times=has_times,
+        overnight=overnight,
+        day_type=day_type
+    )
+
+
+def format_minutes(minutes: int) -> str:
+    """分を H:MM 表記に変換（例：60 → '1:00'）"""
+    return f"{minutes // 60}:{minutes % 60:02d}"
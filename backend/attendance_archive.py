@@ -0,0 +1,205 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+勤怠データの列指向アーカイブ（Parquet / Arrow IPC）
+処理したCSVの内容を年月・従業員ごとのパーティションに書き出し、過去分の集計や再出力で
+CSVの再読み込み（文字コード判定・日付解析）やワークブックの解析をせずに済むようにする。
+
+  <出力フォルダ>/archive/year_month=202507/employee=山田太郎/part-0.parquet
+
+- 列は転記用の標準列（日付・勤怠種別・始業/終業時刻・勤怠メモ）と、分単位の勤怠表
+  （AttendanceTable）の数値列。CSV固有の余分な列は含めない（ファイル間でスキーマを揃えるため）
+- 同じ年月・従業員を処理し直した場合はそのパーティションを置き換える
+- arrow 形式は圧縮なしの Arrow IPC ファイル（メモリマップで読める）
+- pyarrow は任意の依存（無い環境ではアーカイブを出力せず、結果に archive_error を返す）
+"""
+
+import os
+from typing import Dict, Any, Iterable, List, Optional
+from urllib.parse import quote
+
+import pandas as pd
+
+from attendance import AttendanceTable, MISSING_MINUTES
+from file_output import commit_file, discard, temp_path_for
+
+try:
+    import pyarrow as pa  # type: ignore
+    import pyarrow.dataset as ds  # type: ignore
+    import pyarrow.ipc as ipc  # type: ignore
+    import pyarrow.parquet as pq  # type: ignore
+    PYARROW_AVAILABLE = True
+except ImportError:
+    PYARROW_AVAILABLE = False
+
+
+ARCHIVE_DIRNAME = 'archive'
+
+# 形式 → (ファイル拡張子, pyarrow.dataset の形式名)
+ARCHIVE_FORMATS = {
+    'parquet': ('.parquet', 'parquet'),
+    'arrow': ('.arrow', 'ipc'),
+}
+
+# 転記用の標準列（文字列）
+_TEXT_COLUMNS = ('勤怠種別', '始業時刻1', '終業時刻1', '勤怠メモ')
+
+
+def archive_root(base_output_dir: str) -> str:
+    """アーカイブのルートフォルダ"""
+    return os.path.join(base_output_dir, ARCHIVE_DIRNAME)
+
+
+def partition_dir(base_output_dir: str, year_month: str, employee_name: str) -> str:
+    """年月・従業員のパーティションのフォルダ（値はURLエンコードする）"""
+    return os.path.join(archive_root(base_output_dir), f"year_month={quote(year_month, safe='')}",
+                        f"employee={quote(employee_name, safe='')}")
+
+
+def archive_frame(df: pd.DataFrame, attendance: AttendanceTable, department: str = '') -> pd.DataFrame:
+    """
+    アーカイブする1か月分のDataFrameを作成
+
+    Args:
+        df: 読み込んだCSV（CSVData.df）
+        attendance: 分単位の勤怠表
+        department: 部署
+    """
+    frame = pd.DataFrame({'date': pd.Series(attendance.date).astype('datetime64[ns]')})
+    for column in _TEXT_COLUMNS:
+        values = df[column] if column in df.columns else pd.Series([''] * len(df))
+        frame[column] = values.astype(object).fillna('').astype(str).to_numpy()
+    # 欠損の時刻（MISSING_MINUTES）は null にする
+    for name in ('start_min', 'end_min'):
+        values = getattr(attendance, name)
+        frame[name] = pd.array(values, dtype='Int16')
+        frame.loc[values == MISSING_MINUTES, name] = pd.NA
+    frame['break_min'] = attendance.break_min.astype('int16')
+    frame['worked_min'] = attendance.worked_min.astype('int32')
+    frame['overnight'] = attendance.overnight.astype(bool)
+    frame['day_type'] = attendance.day_type.astype('int8')
+    frame['department'] = department
+    return frame
+
+
+def write_partition(base_output_dir: str, year_month: str, employee_name: str, frame: pd.DataFrame,
+                    archive_format: str = 'parquet') -> str:
+    """
+    1パーティション分を書き込み（一時ファイルへ書いてから置き換える）
+
+    Returns:
+        書き込んだファイルのパス
+
+    Raises:
+        RuntimeError: pyarrow が無い場合
+        ValueError: 未知の形式
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow がインストールされていないためアーカイブを出力できません")
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"未知のアーカイブ形式です: {archive_format}")
+    suffix, _ = ARCHIVE_FORMATS[archive_format]
+    folder = partition_dir(base_output_dir, year_month, employee_name)
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f"part-0{suffix}")
+    temp_path = temp_path_for(path)
+    table = pa.Table.from_pandas(frame, preserve_index=False)
+    try:
+        if archive_format == 'parquet':
+            pq.write_table(table, temp_path, compression='zstd')
+        else:
+            with pa.OSFile(temp_path, 'wb') as sink, ipc.new_file(sink, table.schema) as writer:
+                writer.write_table(table)
+        commit_file(temp_path, path)
+    finally:
+        discard(temp_path)
+    # 形式を変えて出力し直した場合に古い形式のファイルを残さない
+    for other_suffix, _ in ARCHIVE_FORMATS.values():
+        other = os.path.join(folder, f"part-0{other_suffix}")
+        if other != path and os.path.exists(other):
+            os.remove(other)
+    return path
+
+
+def archive_job(base_output_dir: str, year_month: str, employee_name: str, df: pd.DataFrame,
+                attendance: Optional[AttendanceTable], department: str = '',
+                archive_format: str = 'parquet') -> Dict[str, Any]:
+    """
+    1ジョブ分をアーカイブ（失敗しても例外は送出しない）
+
+    Returns:
+        結果辞書に加える項目（archive_path または archive_error）
+    """
+    if attendance is None:
+        return {}
+    try:
+        frame = archive_frame(df, attendance, department)
+        return {'archive_path': write_partition(base_output_dir, year_month, employee_name, frame, archive_format)}
+    except Exception as e:
+        return {'archive_error': f"アーカイブ出力エラー: {str(e)}"}
+
+
+def read_archive(base_output_dir: str, year_months: Optional[Iterable[str]] = None,
+                 employees: Optional[Iterable[str]] = None, columns: Optional[List[str]] = None,
+                 archive_format: str = 'parquet') -> pd.DataFrame:
+    """
+    アーカイブを読み込み（年月・従業員の指定はパーティション単位で絞り込む）
+
+    Args:
+        base_output_dir: 基本出力ディレクトリパス
+        year_months: 年月（YYYYMM）の一覧（任意）
+        employees: 従業員名の一覧（任意）
+        columns: 読み込む列（任意。year_month・employee は常に含む）
+        archive_format: parquet または arrow
+
+    Returns:
+        year_month・employee 列を含むDataFrame（該当なしは空）
+    """
+    if not PYARROW_AVAILABLE:
+        raise RuntimeError("pyarrow がインストールされていないためアーカイブを読み込めません")
+    if archive_format not in ARCHIVE_FORMATS:
+        raise ValueError(f"未知のアーカイブ形式です: {archive_format}")
+    root = archive_root(base_output_dir)
+    if not os.path.isdir(root):
+        return pd.DataFrame()
+    suffix, dataset_format = ARCHIVE_FORMATS[archive_format]
+    partitioning = ds.partitioning(pa.schema([('year_month', pa.string()), ('employee', pa.string())]),
+                                   flavor='hive')
+    # 書き込み中の一時ファイル（ドットで始まる）は読まない
+    files = [os.path.join(folder, name) for folder, _, names in os.walk(root)
+             for name in names if name.endswith(suffix) and not name.startswith('.')]
+    if not files:
+        return pd.DataFrame()
+    dataset = ds.dataset(files, format=dataset_format, partitioning=partitioning, partition_base_dir=root)
+    condition = None
+    if year_months is not None:
+        condition = ds.field('year_month').isin(list(year_months))
+    if employees is not None:
+        employee_condition = ds.field('employee').isin(list(employees))
+        condition = employee_condition if condition is None else condition & employee_condition
+    if columns is not None:
+        columns = ['year_month', 'employee'] + [c for c in columns if c not in ('year_month', 'employee')]
+    return dataset.to_table(columns=columns, filter=condition).to_pandas()
+
+
+def archive_totals(base_output_dir: str, year_months: Optional[Iterable[str]] = None,
+                   employees: Optional[Iterable[str]] = None,
+                   archive_format: str = 'parquet') -> List[Dict[str, Any]]:
+    """年月・従業員ごとの勤務時間・勤務日数（必要な列だけを読む）"""
+    frame = read_archive(base_output_dir, year_months, employees, ['worked_min', 'department'], archive_format)
+    if frame.empty:
+        return []
+    grouped = frame.groupby(['year_month', 'employee'], sort=True)
+    totals = grouped.agg(worked_min=('worked_min', 'sum'),
+                         working_days=('worked_min', lambda values: int((values > 0).sum())),
+                         department=('department', 'first'))
+    return [
+        {
+            'year_month': year_month,
+            'employee_name': employee,
+            'department': row.department,
+            'worked_hours': round(int(row.worked_min) / 60.0, 2),
+            'working_days': int(row.working_days),
+        }
+        for (year_month, employee), row in totals.iterrows()
+    ]
@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+処理中断（キャンセル・期限）機能
+バッチ処理の各ループから協調的に参照される中断トークンを提供する
+"""
+
+import os
+import signal
+import threading
+import time
+from typing import Optional
+
+
+class OperationCancelled(Exception):
+    """中断要求により処理を打ち切ったことを示す例外"""
+
+    def __init__(self, reason: str):
+        super().__init__(f"処理が中断されました（{reason}）")
+        self.reason = reason
+
+
+class CancellationToken:
+    """
+    協調的キャンセル用トークン
+
+    以下のいずれかで中断状態になる:
+    - cancel() の呼び出し（シグナルハンドラーからも利用）
+    - 期限（deadline_seconds）の超過
+    - キャンセルファイル（cancel_file）の出現
+    """
+
+    def __init__(self, deadline_seconds: Optional[float] = None, cancel_file: Optional[str] = None):
+        self._event = threading.Event()
+        self._reason: str = ''
+        self._deadline: Optional[float] = None
+        if deadline_seconds is not None and deadline_seconds > 0:
+            self._deadline = time.monotonic() + float(deadline_seconds)
+        self.cancel_file = cancel_file or None
+
+    def cancel(self, reason: str = 'requested') -> None:
+        """中断を要求"""
+        if not self._event.is_set():
+            self._reason = reason
+            self._event.set()
+
+    def is_cancelled(self) -> bool:
+        """中断状態かどうか（期限・キャンセルファイルもここで判定）"""
+        if self._event.is_set():
+            return True
+        if self._deadline is not None and time.monotonic() >= self._deadline:
+            self.cancel('deadline')
+            return True
+        if self.cancel_file and os.path.exists(self.cancel_file):
+            self.cancel('cancel_file')
+            return True
+        return False
+
+    @property
+    def reason(self) -> str:
+        """中断理由（deadline / signal / cancel_file / requested）"""
+        return self._reason
+
+    def remaining(self) -> Optional[float]:
+        """期限までの残り秒数（期限なしの場合は None）"""
+        if self._deadline is None:
+            return None
+        return max(0.0, self._deadline - time.monotonic())
+
+    def raise_if_cancelled(self) -> None:
+        """中断状態なら OperationCancelled を送出"""
+        if self.is_cancelled():
+            raise OperationCancelled(self._reason)
+
+    def install_signal_handlers(self) -> None:
+        """SIGINT/SIGTERM（WindowsではSIGBREAKも）を受けたら中断状態にする"""
+        if threading.current_thread() is not threading.main_thread():
+            return
+
+        def _handler(signum, frame):
+            self.cancel('signal')
+
+        for name in ('SIGINT', 'SIGTERM', 'SIGBREAK'):
+            sig = getattr(signal, name, None)
+            if sig is None:
+                continue
+            try:
+                signal.signal(sig, _handler)
+            except Exception:
+                pass
+
+
+def is_cancelled(token: Optional[CancellationToken]) -> bool:
+    """トークン未指定(None)を許容する中断判定"""
+    return token is not None and token.is_cancelled()
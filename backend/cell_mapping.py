@@ -0,0 +1,290 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+テンプレートの転記先設定（セルマッピング）
+転記先のシート・セル・列を宣言的に定義し、1回だけ「書き込み計画」（行・列番号と値の取り出し方の組）
+にコンパイルする。転記処理は計画の整数座標へ書き込むだけで、セル番地の文字列は組み立てない。
+
+テンプレートと同じ場所に「<テンプレート名>.mapping.json」を置くとその設定を使う（無ければ既定の設定）:
+
+    {
+      "sheet": "勤務表",
+      "header": {"G6": "employee_name", "F5": "year", "H5": "month"},
+      "rows": {
+        "start_row": 11,
+        "columns": {
+          "C": "start",
+          "D": "end",
+          "E": "break",
+          "F": "worked_hours",
+          "H": {"source": "memo", "skip_empty": true}
+        }
+      }
+    }
+
+未知の項目はエラーにする。header と rows.columns はそれぞれ1つ以上必要。
+
+header の値: employee_name / year / month / year_month
+columns の値: start / end / break / worked_hours / worked_minutes / memo / day_type / date
+（{"source": ..., "transform": "text" | "int", "skip_empty": true} の形でも指定できる）
+"""
+
+import hashlib
+import json
+import os
+import threading
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+from openpyxl.utils import column_index_from_string
+from openpyxl.utils.cell import coordinate_to_tuple
+
+from attendance import AttendanceTable, build_attendance_table, format_minutes
+
+
+MAPPING_SUFFIX = '.mapping.json'
+
+# 設定ファイルで使える項目（綴り・階層の誤りで既定の転記先が黙って消えないよう、未知の項目はエラー）
+MAPPING_KEYS = ('sheet', 'header', 'rows')
+ROWS_KEYS = ('start_row', 'columns')
+
+# 現行テンプレート（勤怠表雛形_2025年版.xlsx）の転記先
+DEFAULT_MAPPING: Dict[str, Any] = {
+    'sheet': '勤務表',
+    'header': {
+        'G6': 'employee_name',  # 従業員名
+        'F5': 'year',           # 年
+        'H5': 'month',          # 月（数値）
+    },
+    'rows': {
+        # A列・B列（日付・曜日）は雛形の関数がH5セルの月数を基準に自動生成するため転記しない
+        # G列は記入不要
+        'start_row': 11,
+        'columns': {
+            'C': 'start',          # 始業時刻
+            'D': 'end',            # 終業時刻
+            'E': 'break',          # 休憩時間（始業・終業がある場合のみ）
+            'F': 'worked_hours',   # 勤務時間（終業-始業-休憩）
+            'H': {'source': 'memo', 'skip_empty': True},  # 詳細・備考（勤怠メモ）
+        },
+    },
+}
+
+
+def _header_values(employee_name: str, year_month: str) -> Dict[str, Any]:
+    return {
+        'employee_name': employee_name,
+        'year': year_month[:4],
+        'month': int(year_month[4:]),  # "06" → 6
+        'year_month': year_month,
+    }
+
+
+HEADER_SOURCES = ('employee_name', 'year', 'month', 'year_month')
+
+
+def _memo_values(df: pd.DataFrame, table: AttendanceTable) -> List[Any]:
+    memos = df['勤怠メモ'].tolist() if '勤怠メモ' in df.columns else [''] * len(df)
+    return [memo if memo and str(memo).strip() != '' else None for memo in memos]
+
+
+def _date_values(df: pd.DataFrame, table: AttendanceTable) -> List[Any]:
+    return [None if np.isnat(value) else value.astype(date) for value in table.date]
+
+
+# 行の値の取り出し方（列単位で一括取得する）
+ROW_SOURCES: Dict[str, Callable[[pd.DataFrame, AttendanceTable], List[Any]]] = {
+    'start': lambda df, table: df['始業時刻1'].tolist(),
+    'end': lambda df, table: df['終業時刻1'].tolist(),
+    'break': lambda df, table: [format_minutes(int(minutes)) if has_times else ''
+                                for minutes, has_times in zip(table.break_min, table.has_times)],
+    'worked_hours': lambda df, table: [hours if minutes > 0 else ''
+                                       for hours, minutes in zip(table.worked_hours().tolist(), table.worked_min)],
+    'worked_minutes': lambda df, table: [int(minutes) if minutes > 0 else '' for minutes in table.worked_min],
+    'memo': _memo_values,
+    'day_type': lambda df, table: df['勤怠種別'].tolist() if '勤怠種別' in df.columns else [''] * len(df),
+    'date': _date_values,
+}
+
+
+def _to_int(value: Any) -> Any:
+    try:
+        return int(value)
+    except (TypeError, ValueError):
+        return value
+
+
+TRANSFORMS: Dict[str, Callable[[Any], Any]] = {
+    'value': lambda value: value,
+    'text': lambda value: value if value is None else str(value),
+    'int': _to_int,
+}
+
+
+@dataclass(frozen=True)
+class ColumnPlan:
+    """行ごとに書き込む1列"""
+    column: int
+    source: str
+    transform: str
+    skip_empty: bool  # 値が None の場合は書き込まない（雛形の内容を残す）
+
+
+@dataclass(frozen=True)
+class CellPlan:
+    """コンパイル済みの書き込み計画"""
+    sheet_name: str
+    header: Tuple[Tuple[int, int, str], ...]  # (行, 列, 値の種類)
+    start_row: int
+    columns: Tuple[ColumnPlan, ...]
+    digest: str                               # 設定内容のハッシュ（差分更新の判定用）
+
+    @property
+    def column_indexes(self) -> Tuple[int, ...]:
+        return tuple(plan.column for plan in self.columns)
+
+    def write_header(self, sheet, employee_name: str, year_month: str) -> None:
+        """従業員情報をシートへ書き込み"""
+        values = _header_values(employee_name, year_month)
+        for row, column, source in self.header:
+            sheet.cell(row=row, column=column).value = values[source]
+
+    def row_values(self, df: pd.DataFrame, table: Optional[AttendanceTable] = None) -> List[Tuple[int, Tuple[Any, ...]]]:
+        """
+        転記する行ごとの値を作成（値は列単位で一括取得する）
+
+        Returns:
+            (行番号, columns 順の値) のリスト
+        """
+        if table is None:
+            table = build_attendance_table(df)
+        series = []
+        for plan in self.columns:
+            values = ROW_SOURCES[plan.source](df, table)
+            if plan.transform != 'value':
+                transform = TRANSFORMS[plan.transform]
+                values = [transform(value) for value in values]
+            series.append(values)
+        rows = [self.start_row + int(index) for index in df.index]  # type: ignore
+        return list(zip(rows, zip(*series))) if series else [(row, ()) for row in rows]
+
+    def write_row(self, sheet, row: int, values: Tuple[Any, ...]) -> None:
+        """1日分の値を転記"""
+        for plan, value in zip(self.columns, values):
+            if value is None and plan.skip_empty:
+                continue
+            sheet.cell(row=row, column=plan.column).value = value
+
+
+def _column_spec(spec: Any) -> Tuple[str, str, bool]:
+    if isinstance(spec, str):
+        return spec, 'value', False
+    if isinstance(spec, dict):
+        return str(spec.get('source', '')), str(spec.get('transform', 'value')), bool(spec.get('skip_empty', False))
+    raise ValueError(f"列の設定が正しくありません: {spec}")
+
+
+def _check_keys(section: Any, allowed: Tuple[str, ...], name: str) -> Dict[str, Any]:
+    """設定の1階層が辞書で、既知の項目だけを持つことを確認"""
+    if not isinstance(section, dict):
+        raise ValueError(f"{name}の設定が正しくありません: {section}")
+    unknown = [str(key) for key in section if key not in allowed]
+    if unknown:
+        raise ValueError(f"{name}に未知の項目があります: {', '.join(unknown)}（使用できる項目: {', '.join(allowed)}）")
+    return section
+
+
+def compile_mapping(mapping: Dict[str, Any]) -> CellPlan:
+    """
+    マッピング設定を書き込み計画にコンパイル
+
+    Raises:
+        ValueError: 未知の項目・値の種類・変換、セル番地や列名の誤り、
+                    従業員情報または行ごとの列が1つも無い場合
+    """
+    _check_keys(mapping, MAPPING_KEYS, 'マッピング')
+    header = []
+    for coordinate, source in (mapping.get('header') or {}).items():
+        if source not in HEADER_SOURCES:
+            raise ValueError(f"未知の従業員情報です: {source}")
+        try:
+            row, column = coordinate_to_tuple(str(coordinate).upper())
+        except (TypeError, ValueError):
+            raise ValueError(f"セル番地が正しくありません: {coordinate}")
+        header.append((row, column, source))
+
+    rows = _check_keys(mapping.get('rows') or {}, ROWS_KEYS, 'rows ')
+    columns = []
+    for letter, spec in (rows.get('columns') or {}).items():
+        source, transform, skip_empty = _column_spec(spec)
+        if source not in ROW_SOURCES:
+            raise ValueError(f"未知の転記項目です: {source}")
+        if transform not in TRANSFORMS:
+            raise ValueError(f"未知の変換です: {transform}")
+        try:
+            column = column_index_from_string(str(letter).upper())
+        except ValueError:
+            raise ValueError(f"列名が正しくありません: {letter}")
+        columns.append(ColumnPlan(column=column, source=source, transform=transform, skip_empty=skip_empty))
+
+    start_row = int(rows.get('start_row', 1))
+    if start_row < 1:
+        raise ValueError(f"開始行が正しくありません: {start_row}")
+    if not header:
+        raise ValueError("従業員情報の転記先（header）がありません")
+    if not columns:
+        raise ValueError("日ごとの転記列（rows.columns）がありません")
+
+    canonical = json.dumps(mapping, ensure_ascii=False, sort_keys=True)
+    return CellPlan(
+        sheet_name=str(mapping.get('sheet') or DEFAULT_MAPPING['sheet']),
+        header=tuple(header),
+        start_row=start_row,
+        columns=tuple(columns),
+        digest=hashlib.sha1(canonical.encode('utf-8')).hexdigest()
+    )
+
+
+DEFAULT_CELL_PLAN = compile_mapping(DEFAULT_MAPPING)
+
+
+def mapping_path_for(template_path: str) -> str:
+    """テンプレートのマッピング設定ファイルのパス（例：勤怠表雛形_2025年版.mapping.json）"""
+    return os.path.splitext(template_path)[0] + MAPPING_SUFFIX
+
+
+class CellPlanCache:
+    """テンプレートごとの書き込み計画のキャッシュ（設定ファイルが更新されたらコンパイルし直す）"""
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], CellPlan]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, template_path: str) -> CellPlan:
+        path = os.path.abspath(mapping_path_for(template_path))
+        try:
+            st = os.stat(path)
+        except OSError:
+            return DEFAULT_CELL_PLAN
+        stamp = (st.st_mtime_ns, st.st_size)
+        with self._lock:
+            entry = self._entries.get(path)
+            if entry is not None and entry[0] == stamp:
+                return entry[1]
+        with open(path, 'r', encoding='utf-8') as f:
+            plan = compile_mapping(json.load(f))
+        with self._lock:
+            self._entries[path] = (stamp, plan)
+        return plan
+
+
+# プロセス内で共有する書き込み計画のキャッシュ
+default_plan_cache = CellPlanCache()
+
+
+def plan_for_template(template_path: str) -> CellPlan:
+    """テンプレートの書き込み計画（設定ファイルが無ければ既定の計画）"""
+    return default_plan_cache.get(template_path)
@@ -8,7 +8,285 @@ freee勤怠CSVを読み込み、整形する
 import pandas as pd
 import re
 import os
-from typing import Dict, Any, Optional
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from attendance import AttendanceTable, BreakRule, PARSED_DATE_COLUMN, build_attendance_table
+from validation import ValidationReport
+
+
+# 列名の同義語マッピング（時刻系はパイプライン標準の 始業時刻1 / 終業時刻1 に寄せる）
+SYNONYM_MAPPING = {
+    '出勤時刻': '始業時刻1',
+    '始業時刻': '始業時刻1',
+    '開始時刻': '始業時刻1',
+    '開始時間': '始業時刻1',
+    '退勤時刻': '終業時刻1',
+    '終業時刻': '終業時刻1',
+    '終了時刻': '終業時刻1',
+    '終了時間': '終業時刻1',
+    # メモ系
+    '備考': '勤怠メモ',
+    'メモ': '勤怠メモ',
+}
+
+# 文字コード判定のフォールバック順
+CSV_ENCODINGS = [
+    'utf-8',
+    'utf-8-sig',
+    'cp932',
+    'shift_jis',
+    'iso-2022-jp',
+    'latin-1',
+]
+
+# YYYY-MM-DD / YYYY/MM/DD / YYYY年MM月DD日（日は省略可、後続の曜日表記などは無視）
+_DATE_PATTERN = r'^\s*(\d{4})\s*[-/年.]\s*(\d{1,2})(?:\s*[-/月.]\s*(\d{1,2}))?'
+
+
+@dataclass(frozen=True)
+class DateParseResult:
+    """日付列の一括解析結果"""
+    dates: pd.Series                 # datetime64（空欄・解析不能は NaT）
+    year_months: Tuple[str, ...]     # 含まれる年月（YYYYMM、昇順）
+    primary_year_month: Optional[str]  # 最初の有効行の年月
+    invalid_rows: Tuple[int, ...]    # 値があるのに解析できなかった行（DataFrameの行位置）
+
+
+@dataclass(frozen=True)
+class CSVData:
+    """1ジョブ分のCSV読み込み結果（イミュータブル。df は読み取り専用として扱う）"""
+    df: pd.DataFrame
+    employee_name: str
+    year_month: str
+    year_months: Tuple[str, ...] = ()
+    invalid_date_rows: Tuple[int, ...] = ()
+    attendance: Optional[AttendanceTable] = None  # 分単位の勤怠表（CSV 1件につき1回だけ構築）
+    validation: Optional[ValidationReport] = None  # データ品質チェックの結果
+
+    @property
+    def row_count(self) -> int:
+        return len(self.df)
+
+
+# 転記に必要な列（標準列名）
+TIME_COLUMNS = ('始業時刻1', '終業時刻1')
+CATEGORY_COLUMNS = ('勤怠種別', '勤怠メモ')
+REQUIRED_CANONICAL_COLUMNS = ('日付',) + TIME_COLUMNS + CATEGORY_COLUMNS
+
+
+@dataclass(frozen=True)
+class CSVSchema:
+    """
+    ヘッダーから解決した読み込み計画
+
+    columns: (元の列位置, 元の列名, 標準列名) のタプル（列位置の昇順）
+    """
+    columns: Tuple[Tuple[int, str, str], ...]
+
+    @property
+    def usecols(self) -> List[int]:
+        return [index for index, _, _ in self.columns]
+
+    @property
+    def dtype(self) -> Dict[str, Any]:
+        """日付・時刻は文字列、種別・メモはカテゴリ型で読む"""
+        types: Dict[str, Any] = {}
+        for _, raw, canonical in self.columns:
+            types[raw] = 'category' if canonical in CATEGORY_COLUMNS else str
+        return types
+
+    @property
+    def rename(self) -> Dict[str, str]:
+        return {raw: canonical for _, raw, canonical in self.columns}
+
+
+def _column_candidates() -> Dict[str, List[str]]:
+    """標準列名ごとの候補列名（優先順: 標準列名そのもの → 同義語の定義順）"""
+    candidates: Dict[str, List[str]] = {}
+    for canonical in REQUIRED_CANONICAL_COLUMNS:
+        candidates[canonical] = [canonical] + [old for old, new in SYNONYM_MAPPING.items() if new == canonical]
+    return candidates
+
+
+_COLUMN_CANDIDATES = _column_candidates()
+# ヘッダー構成ごとの解決結果（同じ形式のエクスポートは2件目以降で再解決しない）
+_schema_cache: Dict[Tuple[str, ...], CSVSchema] = {}
+
+
+def compile_csv_schema(header: List[str]) -> CSVSchema:
+    """CSVヘッダーから必要列だけを読む CSVSchema を生成（結果はヘッダー単位でキャッシュ）"""
+    key = tuple(header)
+    cached = _schema_cache.get(key)
+    if cached is not None:
+        return cached
+    # 列名を正規化（前後空白除去）した上で、最初に一致した列位置を採用
+    positions: Dict[str, int] = {}
+    for index, name in enumerate(header):
+        positions.setdefault(str(name).strip(), index)
+    resolved: List[Tuple[int, str, str]] = []
+    for canonical, candidates in _COLUMN_CANDIDATES.items():
+        for candidate in candidates:
+            if candidate in positions:
+                index = positions[candidate]
+                resolved.append((index, header[index], canonical))
+                break
+    schema = CSVSchema(columns=tuple(sorted(resolved)))
+    _schema_cache[key] = schema
+    return schema
+
+
+def read_csv_frame(file_path: str) -> pd.DataFrame:
+    """
+    文字コードを判定しながらCSVを読み込み、標準列名のDataFrameを返す
+
+    ヘッダーだけを先に読んで CSVSchema を解決し、本体は必要な列のみを
+    usecols と型指定（種別・メモはカテゴリ型）で読み込む。
+    """
+    last_error: Optional[Exception] = None
+    for enc in CSV_ENCODINGS:
+        try:
+            header = list(pd.read_csv(file_path, encoding=enc, nrows=0).columns)
+            schema = compile_csv_schema(header)
+            df = pd.read_csv(
+                file_path,
+                encoding=enc,
+                usecols=schema.usecols,
+                dtype=schema.dtype,
+            )
+            # 読めたら採用
+            return df.rename(columns=schema.rename)
+        except Exception as ee:
+            last_error = ee
+            continue
+    raise last_error if last_error is not None else Exception('CSVの読み込みに失敗しました')
+
+
+def parse_dates(values: pd.Series) -> DateParseResult:
+    """
+    日付列を全行まとめて解析（対応形式: YYYY-MM-DD / YYYY/MM/DD / YYYY年MM月DD日）
+
+    年・月・日を正規表現で一括抽出して datetime64 に変換する。
+    日が無い・存在しない日付の行は NaT だが、年月は抽出できれば年月判定に使う。
+    """
+    text = values.astype('string').str.strip()
+    parts = text.str.extract(_DATE_PATTERN).astype('float64')
+    years, months, days = parts[0], parts[1], parts[2]
+    dates = pd.to_datetime(pd.DataFrame({'year': years, 'month': months, 'day': days}), errors='coerce')
+
+    valid_month = months.between(1, 12)
+    ym_values = (years * 100 + months)[valid_month].astype('int64')
+    year_months = tuple(str(v) for v in sorted(ym_values.unique()))
+    primary = str(ym_values.iloc[0]) if len(ym_values) > 0 else None
+
+    blank = text.isna() | (text == '')
+    invalid_mask = (~blank & dates.isna()).to_numpy()
+    invalid_rows = tuple(int(i) for i in invalid_mask.nonzero()[0])
+    return DateParseResult(
+        dates=dates,
+        year_months=year_months,
+        primary_year_month=primary,
+        invalid_rows=invalid_rows
+    )
+
+
+UNPARSEABLE_DATES_ERROR = "日付を解析できません（年月を判定できる日付の行がありません）"
+
+
+def extract_year_month(df: Optional[pd.DataFrame]) -> str:
+    """
+    CSVデータの日付から年月（YYYYMM）を抽出
+
+    Raises:
+        ValueError: 日付列が無い、または年月を判定できる行が無い場合（既定の年月へは出力しない）
+    """
+    if df is None or '日付' not in df.columns:
+        raise ValueError("必要な列 '日付' が見つかりません")
+    primary = parse_dates(df['日付']).primary_year_month
+    if not primary:
+        raise ValueError(UNPARSEABLE_DATES_ERROR)
+    return primary
+
+
+def validate_csv_structure(df: Optional[pd.DataFrame]) -> bool:
+    """CSV構造の検証"""
+    if df is None:
+        raise ValueError("CSVデータが読み込まれていません")
+        
+    # 基本的な列の存在チェック
+    basic_required_columns = ['日付']
+    
+    for col in basic_required_columns:
+        if col not in df.columns:
+            raise ValueError(f"必要な列 '{col}' が見つかりません")
+    
+    # 時刻関連の列を柔軟にチェック
+    time_columns = ['出勤時刻', '退勤時刻', '始業時刻1', '終業時刻1']
+    found_time_columns = [col for col in time_columns if col in df.columns]
+    
+    if not found_time_columns:
+        raise ValueError("時刻関連の列（出勤時刻/退勤時刻 または 始業時刻1/終業時刻1）が見つかりません")
+    
+    return True
+
+
+def employee_name_from_filename(filename: str) -> str:
+    """ファイル名から従業員名を推測（ファイル名形式: 勤怠詳細_山田太郎_2025_07.csv）"""
+    match = re.match(r'勤怠詳細_(.+?)_(\d{4})_(\d{2})\.csv', filename)
+    if match:
+        return match.group(1)
+    # パターンに一致しない場合は、ファイル名から推測
+    parts = filename.replace('.csv', '').split('_')
+    return parts[1] if len(parts) >= 2 else "不明"
+
+
+def load_csv_data(file_path: str, employee_name: str, break_rule: Optional[BreakRule] = None) -> CSVData:
+    """
+    CSVを読み込んで CSVData を生成（インスタンス状態を持たないため並行実行可能）
+
+    break_rule は勤務時間（AttendanceTable）の算出に使う休憩規則（省略時は固定1:00）
+
+    Raises:
+        読み込み・検証に失敗した場合は例外を送出
+        （年月を判定できる日付が1行も無い場合は ValueError。既定の年月へは出力しない）
+    """
+    df = read_csv_frame(file_path)
+    validate_csv_structure(df)
+    # 日付は1回だけ解析し、後続工程は型付きの列（PARSED_DATE_COLUMN）を使う
+    parsed = parse_dates(df['日付'])
+    df[PARSED_DATE_COLUMN] = parsed.dates
+    if parsed.invalid_rows:
+        print(f"日付を解析できない行があります: {list(parsed.invalid_rows)}")
+    if not parsed.primary_year_month:
+        raise ValueError(UNPARSEABLE_DATES_ERROR)
+    return CSVData(
+        df=df,
+        employee_name=employee_name,
+        year_month=parsed.primary_year_month,
+        year_months=parsed.year_months,
+        invalid_date_rows=parsed.invalid_rows,
+        attendance=build_attendance_table(df, break_rule)
+    )
+
+
+def build_processed_data(df: pd.DataFrame, employee_name: str) -> pd.DataFrame:
+    """
+    転記用に整形したDataFrameを生成（元のDataFrameは変更しない）
+
+    列名の統一は読み込み時に CSVSchema で済んでいるため、ここでは
+    氏名列と不足列の補完のみを行う（コピー対象も必要列だけ）。
+    """
+    # 氏名列を追加（GUIから入力された従業員名）
+    processed_df = df.copy()
+    processed_df['氏名'] = employee_name
+    
+    # 必要な列が存在しない場合は空の列を追加
+    required_columns = ['勤怠種別', '勤怠メモ']
+    for col in required_columns:
+        if col not in processed_df.columns:
+            processed_df[col] = ''
+    
+    return processed_df
 
 
 class CSVProcessor:
@@ -34,63 +312,19 @@ class CSVProcessor:
             処理結果辞書
         """
         try:
-            # 文字コード判定のフォールバック
-            encodings_to_try = [
-                'utf-8',
-                'utf-8-sig',
-                'cp932',
-                'shift_jis',
-                'iso-2022-jp',
-                'latin-1',
-            ]
-            last_error: Optional[Exception] = None
-            df: Optional[pd.DataFrame] = None
-            for enc in encodings_to_try:
-                try:
-                    df = pd.read_csv(file_path, encoding=enc)
-                    # 読めたら採用
-                    break
-                except Exception as ee:
-                    last_error = ee
-                    continue
-            if df is None:
-                raise last_error if last_error is not None else Exception('CSVの読み込みに失敗しました')
-
-            # 列名を正規化（前後空白除去）
-            df.columns = [str(c).strip() for c in df.columns]
-
-            # 列名の同義語マッピングを適用
-            synonym_mapping = {
-                # 時刻系: すべてパイプライン標準の 始業時刻1 / 終業時刻1 に寄せる
-                '出勤時刻': '始業時刻1',
-                '始業時刻': '始業時刻1',
-                '開始時刻': '始業時刻1',
-                '開始時間': '始業時刻1',
-                '退勤時刻': '終業時刻1',
-                '終業時刻': '終業時刻1',
-                '終了時刻': '終業時刻1',
-                '終了時間': '終業時刻1',
-                # メモ系
-                '備考': '勤怠メモ',
-                'メモ': '勤怠メモ',
-            }
-            for old_col, new_col in synonym_mapping.items():
-                if old_col in df.columns and new_col not in df.columns:
-                    df[new_col] = df[old_col]
+            # 読み込み・検証・日付解析
+            data = load_csv_data(file_path, self.employee_name)
 
             # DataFrameを確定
-            self.df = df
-
-            # CSVデータから年月を抽出
-            self._extract_year_month_from_data()
-
-            # データ検証
-            _ = self._validate_csv_structure()
+            self.df = data.df
+            self.year_month = data.year_month
 
             return {
                 'success': True,
                 'employee_name': self.employee_name,
                 'year_month': self.year_month,
+                'year_months': list(data.year_months),
+                'invalid_date_rows': list(data.invalid_date_rows),
                 'row_count': len(self.df),
                 'columns': list(self.df.columns)
             }
@@ -107,117 +341,18 @@ class CSVProcessor:
     
     def _extract_info_from_filename(self, filename: str):
         """ファイル名から従業員名を抽出（年月はCSVデータから取得）"""
-        # ファイル名形式: 勤怠詳細_山田太郎_2025_07.csv
-        pattern = r'勤怠詳細_(.+?)_(\d{4})_(\d{2})\.csv'
-        match = re.match(pattern, filename)
-        
-        if match:
-            self.employee_name = match.group(1)
-        else:
-            # パターンに一致しない場合は、ファイル名から推測
-            parts = filename.replace('.csv', '').split('_')
-            if len(parts) >= 2:
-                self.employee_name = parts[1] if len(parts) > 1 else "不明"
-            else:
-                self.employee_name = "不明"
+        self.employee_name = employee_name_from_filename(filename)
     
     def _extract_year_month_from_data(self):
         """CSVデータの日付から年月を抽出"""
-        try:
-            if self.df is not None and '日付' in self.df.columns:
-                # 最初の有効な日付を取得
-                for date_str in self.df['日付']:
-                    if pd.notna(date_str) and str(date_str).strip() != '':
-                        date_str = str(date_str).strip()
-                        
-                        # YYYY-MM-DD形式の処理
-                        if '-' in date_str:
-                            parts = date_str.split('-')
-                            if len(parts) >= 2:
-                                year = parts[0]
-                                month = parts[1].zfill(2)  # 1桁の月を2桁に
-                                self.year_month = f"{year}{month}"
-                                return
-                        
-                        # YYYY/MM/DD形式の処理
-                        elif '/' in date_str:
-                            parts = date_str.split('/')
-                            if len(parts) >= 2:
-                                year = parts[0]
-                                month = parts[1].zfill(2)  # 1桁の月を2桁に
-                                self.year_month = f"{year}{month}"
-                                return
-
-                        # YYYY年MM月DD日 形式の処理
-                        elif ('年' in date_str) and ('月' in date_str):
-                            try:
-                                y_idx = date_str.index('年')
-                                m_idx = date_str.index('月')
-                                year = date_str[:y_idx]
-                                month = date_str[y_idx+1:m_idx].strip().zfill(2)
-                                if len(year) == 4 and month.isdigit():
-                                    self.year_month = f"{year}{month}"
-                                    return
-                            except Exception:
-                                pass
-                
-                # 日付が見つからない場合はデフォルト
-                self.year_month = "202501"
-            else:
-                self.year_month = "202501"
-        except Exception as e:
-            print(f"年月抽出エラー: {e}")
-            self.year_month = "202501"
+        self.year_month = extract_year_month(self.df)
     
     def _validate_csv_structure(self) -> bool:
         """CSV構造の検証"""
-        if self.df is None:
-            raise ValueError("CSVデータが読み込まれていません")
-            
-        # 基本的な列の存在チェック
-        basic_required_columns = ['日付']
-        
-        for col in basic_required_columns:
-            if col not in self.df.columns:
-                raise ValueError(f"必要な列 '{col}' が見つかりません")
-        
-        # 時刻関連の列を柔軟にチェック
-        time_columns = ['出勤時刻', '退勤時刻', '始業時刻1', '終業時刻1']
-        found_time_columns = [col for col in time_columns if col in self.df.columns]
-        
-        if not found_time_columns:
-            raise ValueError("時刻関連の列（出勤時刻/退勤時刻 または 始業時刻1/終業時刻1）が見つかりません")
-        
-        return True
+        return validate_csv_structure(self.df)
     
     def get_processed_data(self) -> pd.DataFrame:
         """処理済みデータを取得"""
         if self.df is None:
             raise ValueError("CSVファイルが読み込まれていません")
-        
-        # 氏名列を追加（GUIから入力された従業員名）
-        processed_df = self.df.copy()
-        processed_df['氏名'] = self.employee_name
-        
-        # 列名の統一化
-        column_mapping = {
-            '出勤時刻': '始業時刻1',
-            '退勤時刻': '終業時刻1',
-            '勤務時間': '総勤務時間',
-            '備考': '勤怠メモ'
-        }
-        
-        # 列名を統一
-        for old_col, new_col in column_mapping.items():
-            if old_col in processed_df.columns and new_col not in processed_df.columns:
-                processed_df[new_col] = processed_df[old_col]
-        
-        # 必要な列が存在しない場合は空の列を追加
-        required_columns = ['勤怠種別', '勤怠メモ']
-        for col in required_columns:
-            if col not in processed_df.columns:
-                processed_df[col] = ''
-        
-        return processed_df
-    
- 
\ No newline at end of file
+        return build_processed_data(self.df, self.employee_name)
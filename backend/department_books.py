@@ -0,0 +1,200 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+部署別ワークブック出力
+同じ部署・年月の従業員を1つのワークブックにまとめ、テンプレートの読み込みと保存を1回ずつにする
+（従業員ごとに「勤務表」シートを複製して転記する）
+"""
+
+import os
+import re
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import replace
+from typing import Dict, Any, List, Optional, Tuple
+
+from cancellation import CancellationToken, is_cancelled
+from cell_mapping import plan_for_template
+from csv_processor import CSVData
+from excel_processor import (
+    TemplateCache,
+    default_template_cache,
+    get_template_sheet,
+    clone_template_sheet,
+    save_workbook_to,
+)
+from jobs import (
+    JobContext,
+    JobError,
+    normalize_context,
+    parse_stage,
+    fill_sheet,
+    build_job_result,
+    notify_progress,
+    cancelled_result,
+    output_folder_for,
+)
+from progress import ProgressCallback
+from summary import SummaryCollector, UNASSIGNED_DEPARTMENT
+from template_registry import template_id_for
+from zip_export import ZipExporter
+
+
+# ファイル名に使えない文字（パス区切りと Windows の禁止文字、制御文字）
+_UNSAFE_NAME_CHARS = re.compile(r'[\\/:*?"<>|\x00-\x1f]')
+
+
+def safe_department_name(department: str) -> str:
+    """部署名をファイル名・ラベルに使える形にする（禁止文字は _ に置き換え、空なら未設定）"""
+    name = _UNSAFE_NAME_CHARS.sub('_', department or '').strip().rstrip('. ')
+    return name or UNASSIGNED_DEPARTMENT
+
+
+def department_filename_for(year_month: str, department: str, template_id: str = '') -> str:
+    """部署別ワークブックのファイル名（例：勤怠表_202501_営業部.xlsx、テンプレート指定時は 勤怠表_202501_営業部_<ID>.xlsx）"""
+    suffix = f"_{template_id}" if template_id else ''
+    return f"勤怠表_{year_month}_{safe_department_name(department)}{suffix}.xlsx"
+
+
+def _parse(ctx: JobContext) -> Tuple[Optional[CSVData], Optional[Dict[str, Any]]]:
+    """CSV読み込み（失敗時は結果辞書を返す）"""
+    try:
+        return parse_stage(ctx), None
+    except JobError as e:
+        return None, e.to_result()
+    except Exception as e:
+        return None, {'success': False, 'error': f"処理エラー: {str(e)}"}
+
+
+def run_department_batch(contexts: List[JobContext],
+                         template_cache: Optional[TemplateCache] = None,
+                         progress_callback: Optional[ProgressCallback] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         max_workers: int = 1,
+                         summary: Optional[SummaryCollector] = None,
+                         exporter: Optional[ZipExporter] = None) -> Dict[str, Any]:
+    """
+    部署×年月ごとに1ワークブックを出力
+
+    Args:
+        contexts: ジョブコンテキストのリスト（department でまとめる）
+        template_cache: テンプレートキャッシュ（省略時はプロセス共有のキャッシュ）
+        progress_callback: 1件ごとの進捗通知コールバック（任意）
+        cancel_token: 中断トークン（任意）。ワークブック単位で確認する
+        max_workers: CSV読み込みの同時実行数
+        summary: 部署別集計のコレクター（任意）
+        exporter: 引き渡し用ZIP（任意）。保存できたワークブックを順に書き込む（close は呼び出し側）
+
+    Returns:
+        結果辞書（KintenProcessor.process_batch と同じ形式 + department_files）
+    """
+    cache = template_cache or default_template_cache
+    # 部署名はファイル名と部署別の集計・結果のラベルで同じ表記にする
+    contexts = [replace(normalize_context(ctx), department=safe_department_name(ctx.department) if ctx.department else '')
+                for ctx in contexts]
+    total = len(contexts)
+    processed: Dict[int, Dict[str, Any]] = {}
+    failed: Dict[int, Dict[str, Any]] = {}
+    department_files: List[Dict[str, Any]] = []
+
+    def _finish(position: int, result: Dict[str, Any]) -> None:
+        done = len(processed) + len(failed) + 1
+        if result.get('success'):
+            processed[position] = result
+            notify_progress(progress_callback, 'item', dict(result, status='processed', index=done, total=total))
+        else:
+            failed[position] = {'file': contexts[position].csv_path, 'error': result.get('error', '')}
+            if 'validation' in result:
+                failed[position]['validation'] = result['validation']
+            notify_progress(progress_callback, 'item', dict(failed[position], status='failed', index=done, total=total))
+        notify_progress(progress_callback, 'progress', {'done': done, 'total': total})
+
+    # 1. CSV読み込み（年月が分かるまでまとめ先が決まらないため先に全件読む）
+    if max_workers <= 1 or total <= 1:
+        parsed = [_parse(ctx) for ctx in contexts]
+    else:
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            parsed = list(executor.map(_parse, contexts))
+
+    # 2. 部署×年月（×テンプレート）でまとめる（入力順を保つ）
+    groups: Dict[Tuple[str, str, str], List[Tuple[int, CSVData]]] = {}
+    for position, (csv_data, error_result) in enumerate(parsed):
+        if csv_data is None:
+            _finish(position, error_result or {'success': False, 'error': 'CSV読み込みエラー'})
+            continue
+        key = (csv_data.year_month, contexts[position].department, contexts[position].template_path)
+        groups.setdefault(key, []).append((position, csv_data))
+    # 同じ部署・年月で取引先のテンプレートが異なる場合はファイル名にテンプレートIDを付ける
+    template_counts: Dict[Tuple[str, str], int] = {}
+    for year_month, department, _ in groups:
+        template_counts[(year_month, department)] = template_counts.get((year_month, department), 0) + 1
+
+    # 3. まとまりごとにテンプレートを1回読み込み、シートを複製して転記 → 1回だけ保存
+    for (year_month, department, template_path), members in groups.items():
+        if is_cancelled(cancel_token):
+            break
+        try:
+            workbook = cache.load(template_path)
+            template_sheet = get_template_sheet(workbook, plan_for_template(template_path).sheet_name)
+        except Exception as e:
+            for position, _ in members:
+                _finish(position, {'success': False, 'error': f"Excel読み込みエラー: {str(e)}"})
+            continue
+
+        filled: List[Tuple[int, CSVData, str]] = []
+        for position, csv_data in members:
+            sheet = clone_template_sheet(workbook, template_sheet)
+            try:
+                fill_sheet(sheet, contexts[position], csv_data)
+            except JobError as e:
+                workbook.remove(sheet)
+                _finish(position, e.to_result())
+                continue
+            filled.append((position, csv_data, sheet.title))
+        workbook.remove(template_sheet)
+        if not filled:
+            continue
+
+        if is_cancelled(cancel_token):
+            break
+        output_folder = output_folder_for(contexts[members[0][0]].base_output_dir, year_month)
+        os.makedirs(output_folder, exist_ok=True)
+        template_id = template_id_for(template_path) if template_counts[(year_month, department)] > 1 else ''
+        filename = department_filename_for(year_month, department, template_id)
+        save_result = save_workbook_to(workbook, os.path.join(output_folder, filename),
+                                       deterministic=contexts[members[0][0]].deterministic)
+        if not save_result['success']:
+            for position, _, _ in filled:
+                _finish(position, {'success': False, 'error': f"ファイル保存エラー: {save_result['error']}"})
+            continue
+
+        output_path = save_result['output_path']
+        department_files.append({
+            'department': department,
+            'year_month': year_month,
+            'output_path': output_path,
+            'sheet_count': len(filled)
+        })
+        if exporter is not None:
+            exporter.add(output_path)
+        for position, csv_data, sheet_name in filled:
+            result = build_job_result(contexts[position], csv_data, output_path, output_folder, summary)
+            result['sheet_name'] = sheet_name
+            _finish(position, result)
+
+    processed_files = [processed[i] for i in sorted(processed)]
+    failed_files = [failed[i] for i in sorted(failed)]
+    batch_result: Dict[str, Any] = {
+        'success': len(processed_files) > 0 or total == 0,
+        'processed_files': processed_files,
+        'failed_files': failed_files,
+        'total_processed': len(processed_files),
+        'total_failed': len(failed_files),
+        'department_files': department_files
+    }
+    if not batch_result['success']:
+        batch_result['error'] = 'すべてのCSVの処理に失敗しました'
+    finished = set(processed) | set(failed)
+    if len(finished) < total:
+        batch_result.update(cancelled_result(cancel_token))
+        batch_result['skipped_files'] = [ctx.csv_path for i, ctx in enumerate(contexts) if i not in finished]
+    return batch_result
@@ -5,19 +5,264 @@ Excel処理機能
 テンプレートExcelにデータを転記する
 """
 
+import io
+import re
+import zipfile
 import openpyxl
 import pandas as pd
-from typing import Dict, Any, Optional
+from typing import Dict, Any, List, Optional, Tuple
 import os
-from datetime import datetime
+from datetime import datetime, timezone
+
+from attendance import AttendanceTable
+from cell_mapping import CellPlan, DEFAULT_CELL_PLAN
+from file_output import commit_file, content_hash, discard, same_content, temp_path_for
+
+
+TEMPLATE_SHEET_NAME = "勤務表"
+
+
+class TemplateCache:
+    """
+    テンプレートExcelのバイト列キャッシュ（複数ジョブ・スレッドで共有可能）
+
+    openpyxlのWorkbookは可変なためジョブ間で共有できない。
+    そこでファイル内容（不変のbytes）をキャッシュし、各ジョブはメモリ上から
+    独立したWorkbookを生成する。ファイルが更新された場合は自動で読み直す。
+    """
+
+    def __init__(self):
+        self._entries: Dict[str, Tuple[Tuple[int, int], bytes]] = {}
+
+    def get_bytes(self, template_path: str) -> bytes:
+        """テンプレートのバイト列を取得（更新日時・サイズが変わっていれば再読み込み）"""
+        key = os.path.abspath(template_path)
+        st = os.stat(key)
+        stamp = (st.st_mtime_ns, st.st_size)
+        entry = self._entries.get(key)
+        if entry is not None and entry[0] == stamp:
+            return entry[1]
+        with open(key, 'rb') as f:
+            data = f.read()
+        # 同時に読み込まれても同じ内容で上書きされるだけなのでロック不要
+        self._entries[key] = (stamp, data)
+        return data
+
+    def load(self, template_path: str):
+        """ジョブ専用の新しいWorkbookを生成"""
+        return openpyxl.load_workbook(io.BytesIO(self.get_bytes(template_path)))
+
+
+# プロセス内で共有するテンプレートキャッシュ
+default_template_cache = TemplateCache()
+
+
+def get_template_sheet(workbook, sheet_name: str = TEMPLATE_SHEET_NAME):
+    """テンプレートの転記先シート（既定は「勤務表」）を取得"""
+    if sheet_name in workbook.sheetnames:
+        return workbook[sheet_name]
+    raise ValueError(f"テンプレートに「{sheet_name}」シートが見つかりません")
+
+
+def clone_template_sheet(workbook, template_sheet):
+    """
+    テンプレートシートを同じワークブック内に複製
+
+    copy_worksheet はセル・書式・結合・列幅・ページ設定のみ複製するため、
+    条件付き書式・印刷範囲・表示設定（改ページプレビュー）は個別に引き継ぐ。
+    """
+    sheet = workbook.copy_worksheet(template_sheet)
+    for cf_range in template_sheet.conditional_formatting:
+        for rule in cf_range.rules:
+            sheet.conditional_formatting.add(str(cf_range.sqref), rule)
+    if template_sheet.print_area:
+        sheet.print_area = template_sheet.print_area.split('!')[-1]
+    sheet.sheet_view.view = template_sheet.sheet_view.view
+    sheet.sheet_view.zoomScale = template_sheet.sheet_view.zoomScale
+    sheet.sheet_view.zoomScaleNormal = template_sheet.sheet_view.zoomScaleNormal
+    sheet.sheet_view.zoomScalePageLayoutView = template_sheet.sheet_view.zoomScalePageLayoutView
+    sheet.sheet_view.showGridLines = template_sheet.sheet_view.showGridLines
+    return sheet
+
+
+def build_sheet_name(year_month: str, employee_name: str = "") -> str:
+    """年月と氏名からシート名を生成"""
+    # 氏名が指定されている場合は含める
+    if employee_name and employee_name.strip():
+        return f"勤怠表_{year_month}_{employee_name}"
+    return f"勤怠表_{year_month}"
+
+
+def write_employee_info_to_sheet(sheet, employee_name: str, year: str, month: str,
+                                 plan: Optional[CellPlan] = None) -> None:
+    """従業員情報をシートへ書き込み（既定は G6: 従業員名 / F5: 年 / H5: 月）"""
+    (plan or DEFAULT_CELL_PLAN).write_header(sheet, employee_name, f"{year}{int(month):02d}")
+
+
+def attendance_row_values(df: pd.DataFrame, table: Optional[AttendanceTable] = None,
+                          plan: Optional[CellPlan] = None) -> List[Tuple[int, Tuple[Any, ...]]]:
+    """
+    転記する行ごとの値を作成
+
+    Args:
+        df: 勤怠データDataFrame（C/D/H列の元の値に使用）
+        table: 分単位の勤怠表（省略時は df から構築）。E/F列は整数分から算出する
+        plan: 書き込み計画（省略時は現行テンプレートの計画）
+
+    Returns:
+        (行番号, 計画の列順の値) のリスト
+    """
+    return (plan or DEFAULT_CELL_PLAN).row_values(df, table)
+
+
+def write_attendance_row(sheet, row: int, values: Tuple[Any, ...], plan: Optional[CellPlan] = None) -> None:
+    """1日分の値（attendance_row_values の要素）を転記"""
+    (plan or DEFAULT_CELL_PLAN).write_row(sheet, row, values)
+
+
+def write_attendance_rows(sheet, df: pd.DataFrame, table: Optional[AttendanceTable] = None,
+                          plan: Optional[CellPlan] = None) -> None:
+    """
+    勤怠データをシートへ転記
+
+    Args:
+        sheet: 転記先シート
+        df: 勤怠データDataFrame（C/D/H列の元の値に使用）
+        table: 分単位の勤怠表（省略時は df から構築）。E/F列は整数分から算出する
+        plan: 書き込み計画（省略時は現行テンプレートの計画）
+    """
+    plan = plan or DEFAULT_CELL_PLAN
+    for row, values in plan.row_values(df, table):
+        plan.write_row(sheet, row, values)
+
+
+def reproducible_timestamp() -> datetime:
+    """
+    再現可能な出力に記録する固定日時
+
+    環境変数 SOURCE_DATE_EPOCH があればその日時、無ければZIPで表せる最小の日時（1980-01-01）。
+    """
+    epoch = os.environ.get('SOURCE_DATE_EPOCH')
+    if epoch:
+        try:
+            return max(datetime(1980, 1, 1), datetime.fromtimestamp(int(epoch), timezone.utc).replace(tzinfo=None))
+        except (ValueError, OverflowError, OSError):
+            pass
+    return datetime(1980, 1, 1)
+
+
+_CORE_DATE_PATTERN = re.compile(rb'(<dcterms:(created|modified)[^>]*>)[^<]*(</dcterms:\2>)')
+
+
+def workbook_bytes(workbook, deterministic: bool = False) -> bytes:
+    """
+    ワークブックをxlsxのバイト列に変換
+
+    deterministic=True の場合は同じ内容から常に同じバイト列になるよう、
+    ZIPの各エントリの日時・属性・並び順と文書プロパティの作成/更新日時を固定する。
+    """
+    buffer = io.BytesIO()
+    workbook.save(buffer)
+    if not deterministic:
+        return buffer.getvalue()
+
+    timestamp = reproducible_timestamp()
+    w3cdtf = timestamp.strftime('%Y-%m-%dT%H:%M:%SZ').encode('ascii')
+    output = io.BytesIO()
+    with zipfile.ZipFile(buffer) as source, zipfile.ZipFile(output, 'w', zipfile.ZIP_DEFLATED) as target:
+        # [Content_Types].xml を先頭に、残りは名前順
+        names = sorted(source.namelist(), key=lambda name: (name != '[Content_Types].xml', name))
+        for name in names:
+            content = source.read(name)
+            if name == 'docProps/core.xml':
+                content = _CORE_DATE_PATTERN.sub(lambda m: m.group(1) + w3cdtf + m.group(3), content)
+            info = zipfile.ZipInfo(name, date_time=timestamp.timetuple()[:6])
+            info.compress_type = zipfile.ZIP_DEFLATED
+            info.create_system = 0  # 作成OSによる差をなくす
+            info.external_attr = 0
+            target.writestr(info, content)
+    return output.getvalue()
+
+
+def save_workbook_to(workbook, output_path: str, allow_rename: bool = True,
+                     deterministic: bool = False) -> Dict[str, Any]:
+    """
+    ワークブックを保存
+    
+    Args:
+        workbook: 保存するワークブック
+        output_path: 出力ファイルパス
+        allow_rename: 既存ファイルが使用中の場合にタイムスタンプ付きの別名で保存するかどうか
+                      （False の場合は権限エラーとして返す）
+        deterministic: 同じ内容から常に同じバイト列を出力する（既存ファイルと同一なら書き込まない）
+        
+    Returns:
+        処理結果辞書
+    """
+    try:
+        if workbook is None:
+            return {
+                'success': False,
+                'error': "ワークブックが初期化されていません"
+            }
+        
+        data = None
+        if deterministic:
+            # 内容が同じなら書き込まない（更新日時が変わらないため同期ツールが転送を省ける）
+            data = workbook_bytes(workbook, deterministic=True)
+            if same_content(output_path, data):
+                return {
+                    'success': True,
+                    'output_path': output_path,
+                    'content_hash': content_hash(data),
+                    'unchanged': True
+                }
+        
+        # 同じフォルダの一時ファイルへ保存してから置き換える（並列実行・中断時も書きかけのファイルを残さない）
+        temp_path = temp_path_for(output_path)
+        try:
+            if data is None:
+                workbook.save(temp_path)
+            else:
+                with open(temp_path, 'xb') as f:
+                    f.write(data)
+        except BaseException:
+            discard(temp_path)
+            raise
+        # 既存ファイルが使用中の場合は、タイムスタンプを付けた衝突しない名前で保存
+        output_path = commit_file(temp_path, output_path, rename_if_locked=allow_rename)
+        
+        result = {
+            'success': True,
+            'output_path': output_path
+        }
+        if data is not None:
+            result['content_hash'] = content_hash(data)
+            result['unchanged'] = False
+        return result
+        
+    except PermissionError as e:
+        return {
+            'success': False,
+            'error': f"権限エラー: ファイル '{output_path}' にアクセスできません。ファイルが他のアプリケーションで使用中か、権限が不足しています。"
+        }
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Save workbook error: {error_details}")
+        return {
+            'success': False,
+            'error': f"ファイル保存エラー: {str(e)}"
+        }
 
 
 class ExcelProcessor:
     """Excel処理クラス"""
     
-    def __init__(self):
+    def __init__(self, template_cache: Optional[TemplateCache] = None):
         self.workbook = None  # type: ignore
         self.sheet = None  # type: ignore
+        self.template_cache = template_cache or default_template_cache
     
     def load_template(self, template_path: str) -> Dict[str, Any]:
         """
@@ -30,13 +275,10 @@ class ExcelProcessor:
             処理結果辞書
         """
         try:
-            self.workbook = openpyxl.load_workbook(template_path)
+            self.workbook = self.template_cache.load(template_path)
             
             # 初期シート名「勤務表」を取得
-            if "勤務表" in self.workbook.sheetnames:
-                self.sheet = self.workbook["勤務表"]
-            else:
-                raise ValueError("テンプレートに「勤務表」シートが見つかりません")
+            self.sheet = get_template_sheet(self.workbook)
             
             if self.sheet is None:
                 return {
@@ -70,11 +312,7 @@ class ExcelProcessor:
                 print("シートまたはワークブックが初期化されていません")
                 return False
                 
-            # 氏名が指定されている場合は含める
-            if employee_name and employee_name.strip():
-                new_sheet_name = f"勤怠表_{year_month}_{employee_name}"
-            else:
-                new_sheet_name = f"勤怠表_{year_month}"
+            new_sheet_name = build_sheet_name(year_month, employee_name)
             
             print(f"シート名を変更: {new_sheet_name}")
             
@@ -102,16 +340,7 @@ class ExcelProcessor:
                 print("シートが初期化されていません")
                 return False
                 
-            # G6: 従業員名
-            self.sheet['G6'] = employee_name
-            
-            # F5: 年
-            self.sheet['F5'] = year
-            
-            # H5: 月（先頭の0を除去して数値として設定）
-            month_num = int(month)  # "06" → 6
-            self.sheet['H5'] = month_num
-            
+            write_employee_info_to_sheet(self.sheet, employee_name, year, month)
             return True
             
         except Exception as e:
@@ -131,97 +360,13 @@ class ExcelProcessor:
                 print("シートが初期化されていません")
                 return False
                 
-            # A11以降にデータを転記
-            start_row = 11
-            
-            for index, row in df.iterrows():
-                current_row = start_row + int(index)  # type: ignore
-                
-                # A列・B列: 日付と曜日は編集しない（雛形ファイルの関数が自動生成）
-                # H5セルの月数を基準に雛形ファイルの関数が自動的に日付と曜日を設定
-                
-                # C列: 始業時刻
-                self.sheet[f'C{current_row}'] = row['始業時刻1']
-                
-                # D列: 終業時刻
-                self.sheet[f'D{current_row}'] = row['終業時刻1']
-                
-                # E列: 休憩時間（始業時刻と終業時刻がある場合は1:00）
-                if pd.notna(row['始業時刻1']) and pd.notna(row['終業時刻1']) and \
-                   str(row['始業時刻1']).strip() != '' and str(row['終業時刻1']).strip() != '':
-                    self.sheet[f'E{current_row}'] = '1:00'
-                else:
-                    self.sheet[f'E{current_row}'] = ''
-                
-                # F列: 勤務時間（就業時間-始業時間-休憩時間）
-                work_hours = self._calculate_work_hours(
-                    row['始業時刻1'], 
-                    row['終業時刻1'], 
-                    '1:00'  # 固定の休憩時間
-                )
-                if work_hours > 0:
-                    self.sheet[f'F{current_row}'] = work_hours
-                else:
-                    self.sheet[f'F{current_row}'] = ''
-                
-                # G列: 記入不要
-                # 何も設定しない
-                
-                # H列: 詳細・備考（勤怠メモ）
-                memo = row.get('勤怠メモ', '')
-                if memo and str(memo).strip() != '':
-                    self.sheet[f'H{current_row}'] = memo
-            
+            write_attendance_rows(self.sheet, df)
             return True
             
         except Exception as e:
             print(f"勤怠データ転記エラー: {e}")
             return False
     
-    def _calculate_work_hours(self, start_time, end_time, break_time):
-        """
-        勤務時間を計算（就業時間-始業時間-休憩時間）
-        
-        Args:
-            start_time: 始業時刻
-            end_time: 終業時刻
-            break_time: 休憩時間
-            
-        Returns:
-            勤務時間（時間単位、例：8.5）
-        """
-        try:
-            # 空の値の場合は0を返す
-            if pd.isna(start_time) or pd.isna(end_time) or \
-               str(start_time).strip() == '' or str(end_time).strip() == '':
-                return 0
-            
-            # 時刻を時間に変換
-            def time_to_hours(time_str):
-                if pd.isna(time_str) or str(time_str).strip() == '':
-                    return 0
-                
-                time_str = str(time_str).strip()
-                if ':' in time_str:
-                    hours, minutes = map(int, time_str.split(':'))
-                    return hours + minutes / 60.0
-                else:
-                    return 0
-            
-            start_hours = time_to_hours(start_time)
-            end_hours = time_to_hours(end_time)
-            break_hours = time_to_hours(break_time)
-            
-            # 勤務時間 = 終業時刻 - 始業時刻 - 休憩時間
-            work_hours = end_hours - start_hours - break_hours
-            
-            # 負の値や0の場合は0を返す
-            return max(0, round(work_hours, 1))
-            
-        except Exception as e:
-            print(f"勤務時間計算エラー: {e}")
-            return 0
-    
     def save_workbook(self, output_path: str) -> Dict[str, Any]:
         """
         ワークブックを保存
@@ -232,49 +377,4 @@ class ExcelProcessor:
         Returns:
             処理結果辞書
         """
-        try:
-            # 出力ディレクトリの存在確認と作成
-            output_dir = os.path.dirname(output_path)
-            if not os.path.exists(output_dir):
-                os.makedirs(output_dir, exist_ok=True)
-            
-            # ファイルが既に存在する場合の処理
-            if os.path.exists(output_path):
-                # ファイルが使用中かチェック
-                try:
-                    with open(output_path, 'r+b') as f:
-                        pass
-                except PermissionError:
-                    # ファイルが使用中の場合は、タイムスタンプを付けて新しいファイル名を生成
-                    base_name = os.path.splitext(output_path)[0]
-                    extension = os.path.splitext(output_path)[1]
-                    timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                    output_path = f"{base_name}_{timestamp}{extension}"
-                    print(f"File is in use, saving as: {output_path}")
-            
-            # ファイル保存
-            if self.workbook is None:
-                return {
-                    'success': False,
-                    'error': "ワークブックが初期化されていません"
-                }
-            self.workbook.save(output_path)
-            
-            return {
-                'success': True,
-                'output_path': output_path
-            }
-            
-        except PermissionError as e:
-            return {
-                'success': False,
-                'error': f"権限エラー: ファイル '{output_path}' にアクセスできません。ファイルが他のアプリケーションで使用中か、権限が不足しています。"
-            }
-        except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Save workbook error: {error_details}")
-            return {
-                'success': False,
-                'error': f"ファイル保存エラー: {str(e)}"
-            } 
\ No newline at end of file
+        return save_workbook_to(self.workbook, output_path)
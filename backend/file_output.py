@@ -0,0 +1,193 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+出力ファイルの書き込み
+並列に動く複数のジョブが同じ年月フォルダへ書き込んでも安全なよう、出力は同じフォルダの
+一時ファイルへ書き込み、fsync してから名前を変えて確定する（途中で落ちても書きかけの
+ファイルが出力名で残らない）。
+
+- 上書きする出力（ワークブック・reportlab のPDF・サイドカー等）は os.replace で置き換える
+- 上書きしない出力（Excel によるPDF等）は既存ファイルと衝突しない名前で確定する
+  （名前の予約はOSの排他作成で行うため、同じ秒に確定しても重ならない）
+- 再現可能な出力（同じ入力から同じバイト列）は、既存ファイルと内容が同じなら書き込まずに
+  更新日時を保つ（同期ツール・キャッシュが変更なしと判定できる）
+"""
+
+import hashlib
+import os
+import secrets
+from contextlib import contextmanager
+from datetime import datetime
+from typing import IO, Iterator, Optional
+
+
+def content_hash(data: bytes) -> str:
+    """出力内容のハッシュ（SHA-256。再現可能な出力ではキャッシュのキーに使える）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+def same_content(path: str, data: bytes) -> bool:
+    """既存ファイルの内容が data と同じか（サイズが違えば読まない）"""
+    try:
+        if os.path.getsize(path) != len(data):
+            return False
+        with open(path, 'rb') as f:
+            return f.read() == data
+    except OSError:
+        return False
+
+
+def temp_path_for(path: str) -> str:
+    """
+    出力と同じフォルダの一時ファイルのパス（ファイルは作成しない）
+
+    名前は出力名から作った隠しファイルに乱数を付けたもの。拡張子は出力と同じにする
+    （Excel など拡張子で形式を判断するアプリに渡せるように）。
+    """
+    folder, name = os.path.split(os.path.abspath(path))
+    stem, extension = os.path.splitext(name)
+    os.makedirs(folder, exist_ok=True)
+    return os.path.join(folder, f".{stem}.{secrets.token_hex(6)}.tmp{extension}")
+
+
+def candidate_paths(path: str) -> Iterator[str]:
+    """衝突時の出力名の候補（元の名前 → _日時 → _日時_2 …）"""
+    yield path
+    base_name, extension = os.path.splitext(path)
+    timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
+    yield f"{base_name}_{timestamp}{extension}"
+    number = 2
+    while True:
+        yield f"{base_name}_{timestamp}_{number}{extension}"
+        number += 1
+
+
+def discard(path: Optional[str]) -> None:
+    """一時ファイルを削除（無ければ何もしない）"""
+    try:
+        if path and os.path.exists(path):
+            os.remove(path)
+    except OSError:
+        pass
+
+
+def _fsync_file(path: str) -> None:
+    # Windows の fsync は書き込み可能なハンドルが必要
+    with open(path, 'r+b') as f:
+        os.fsync(f.fileno())
+
+
+def _fsync_dir(folder: str) -> None:
+    """名前の変更をディスクへ反映（フォルダを開けないWindowsでは何もしない）"""
+    if os.name == 'nt':
+        return
+    try:
+        fd = os.open(folder, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+def _publish_new(temp_path: str, path: str, skip_first: bool = False) -> str:
+    """既存ファイルを上書きせずに衝突しない名前で確定"""
+    candidates = candidate_paths(path)
+    if skip_first:
+        next(candidates)
+    for candidate in candidates:
+        try:
+            # ハードリンクは既存の名前があれば失敗するため、確認と確定が1回の操作になる
+            os.link(temp_path, candidate)
+        except FileExistsError:
+            continue
+        except (OSError, NotImplementedError, AttributeError):
+            # ハードリンク非対応のファイルシステムでは、排他作成で名前を予約してから置き換える
+            try:
+                fd = os.open(candidate, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                continue
+            os.close(fd)
+            os.replace(temp_path, candidate)
+            return candidate
+        os.remove(temp_path)
+        return candidate
+
+
+def commit_file(temp_path: str, path: str, overwrite: bool = True, rename_if_locked: bool = False) -> str:
+    """
+    一時ファイルを fsync して出力名で確定
+
+    Args:
+        temp_path: 書き込み済みの一時ファイル（temp_path_for で作成したもの）
+        path: 出力ファイルパス
+        overwrite: 既存ファイルを置き換えるかどうか（False の場合は衝突しない別名で確定）
+        rename_if_locked: 既存ファイルが使用中で置き換えられない場合に別名で確定するかどうか
+
+    Returns:
+        確定した出力ファイルのパス
+
+    Raises:
+        PermissionError: 既存ファイルが使用中で rename_if_locked が False の場合（一時ファイルは削除する）
+    """
+    try:
+        _fsync_file(temp_path)
+        if not overwrite:
+            committed = _publish_new(temp_path, path)
+        else:
+            try:
+                os.replace(temp_path, path)
+                committed = path
+            except PermissionError:
+                # Windows では他のアプリが開いているファイルを置き換えられない
+                if not rename_if_locked:
+                    raise
+                committed = _publish_new(temp_path, path, skip_first=True)
+                print(f"File is in use, saving as: {committed}")
+    except BaseException:
+        discard(temp_path)
+        raise
+    _fsync_dir(os.path.dirname(os.path.abspath(committed)))
+    return committed
+
+
+@contextmanager
+def atomic_write(path: str, mode: str = 'wb', encoding: Optional[str] = None,
+                 newline: Optional[str] = None) -> Iterator[IO]:
+    """
+    一時ファイルへ書き込み、正常に抜けた場合だけ出力名で確定する（例外時は元のファイルを残す）
+
+    使用例:
+        with atomic_write(path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+    """
+    temp_path = temp_path_for(path)
+    try:
+        with open(temp_path, mode.replace('w', 'x'), encoding=encoding, newline=newline) as f:
+            yield f
+    except BaseException:
+        discard(temp_path)
+        raise
+    commit_file(temp_path, path)
+
+
+def write_bytes_atomic(path: str, data: bytes) -> None:
+    """バイト列を出力ファイルとして確定"""
+    with atomic_write(path) as f:
+        f.write(data)
+
+
+def write_bytes_if_changed(path: str, data: bytes) -> bool:
+    """
+    内容が変わった場合だけ書き込む
+
+    Returns:
+        書き込んだ場合は True（既存ファイルと同じ内容なら False）
+    """
+    if same_content(path, data):
+        return False
+    write_bytes_atomic(path, data)
+    return True
@@ -0,0 +1,699 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+数式の計算（Excel を使わないPDF出力用）
+openpyxl は数式を計算しないため、テンプレートで使う範囲の関数を自前で評価する。
+
+対応: 四則演算・べき乗・文字列連結(&)・比較、DATE / YEAR / MONTH / DAY / WEEKDAY / TEXT /
+HOUR / MINUTE / SECOND / ROUND / ROUNDUP / ROUNDDOWN / INT / ABS / SUM / MIN / MAX /
+IF / AND / OR / NOT
+日付は Excel と同じシリアル値（1899-12-30 起点）で扱う。
+
+数式は相対参照を R1C1 形式にそろえた文字列をキーにして1回だけコンパイルするため、
+B11〜B41 のように行ごとに同じ形の数式は1つのコンパイル結果を共有する。
+"""
+
+import math
+import re
+from dataclasses import dataclass, field
+from datetime import date, timedelta
+from decimal import Decimal, ROUND_HALF_UP, ROUND_UP, ROUND_DOWN
+from typing import Dict, Any, Callable, List, Optional, Tuple
+
+# openpyxl が無い環境でも import できるようにする（読み込みの可否は呼び出し側で判定）
+try:
+    from openpyxl.utils import column_index_from_string
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+
+_EPOCH = date(1899, 12, 30)
+
+_TOKEN = re.compile(r'''
+    (?P<ws>\s+)
+  | (?P<string>"(?:[^"]|"")*")
+  | (?P<range>\$?[A-Za-z]{1,3}\$?\d+:\$?[A-Za-z]{1,3}\$?\d+)
+  | (?P<func>[A-Za-z][A-Za-z0-9.]*(?=\())
+  | (?P<bool>TRUE|FALSE)(?![A-Za-z0-9(])
+  | (?P<ref>\$?[A-Za-z]{1,3}\$?\d+)(?![A-Za-z0-9(])
+  | (?P<number>\d+(?:\.\d*)?(?:[eE][+-]?\d+)?|\.\d+)
+  | (?P<op><>|<=|>=|[-+*/^&=<>%(),])
+''', re.VERBOSE)
+
+_REF = re.compile(r'(\$?)([A-Za-z]{1,3})(\$?)(\d+)')
+
+
+class FormulaError(Exception):
+    """対応していない数式（構文・関数・参照）"""
+
+
+class ExcelError:
+    """#VALUE! などの計算エラー値"""
+
+    def __init__(self, code: str):
+        self.code = code
+
+    def __repr__(self) -> str:
+        return self.code
+
+    def __eq__(self, other: Any) -> bool:
+        return isinstance(other, ExcelError) and other.code == self.code
+
+    def __hash__(self) -> int:
+        return hash(self.code)
+
+
+VALUE_ERROR = ExcelError('#VALUE!')
+DIV0_ERROR = ExcelError('#DIV/0!')
+NUM_ERROR = ExcelError('#NUM!')
+REF_ERROR = ExcelError('#REF!')
+
+
+# ---------------------------------------------------------------------------
+# 値の変換
+
+class _Range:
+    """セル範囲（SUM などの引数用）"""
+
+    def __init__(self, values: List[Any]):
+        self.values = values
+
+
+def _date_to_serial(value: date) -> float:
+    return float((value - _EPOCH).days)
+
+
+def _to_number(value: Any) -> Any:
+    """算術用の数値変換（空欄は0、数値・時刻・日付の文字列は値に変換、変換不能は #VALUE!）"""
+    if isinstance(value, ExcelError):
+        return value
+    if value is None or value == '':
+        return 0.0 if value is None else VALUE_ERROR
+    if isinstance(value, bool):
+        return 1.0 if value else 0.0
+    if isinstance(value, (int, float)):
+        return float(value)
+    if hasattr(value, 'year') and hasattr(value, 'month'):
+        serial = _date_to_serial(date(value.year, value.month, value.day))
+        if hasattr(value, 'hour'):
+            serial += (value.hour * 3600 + value.minute * 60 + value.second) / 86400.0
+        return serial
+    if hasattr(value, 'hour'):
+        return (value.hour * 3600 + value.minute * 60 + value.second) / 86400.0
+    if isinstance(value, timedelta):
+        return value.total_seconds() / 86400.0
+    text = str(value).strip()
+    try:
+        return float(text.replace(',', ''))
+    except ValueError:
+        pass
+    match = re.fullmatch(r'(\d{1,4}):(\d{1,2})(?::(\d{1,2}))?', text)
+    if match:
+        hours, minutes, seconds = int(match.group(1)), int(match.group(2)), int(match.group(3) or 0)
+        return (hours * 3600 + minutes * 60 + seconds) / 86400.0
+    match = re.fullmatch(r'(\d{4})[/-](\d{1,2})[/-](\d{1,2})', text)
+    if match:
+        try:
+            return _date_to_serial(date(int(match.group(1)), int(match.group(2)), int(match.group(3))))
+        except ValueError:
+            return VALUE_ERROR
+    return VALUE_ERROR
+
+
+def _to_text(value: Any) -> Any:
+    if isinstance(value, ExcelError):
+        return value
+    if value is None:
+        return ''
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, float):
+        return str(int(value)) if value.is_integer() else f"{value:.15g}"
+    return str(value)
+
+
+def _to_bool(value: Any) -> Any:
+    if isinstance(value, ExcelError):
+        return value
+    if value is None:
+        return False
+    if isinstance(value, bool):
+        return value
+    if isinstance(value, (int, float)):
+        return value != 0
+    text = str(value).upper()
+    if text in ('TRUE', 'FALSE'):
+        return text == 'TRUE'
+    return VALUE_ERROR
+
+
+def _serial_to_date(serial: float) -> Optional[date]:
+    if serial < 1:
+        return None
+    return _EPOCH + timedelta(days=int(math.floor(serial)))
+
+
+def _seconds_of_day(serial: float) -> int:
+    return int(round((serial - math.floor(serial)) * 86400)) % 86400
+
+
+def _round(value: float, digits: int, mode) -> float:
+    quantum = Decimal(1).scaleb(-digits)
+    result = Decimal(repr(abs(value))).quantize(quantum, rounding=mode)
+    return float(result) * (-1 if value < 0 else 1)
+
+
+def _compare(left: Any, right: Any) -> int:
+    """Excel の比較順（数値 < 文字列 < 論理値、空欄は相手の型の空値）"""
+    def _rank(value: Any) -> int:
+        if isinstance(value, bool):
+            return 2
+        if isinstance(value, str):
+            return 1
+        return 0
+    if left is None:
+        left = '' if isinstance(right, str) else (False if isinstance(right, bool) else 0.0)
+    if right is None:
+        right = '' if isinstance(left, str) else (False if isinstance(left, bool) else 0.0)
+    if hasattr(left, 'year') or hasattr(left, 'hour'):
+        left = _to_number(left)
+    if hasattr(right, 'year') or hasattr(right, 'hour'):
+        right = _to_number(right)
+    lr, rr = _rank(left), _rank(right)
+    if lr != rr:
+        return -1 if lr < rr else 1
+    if isinstance(left, str):
+        left, right = left.lower(), right.lower()
+    return (left > right) - (left < right)
+
+
+# ---------------------------------------------------------------------------
+# 関数
+
+def _numbers(args: List[Any]) -> Any:
+    """SUM/MIN/MAX 用: 範囲内は数値のみ、直接の引数は数値に変換"""
+    result: List[float] = []
+    for arg in args:
+        if isinstance(arg, _Range):
+            for value in arg.values:
+                if isinstance(value, ExcelError):
+                    return value
+                if isinstance(value, (int, float)) and not isinstance(value, bool):
+                    result.append(float(value))
+        else:
+            number = _to_number(arg)
+            if isinstance(number, ExcelError):
+                return number
+            result.append(number)
+    return result
+
+
+def _fn_date(year: float, month: float, day: float) -> Any:
+    year, month, day = int(year), int(month), int(day)
+    if 0 <= year < 1900:
+        year += 1900
+    year += (month - 1) // 12
+    month = (month - 1) % 12 + 1
+    try:
+        return _date_to_serial(date(year, month, 1)) + day - 1
+    except ValueError:
+        return NUM_ERROR
+
+
+def _fn_weekday(serial: float, return_type: float = 1) -> Any:
+    # シリアル値 1（1900/1/1）を日曜とする Excel の暦に合わせる
+    sunday_based = int(math.floor(serial) - 1) % 7  # 日=0 … 土=6
+    return_type = int(return_type)
+    if return_type == 1:
+        return float(sunday_based + 1)
+    if return_type == 2:
+        return float((sunday_based + 6) % 7 + 1)
+    if return_type == 3:
+        return float((sunday_based + 6) % 7)
+    return NUM_ERROR
+
+
+def _fn_day(serial: float) -> Any:
+    if serial < 0:
+        return NUM_ERROR
+    day = _serial_to_date(serial)
+    return 0.0 if day is None else float(day.day)
+
+
+def _fn_month(serial: float) -> Any:
+    if serial < 0:
+        return NUM_ERROR
+    day = _serial_to_date(serial)
+    return 1.0 if day is None else float(day.month)
+
+
+def _fn_year(serial: float) -> Any:
+    if serial < 0:
+        return NUM_ERROR
+    day = _serial_to_date(serial)
+    return 1900.0 if day is None else float(day.year)
+
+
+def _fn_text(value: Any, number_format: Any) -> Any:
+    from sheet_renderer import format_value
+    if isinstance(value, str):
+        number = _to_number(value)
+        value = value if isinstance(number, ExcelError) else number
+    return format_value(value, _to_text(number_format))
+
+
+# (関数, 引数の変換: 'n'=数値 / 't'=文字列 / 'a'=そのまま, 最小引数, 最大引数)
+_NUMERIC_FUNCTIONS: Dict[str, Tuple[Callable[..., Any], int, int]] = {
+    'DATE': (_fn_date, 3, 3),
+    'YEAR': (_fn_year, 1, 1),
+    'MONTH': (_fn_month, 1, 1),
+    'DAY': (_fn_day, 1, 1),
+    'WEEKDAY': (_fn_weekday, 1, 2),
+    'HOUR': (lambda s: float(_seconds_of_day(s) // 3600), 1, 1),
+    'MINUTE': (lambda s: float(_seconds_of_day(s) // 60 % 60), 1, 1),
+    'SECOND': (lambda s: float(_seconds_of_day(s) % 60), 1, 1),
+    'ROUND': (lambda v, d=0: _round(v, int(d), ROUND_HALF_UP), 1, 2),
+    'ROUNDUP': (lambda v, d=0: _round(v, int(d), ROUND_UP), 1, 2),
+    'ROUNDDOWN': (lambda v, d=0: _round(v, int(d), ROUND_DOWN), 1, 2),
+    'INT': (lambda v: float(math.floor(v)), 1, 1),
+    'ABS': (lambda v: abs(v), 1, 1),
+}
+
+SUPPORTED_FUNCTIONS = frozenset(_NUMERIC_FUNCTIONS) | {'TEXT', 'SUM', 'MIN', 'MAX', 'IF', 'AND', 'OR', 'NOT'}
+
+
+# ---------------------------------------------------------------------------
+# コンパイル
+
+# 評価時の参照解決: (行, 列) → 値
+Resolver = Callable[[int, int], Any]
+# コンパイル済みの式: (参照解決, 基準行, 基準列) → 値
+Node = Callable[[Resolver, int, int], Any]
+
+
+def _tokenize(formula: str) -> List[Tuple[str, str]]:
+    tokens: List[Tuple[str, str]] = []
+    position = 0
+    while position < len(formula):
+        match = _TOKEN.match(formula, position)
+        if match is None:
+            raise FormulaError(f"解析できない数式です: {formula}")
+        kind = match.lastgroup or ''
+        if kind != 'ws':
+            tokens.append((kind, match.group(0)))
+        position = match.end()
+    return tokens
+
+
+def _parse_ref(text: str, row: int, col: int) -> Tuple[bool, int, bool, int]:
+    """'$A$1' → (行が絶対か, 行または行オフセット, 列が絶対か, 列または列オフセット)"""
+    match = _REF.fullmatch(text)
+    if match is None:
+        raise FormulaError(f"参照を解析できません: {text}")
+    col_abs, letters, row_abs, digits = match.groups()
+    ref_col = column_index_from_string(letters.upper())
+    ref_row = int(digits)
+    return (bool(row_abs), ref_row if row_abs else ref_row - row,
+            bool(col_abs), ref_col if col_abs else ref_col - col)
+
+
+def _r1c1(ref: Tuple[bool, int, bool, int]) -> str:
+    row_abs, r, col_abs, c = ref
+    return f"R{r if row_abs else f'[{r}]'}C{c if col_abs else f'[{c}]'}"
+
+
+def _resolve(ref: Tuple[bool, int, bool, int], row: int, col: int) -> Tuple[int, int]:
+    row_abs, r, col_abs, c = ref
+    return (r if row_abs else row + r), (c if col_abs else col + c)
+
+
+def _formula_key(tokens: List[Tuple[str, str]], row: int, col: int) -> str:
+    """相対参照を R1C1 形式にした数式文字列（同じ形の数式で共通）"""
+    parts = []
+    for kind, text in tokens:
+        if kind == 'ref':
+            parts.append(_r1c1(_parse_ref(text, row, col)))
+        elif kind == 'range':
+            first, last = text.split(':')
+            parts.append(_r1c1(_parse_ref(first, row, col)) + ':' + _r1c1(_parse_ref(last, row, col)))
+        elif kind == 'func':
+            parts.append(text.upper())
+        else:
+            parts.append(text)
+    return ' '.join(parts)
+
+
+class _Parser:
+    """再帰下降パーサー（Excel の演算子の優先順位）"""
+
+    def __init__(self, tokens: List[Tuple[str, str]], row: int, col: int):
+        self.tokens = tokens
+        self.position = 0
+        self.row = row
+        self.col = col
+
+    def _peek(self) -> Tuple[str, str]:
+        return self.tokens[self.position] if self.position < len(self.tokens) else ('end', '')
+
+    def _take(self) -> Tuple[str, str]:
+        token = self._peek()
+        self.position += 1
+        return token
+
+    def _expect(self, text: str) -> None:
+        kind, value = self._take()
+        if value != text:
+            raise FormulaError(f"'{text}' が必要です")
+
+    def parse(self) -> Node:
+        node = self._comparison()
+        if self._peek()[0] != 'end':
+            raise FormulaError(f"解析できない記述があります: {self._peek()[1]}")
+        return node
+
+    def _comparison(self) -> Node:
+        left = self._concat()
+        while self._peek()[1] in ('=', '<>', '<', '>', '<=', '>='):
+            op = self._take()[1]
+            right = self._concat()
+            left = _compare_node(op, left, right)
+        return left
+
+    def _concat(self) -> Node:
+        left = self._additive()
+        while self._peek()[1] == '&':
+            self._take()
+            right = self._additive()
+            left = _concat_node(left, right)
+        return left
+
+    def _additive(self) -> Node:
+        left = self._term()
+        while self._peek()[1] in ('+', '-'):
+            op = self._take()[1]
+            right = self._term()
+            left = _arith_node(op, left, right)
+        return left
+
+    def _term(self) -> Node:
+        left = self._power()
+        while self._peek()[1] in ('*', '/'):
+            op = self._take()[1]
+            right = self._power()
+            left = _arith_node(op, left, right)
+        return left
+
+    def _power(self) -> Node:
+        left = self._unary()
+        while self._peek()[1] == '^':
+            self._take()
+            right = self._unary()
+            left = _arith_node('^', left, right)
+        return left
+
+    def _unary(self) -> Node:
+        if self._peek()[1] in ('-', '+'):
+            op = self._take()[1]
+            operand = self._unary()
+            if op == '+':
+                return operand
+            return _arith_node('-', lambda resolver, row, col: 0.0, operand)
+        return self._percent()
+
+    def _percent(self) -> Node:
+        node = self._primary()
+        while self._peek()[1] == '%':
+            self._take()
+            node = _arith_node('/', node, lambda resolver, row, col: 100.0)
+        return node
+
+    def _primary(self) -> Node:
+        kind, text = self._take()
+        if kind == 'number':
+            number = float(text)
+            return lambda resolver, row, col: number
+        if kind == 'string':
+            literal = text[1:-1].replace('""', '"')
+            return lambda resolver, row, col: literal
+        if kind == 'bool':
+            flag = text.upper() == 'TRUE'
+            return lambda resolver, row, col: flag
+        if kind == 'ref':
+            ref = _parse_ref(text, self.row, self.col)
+
+            def _cell(resolver: Resolver, row: int, col: int) -> Any:
+                return resolver(*_resolve(ref, row, col))
+            return _cell
+        if kind == 'range':
+            first, last = (_parse_ref(part, self.row, self.col) for part in text.split(':'))
+
+            def _range(resolver: Resolver, row: int, col: int) -> Any:
+                r0, c0 = _resolve(first, row, col)
+                r1, c1 = _resolve(last, row, col)
+                return _Range([resolver(r, c) for r in range(min(r0, r1), max(r0, r1) + 1)
+                               for c in range(min(c0, c1), max(c0, c1) + 1)])
+            return _range
+        if kind == 'func':
+            return self._function(text.upper())
+        if text == '(':
+            node = self._comparison()
+            self._expect(')')
+            return node
+        raise FormulaError(f"解析できない記述があります: {text}")
+
+    def _function(self, name: str) -> Node:
+        if name not in SUPPORTED_FUNCTIONS:
+            raise FormulaError(f"未対応の関数です: {name}")
+        self._expect('(')
+        args: List[Node] = []
+        if self._peek()[1] != ')':
+            while True:
+                if self._peek()[1] in (',', ')'):
+                    # 省略された引数
+                    args.append(lambda resolver, row, col: None)
+                else:
+                    args.append(self._comparison())
+                if self._peek()[1] == ',':
+                    self._take()
+                    continue
+                break
+        self._expect(')')
+        return _function_node(name, args)
+
+
+def _scalar(value: Any) -> Any:
+    """範囲を単一値として使う場合は先頭セル"""
+    if isinstance(value, _Range):
+        return value.values[0] if value.values else None
+    return value
+
+
+def _compare_node(op: str, left: Node, right: Node) -> Node:
+    def node(resolver: Resolver, row: int, col: int) -> Any:
+        a, b = _scalar(left(resolver, row, col)), _scalar(right(resolver, row, col))
+        if isinstance(a, ExcelError):
+            return a
+        if isinstance(b, ExcelError):
+            return b
+        result = _compare(a, b)
+        return {'=': result == 0, '<>': result != 0, '<': result < 0,
+                '>': result > 0, '<=': result <= 0, '>=': result >= 0}[op]
+    return node
+
+
+def _concat_node(left: Node, right: Node) -> Node:
+    def node(resolver: Resolver, row: int, col: int) -> Any:
+        a, b = _to_text(_scalar(left(resolver, row, col))), _to_text(_scalar(right(resolver, row, col)))
+        if isinstance(a, ExcelError):
+            return a
+        if isinstance(b, ExcelError):
+            return b
+        return a + b
+    return node
+
+
+def _arith_node(op: str, left: Node, right: Node) -> Node:
+    def node(resolver: Resolver, row: int, col: int) -> Any:
+        a, b = _to_number(_scalar(left(resolver, row, col))), _to_number(_scalar(right(resolver, row, col)))
+        if isinstance(a, ExcelError):
+            return a
+        if isinstance(b, ExcelError):
+            return b
+        if op == '+':
+            return a + b
+        if op == '-':
+            return a - b
+        if op == '*':
+            return a * b
+        if op == '/':
+            return DIV0_ERROR if b == 0 else a / b
+        try:
+            return float(a ** b)
+        except (OverflowError, ZeroDivisionError, ValueError):
+            return NUM_ERROR
+    return node
+
+
+def _function_node(name: str, args: List[Node]) -> Node:
+    if name == 'IF':
+        if not 1 <= len(args) <= 3:
+            raise FormulaError("IF の引数の数が正しくありません")
+
+        def _if(resolver: Resolver, row: int, col: int) -> Any:
+            condition = _to_bool(_scalar(args[0](resolver, row, col)))
+            if isinstance(condition, ExcelError):
+                return condition
+            if condition:
+                return args[1](resolver, row, col) if len(args) > 1 else True
+            return args[2](resolver, row, col) if len(args) > 2 else False
+        return _if
+
+    if name in ('SUM', 'MIN', 'MAX'):
+        def _aggregate(resolver: Resolver, row: int, col: int) -> Any:
+            numbers = _numbers([arg(resolver, row, col) for arg in args])
+            if isinstance(numbers, ExcelError):
+                return numbers
+            if name == 'SUM':
+                return float(sum(numbers))
+            if not numbers:
+                return 0.0
+            return float(min(numbers) if name == 'MIN' else max(numbers))
+        return _aggregate
+
+    if name in ('AND', 'OR', 'NOT'):
+        def _logical(resolver: Resolver, row: int, col: int) -> Any:
+            values = []
+            for arg in args:
+                value = arg(resolver, row, col)
+                items = value.values if isinstance(value, _Range) else [value]
+                for item in items:
+                    flag = _to_bool(item)
+                    if isinstance(flag, ExcelError):
+                        return flag
+                    values.append(flag)
+            if name == 'NOT':
+                return not values[0] if values else VALUE_ERROR
+            return all(values) if name == 'AND' else any(values)
+        return _logical
+
+    if name == 'TEXT':
+        if len(args) != 2:
+            raise FormulaError("TEXT の引数の数が正しくありません")
+
+        def _text(resolver: Resolver, row: int, col: int) -> Any:
+            value = _scalar(args[0](resolver, row, col))
+            number_format = _scalar(args[1](resolver, row, col))
+            if isinstance(value, ExcelError):
+                return value
+            return _fn_text(value, number_format)
+        return _text
+
+    func, min_args, max_args = _NUMERIC_FUNCTIONS[name]
+    if not min_args <= len(args) <= max_args:
+        raise FormulaError(f"{name} の引数の数が正しくありません")
+
+    def _numeric(resolver: Resolver, row: int, col: int) -> Any:
+        values = []
+        for arg in args:
+            value = _to_number(_scalar(arg(resolver, row, col)))
+            if isinstance(value, ExcelError):
+                return value
+            values.append(value)
+        try:
+            return func(*values)
+        except (ValueError, OverflowError, ZeroDivisionError):
+            return NUM_ERROR
+    return _numeric
+
+
+_compiled: Dict[str, Node] = {}
+
+
+def compile_formula(formula: str, row: int, col: int) -> Node:
+    """
+    数式をコンパイル（同じ形の数式はキャッシュを再利用）
+
+    Raises:
+        FormulaError: 未対応の関数・構文・他シート参照
+    """
+    text = formula[1:] if formula.startswith('=') else formula
+    if '!' in text and '"' not in text:
+        raise FormulaError("他シートの参照には対応していません")
+    tokens = _tokenize(text)
+    key = _formula_key(tokens, row, col)
+    node = _compiled.get(key)
+    if node is None:
+        node = _Parser(tokens, row, col).parse()
+        _compiled[key] = node
+    return node
+
+
+# ---------------------------------------------------------------------------
+# シートの評価
+
+@dataclass
+class SheetEvaluation:
+    """シート内の数式セルの計算結果"""
+    values: Dict[Tuple[int, int], Any] = field(default_factory=dict)
+    unsupported: List[Tuple[int, int]] = field(default_factory=list)
+
+
+def _output_value(value: Any) -> Any:
+    if isinstance(value, _Range):
+        value = _scalar(value)
+    if isinstance(value, ExcelError):
+        return value.code
+    return value
+
+
+def evaluate_sheet(sheet) -> SheetEvaluation:
+    """
+    シート内の全数式を計算
+
+    数式セルを行順に評価し、参照先の数式は必要になった時点で評価してメモする
+    （上の行を参照する数式が大半のため、ほとんどはメモ済みの値を参照するだけになる）。
+    未対応の数式は unsupported に入れ、値は返さない。
+    """
+    formulas: Dict[Tuple[int, int], Node] = {}
+    evaluation = SheetEvaluation()
+    for row in sheet.iter_rows():
+        for cell in row:
+            value = cell.value
+            if isinstance(value, str) and value.startswith('=') and len(value) > 1:
+                try:
+                    formulas[(cell.row, cell.column)] = compile_formula(value, cell.row, cell.column)
+                except FormulaError:
+                    evaluation.unsupported.append((cell.row, cell.column))
+
+    results: Dict[Tuple[int, int], Any] = {}
+    in_progress = set()
+    cells = sheet._cells
+
+    def resolver(r: int, c: int) -> Any:
+        key = (r, c)
+        if key in results:
+            return results[key]
+        node = formulas.get(key)
+        if node is None:
+            if key in evaluation.unsupported:
+                return VALUE_ERROR
+            cell = cells.get(key)
+            return None if cell is None else cell.value
+        if key in in_progress:
+            # 循環参照
+            return REF_ERROR
+        in_progress.add(key)
+        try:
+            result = node(resolver, r, c)
+        finally:
+            in_progress.discard(key)
+        if isinstance(result, _Range):
+            result = _scalar(result)
+        results[key] = result
+        return result
+
+    for key in sorted(formulas):
+        resolver(*key)
+    evaluation.values = {key: _output_value(value) for key, value in results.items()}
+    return evaluation
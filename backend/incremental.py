@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+既存ワークブックの差分更新
+出力時に転記した行の内容を指紋（ハッシュ）としてサイドカーファイルに保存しておき、
+再出力時は新しいCSVの行と比べて変わった日の行だけを既存ワークブックに書き直す。
+変わっていない行・転記対象外のセルへの手入力はそのまま残る。
+"""
+
+import hashlib
+import json
+import os
+from dataclasses import dataclass, field
+from typing import Dict, Any, List, Optional, Tuple
+
+from file_output import atomic_write, discard
+
+
+FINGERPRINT_VERSION = 1
+
+# サイドカーファイルの置き場所（出力フォルダ内の隠しフォルダ）と拡張子
+# （例：2025_01/.kinten/勤怠表_202501_サンプル.xlsx.kinten.json）
+SIDECAR_FOLDER = '.kinten'
+SIDECAR_SUFFIX = '.kinten.json'
+
+
+def sidecar_path_for(output_path: str) -> str:
+    """出力ワークブックのサイドカーファイルのパス"""
+    folder, name = os.path.split(output_path)
+    return os.path.join(folder, SIDECAR_FOLDER, name + SIDECAR_SUFFIX)
+
+
+def _legacy_sidecar_path_for(output_path: str) -> str:
+    """以前のサイドカーファイルのパス（ワークブックと同じフォルダ）"""
+    return output_path + SIDECAR_SUFFIX
+
+
+def _digest(values: Any) -> str:
+    text = json.dumps(values, ensure_ascii=False, default=str)
+    return hashlib.sha1(text.encode('utf-8')).hexdigest()
+
+
+def template_digest(template_bytes: bytes, mapping_digest: str = '') -> str:
+    """テンプレートと転記先設定のハッシュ（どちらかが変わったら差分更新しない）"""
+    digest = hashlib.sha1(template_bytes)
+    digest.update(mapping_digest.encode('ascii'))
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class SheetFingerprint:
+    """1シートに転記した内容の指紋"""
+    template: str
+    sheet_name: str
+    header: str
+    rows: Dict[int, str] = field(default_factory=dict)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'version': FINGERPRINT_VERSION,
+            'template': self.template,
+            'sheet_name': self.sheet_name,
+            'header': self.header,
+            'rows': {str(row): digest for row, digest in sorted(self.rows.items())}
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> Optional['SheetFingerprint']:
+        if not isinstance(data, dict) or data.get('version') != FINGERPRINT_VERSION:
+            return None
+        try:
+            return cls(
+                template=str(data['template']),
+                sheet_name=str(data['sheet_name']),
+                header=str(data['header']),
+                rows={int(row): str(digest) for row, digest in data.get('rows', {}).items()}
+            )
+        except (KeyError, TypeError, ValueError):
+            return None
+
+
+def build_fingerprint(template: str, sheet_name: str, header_values: Tuple[Any, ...],
+                      row_values: List[Tuple[int, Tuple[Any, ...]]]) -> SheetFingerprint:
+    """
+    転記内容から指紋を作成
+
+    Args:
+        template: テンプレートのハッシュ
+        sheet_name: シート名
+        header_values: 従業員情報（氏名・年・月）
+        row_values: excel_processor.attendance_row_values の結果
+    """
+    return SheetFingerprint(
+        template=template,
+        sheet_name=sheet_name,
+        header=_digest(list(header_values)),
+        rows={row: _digest(list(values)) for row, values in row_values}
+    )
+
+
+def load_fingerprint(output_path: str) -> Optional[SheetFingerprint]:
+    """サイドカーファイルを読み込み（無い・壊れている場合は None。以前の場所のものも読む）"""
+    for path in (sidecar_path_for(output_path), _legacy_sidecar_path_for(output_path)):
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                return SheetFingerprint.from_dict(json.load(f))
+        except FileNotFoundError:
+            continue
+        except (OSError, ValueError):
+            return None
+    return None
+
+
+def write_fingerprint(output_path: str, fingerprint: SheetFingerprint) -> None:
+    """サイドカーファイルを書き込み（以前の場所のものは削除する）"""
+    with atomic_write(sidecar_path_for(output_path), 'w', encoding='utf-8') as f:
+        json.dump(fingerprint.to_dict(), f, ensure_ascii=False)
+    discard(_legacy_sidecar_path_for(output_path))
+
+
+@dataclass(frozen=True)
+class RowDiff:
+    """前回の転記内容との差分"""
+    changed_rows: Tuple[int, ...]   # 内容が変わった・新たに増えた行（書き直す）
+    removed_rows: Tuple[int, ...]   # 前回は転記したが今回のCSVに無い行（テンプレートの内容に戻す）
+    header_changed: bool
+
+    @property
+    def unchanged(self) -> bool:
+        return not (self.changed_rows or self.removed_rows or self.header_changed)
+
+
+def diff_fingerprints(previous: SheetFingerprint, current: SheetFingerprint) -> RowDiff:
+    """2つの指紋の差分"""
+    changed = tuple(sorted(row for row, digest in current.rows.items() if previous.rows.get(row) != digest))
+    removed = tuple(sorted(row for row in previous.rows if row not in current.rows))
+    return RowDiff(changed_rows=changed, removed_rows=removed, header_changed=previous.header != current.header)
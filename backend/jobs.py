@@ -0,0 +1,394 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ステートレス処理API
+1ジョブ分の入力をイミュータブルなコンテキストで受け取り、
+インスタンス状態を持たずに CSV読み込み → Excel転記 → 保存 を行う
+"""
+
+import os
+import sys
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Dict, Any, List, Optional, Tuple
+
+import openpyxl
+
+from attendance_archive import archive_job
+from cancellation import CancellationToken, is_cancelled
+from csv_processor import CSVData, load_csv_data, build_processed_data
+from excel_processor import (
+    TemplateCache,
+    default_template_cache,
+    get_template_sheet,
+    build_sheet_name,
+    write_employee_info_to_sheet,
+    attendance_row_values,
+    write_attendance_row,
+    save_workbook_to,
+)
+from cell_mapping import CellPlan, plan_for_template
+from incremental import (
+    SheetFingerprint,
+    build_fingerprint,
+    diff_fingerprints,
+    load_fingerprint,
+    template_digest,
+    write_fingerprint,
+)
+from premiums import WorkRules, compute_premiums
+from progress import ProgressCallback, notify_progress
+from summary import SummaryCollector
+from validation import validate_attendance
+
+
+@dataclass(frozen=True)
+class JobContext:
+    """1ジョブ分の入力（イミュータブル）"""
+    csv_path: str
+    template_path: str
+    base_output_dir: str
+    employee_name: str
+    work_rules: Optional[WorkRules] = None  # 省略時は既定の勤務規則
+    department: str = ''                    # 部署（集計用。任意）
+    incremental: bool = False               # 既存の出力があれば変わった日の行だけ書き直す
+    archive_format: str = ''                # 指定時は勤怠データをアーカイブへ書き出す（parquet / arrow）
+    deterministic: bool = False             # 同じ内容から常に同じバイト列のワークブックを出力する
+
+
+def report_stage(progress_callback: Optional[ProgressCallback], stage: str, **payload: Any) -> None:
+    """工程の完了を進捗コールバックへ通知"""
+    data: Dict[str, Any] = {'stage': stage}
+    data.update(payload)
+    notify_progress(progress_callback, 'stage', data)
+
+
+def cancelled_result(cancel_token: Optional[CancellationToken]) -> Dict[str, Any]:
+    """中断時の結果辞書を生成"""
+    reason = cancel_token.reason if cancel_token is not None else ''
+    return {
+        'success': False,
+        'cancelled': True,
+        'cancel_reason': reason,
+        'error': f"処理が中断されました（{reason}）"
+    }
+
+
+def output_folder_for(base_output_dir: str, year_month: str) -> str:
+    """年月ごとの出力先フォルダ（例：<base>/2025_07）"""
+    return os.path.abspath(os.path.join(base_output_dir, f"{year_month[:4]}_{year_month[4:]}"))
+
+
+def output_filename_for(year_month: str, employee_name: str) -> str:
+    """出力ファイル名（例：勤怠表_202501_サンプル.xlsx）"""
+    return f"勤怠表_{year_month}_{employee_name}.xlsx"
+
+
+class JobError(Exception):
+    """ジョブの各工程で発生したエラー（メッセージはそのまま結果の error に使う）"""
+
+    def __init__(self, message: str, details: Optional[Dict[str, Any]] = None):
+        super().__init__(message)
+        self.details = details or {}  # 結果辞書に追加する情報（検証レポートなど）
+
+    def to_result(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {'success': False, 'error': str(self)}
+        result.update(self.details)
+        return result
+
+
+@dataclass(frozen=True)
+class FilledWorkbook:
+    """転記済み・未保存のワークブック（fill_stage の出力）"""
+    ctx: JobContext
+    csv_data: CSVData
+    workbook: Any                                   # 差分更新で変更が無い場合は None（保存しない）
+    output_folder: str
+    output_path: str
+    fingerprint: Optional[SheetFingerprint] = None  # サイドカーファイルに保存する転記内容の指紋
+    update: Optional[Dict[str, Any]] = None         # 差分更新の結果（update_mode など。結果辞書に加える）
+
+
+def normalize_context(ctx: JobContext) -> JobContext:
+    """macOS ではパスを正規化したコンテキストを返す"""
+    try:
+        if sys.platform == 'darwin':
+            return replace(
+                ctx,
+                csv_path=str(Path(ctx.csv_path)),
+                template_path=str(Path(ctx.template_path)),
+                base_output_dir=str(Path(ctx.base_output_dir)),
+            )
+    except Exception:
+        pass
+    return ctx
+
+
+def parse_stage(ctx: JobContext) -> CSVData:
+    """工程1: CSVファイル読み込み → データ品質チェック（エラーがあればここで打ち切る）"""
+    try:
+        rules = ctx.work_rules
+        csv_data = load_csv_data(ctx.csv_path, ctx.employee_name, rules.break_rule if rules else None)
+    except Exception as e:
+        raise JobError(f"CSV読み込みエラー: {str(e)}")
+
+    if csv_data.attendance is None:
+        return csv_data
+    report = validate_attendance(csv_data.df, csv_data.attendance, csv_data.year_month)
+    if report.has_errors:
+        raise JobError(report.error_message(), {'validation': report.to_dict()})
+    return replace(csv_data, validation=report)
+
+
+def _cell_plan(ctx: JobContext) -> CellPlan:
+    """テンプレートの書き込み計画（設定ファイルの誤りはジョブのエラーにする）"""
+    try:
+        return plan_for_template(ctx.template_path)
+    except Exception as e:
+        raise JobError(f"テンプレート設定エラー: {str(e)}")
+
+
+def fill_sheet(sheet, ctx: JobContext, csv_data: CSVData) -> List[Tuple[int, Tuple[Any, ...]]]:
+    """
+    シート名変更 → 従業員情報・勤怠データ転記（1従業員分のシートを埋める）
+
+    Returns:
+        転記した行ごとの値（excel_processor.attendance_row_values の結果）
+    """
+    year_month = csv_data.year_month
+    plan = _cell_plan(ctx)
+
+    # シート名変更（氏名を含む）
+    sheet.title = build_sheet_name(year_month, ctx.employee_name)
+
+    # 従業員情報書き込み
+    try:
+        write_employee_info_to_sheet(sheet, ctx.employee_name, year_month[:4], year_month[4:], plan)
+    except Exception as e:
+        print(f"従業員情報書き込みエラー: {e}")
+        raise JobError("従業員情報書き込みエラー")
+
+    # 勤怠データ転記
+    try:
+        rows = attendance_row_values(build_processed_data(csv_data.df, ctx.employee_name), csv_data.attendance, plan)
+        for row, values in rows:
+            write_attendance_row(sheet, row, values, plan)
+    except Exception as e:
+        print(f"勤怠データ転記エラー: {e}")
+        raise JobError("勤怠データ転記エラー")
+    return rows
+
+
+def _incremental_fill(ctx: JobContext, csv_data: CSVData, cache: TemplateCache,
+                      output_folder: str, output_path: str) -> Optional[FilledWorkbook]:
+    """
+    既存の出力ワークブックに変わった日の行だけを書き直す
+
+    出力・サイドカーファイルが無い、テンプレートが変わった、既存ファイルが読めない場合は None
+    （テンプレートから作り直す）。
+    """
+    previous = load_fingerprint(output_path)
+    if previous is None or not os.path.exists(output_path):
+        return None
+    plan = _cell_plan(ctx)
+    digest = template_digest(cache.get_bytes(ctx.template_path), plan.digest)
+    sheet_name = build_sheet_name(csv_data.year_month, ctx.employee_name)
+    if previous.template != digest or previous.sheet_name != sheet_name:
+        return None
+
+    try:
+        rows = attendance_row_values(build_processed_data(csv_data.df, ctx.employee_name), csv_data.attendance, plan)
+    except Exception as e:
+        print(f"勤怠データ転記エラー: {e}")
+        raise JobError("勤怠データ転記エラー")
+    current = build_fingerprint(digest, sheet_name, (ctx.employee_name, csv_data.year_month), rows)
+    diff = diff_fingerprints(previous, current)
+    update = {
+        'update_mode': 'incremental',
+        'updated_rows': list(diff.changed_rows),
+        'restored_rows': list(diff.removed_rows)
+    }
+    if diff.unchanged:
+        return FilledWorkbook(ctx=ctx, csv_data=csv_data, workbook=None, output_folder=output_folder,
+                              output_path=output_path, fingerprint=current, update=update)
+
+    try:
+        workbook = openpyxl.load_workbook(output_path)
+        sheet = workbook[sheet_name]
+    except Exception as e:
+        print(f"既存ワークブック読み込みエラー（作り直します）: {e}")
+        return None
+
+    if diff.header_changed:
+        write_employee_info_to_sheet(sheet, ctx.employee_name, csv_data.year_month[:4], csv_data.year_month[4:], plan)
+    # 書き直す行はいったんテンプレートの内容に戻す（消えた備考などを残さない）
+    template_sheet = get_template_sheet(cache.load(ctx.template_path), plan.sheet_name)
+    for row in diff.changed_rows + diff.removed_rows:
+        for column in plan.column_indexes:
+            sheet.cell(row=row, column=column).value = template_sheet.cell(row=row, column=column).value
+    values_by_row = dict(rows)
+    for row in diff.changed_rows:
+        write_attendance_row(sheet, row, values_by_row[row], plan)
+
+    return FilledWorkbook(ctx=ctx, csv_data=csv_data, workbook=workbook, output_folder=output_folder,
+                          output_path=output_path, fingerprint=current, update=update)
+
+
+def fill_stage(ctx: JobContext, csv_data: CSVData, template_cache: Optional[TemplateCache] = None) -> FilledWorkbook:
+    """
+    工程2: テンプレート読み込み → シート名変更 → 従業員情報・勤怠データ転記（ファイルI/Oなし）
+
+    ctx.incremental の場合は既存の出力ワークブックを読み込み、変わった日の行だけを書き直す。
+    """
+    cache = template_cache or default_template_cache
+    year_month = csv_data.year_month
+    output_folder = output_folder_for(ctx.base_output_dir, year_month)
+    output_path = os.path.join(output_folder, output_filename_for(year_month, ctx.employee_name))
+
+    if ctx.incremental:
+        filled = _incremental_fill(ctx, csv_data, cache, output_folder, output_path)
+        if filled is not None:
+            return filled
+
+    # テンプレートExcel読み込み（キャッシュ済みbytesからジョブ専用のWorkbookを生成）
+    try:
+        workbook = cache.load(ctx.template_path)
+        sheet = get_template_sheet(workbook, _cell_plan(ctx).sheet_name)
+    except JobError:
+        raise
+    except Exception as e:
+        raise JobError(f"Excel読み込みエラー: {str(e)}")
+
+    rows = fill_sheet(sheet, ctx, csv_data)
+    fingerprint = build_fingerprint(template_digest(cache.get_bytes(ctx.template_path), _cell_plan(ctx).digest),
+                                    sheet.title, (ctx.employee_name, year_month), rows)
+
+    return FilledWorkbook(
+        ctx=ctx,
+        csv_data=csv_data,
+        workbook=workbook,
+        output_folder=output_folder,
+        output_path=output_path,
+        fingerprint=fingerprint,
+        update={'update_mode': 'full'} if ctx.incremental else None
+    )
+
+
+def save_stage(filled: FilledWorkbook, summary: Optional[SummaryCollector] = None) -> Dict[str, Any]:
+    """工程3: 出力先フォルダ作成 → ファイル保存（summary 指定時は保存できた分を集計に加える）"""
+    print(f"Generated output folder: {filled.output_folder}")
+    os.makedirs(filled.output_folder, exist_ok=True)
+    output_path = filled.output_path
+    saved: Dict[str, Any] = {}
+    in_place = filled.update is not None and filled.update.get('update_mode') == 'incremental'
+    # 差分更新で変更が無い場合は保存しない
+    if filled.workbook is not None:
+        # 差分更新は既存ファイルへ上書きする（使用中でも別名で保存しない）
+        save_result = save_workbook_to(filled.workbook, filled.output_path, allow_rename=not in_place,
+                                       deterministic=filled.ctx.deterministic)
+        if not save_result['success']:
+            raise JobError(f"ファイル保存エラー: {save_result['error']}")
+        # 使用中ファイルを避けて別名保存された場合はその名前を返す
+        output_path = save_result.get('output_path', filled.output_path)
+        # 再現可能な出力の内容ハッシュ（キャッシュのキー）と、既存ファイルと同一で書き込まなかったか
+        saved = {key: save_result[key] for key in ('content_hash', 'unchanged') if key in save_result}
+    if filled.fingerprint is not None:
+        try:
+            write_fingerprint(output_path, filled.fingerprint)
+        except OSError as e:
+            print(f"サイドカーファイル書き込みエラー: {e}")
+    result = build_job_result(filled.ctx, filled.csv_data, output_path, filled.output_folder, summary)
+    if filled.update is not None:
+        result.update(filled.update)
+    result.update(saved)
+    return result
+
+
+def build_job_result(ctx: JobContext, csv_data: CSVData, output_path: str, output_folder: str,
+                     summary: Optional[SummaryCollector] = None) -> Dict[str, Any]:
+    """保存済みジョブの結果辞書を生成（summary 指定時は集計に加え、ctx.archive_format 指定時はアーカイブへ書き出す）"""
+    result: Dict[str, Any] = {
+        'success': True,
+        'employee_name': ctx.employee_name,
+        'csv_path': ctx.csv_path,
+        'year_month': csv_data.year_month,
+        'output_path': output_path,
+        'output_folder': output_folder,
+        'row_count': csv_data.row_count
+    }
+    if ctx.department:
+        result['department'] = ctx.department
+    # 時間外・深夜・休日の集計（テンプレートに該当列が無いため結果として返す）
+    if csv_data.attendance is not None:
+        result['premium_hours'] = compute_premiums(csv_data.attendance, ctx.work_rules).totals()
+    # 複数月の混在や解析できない日付は警告として返す
+    if len(csv_data.year_months) > 1:
+        result['year_months'] = list(csv_data.year_months)
+    if csv_data.invalid_date_rows:
+        result['invalid_date_rows'] = list(csv_data.invalid_date_rows)
+    if csv_data.validation is not None and csv_data.validation.issues:
+        result['validation'] = csv_data.validation.to_dict()
+    if ctx.archive_format:
+        result.update(archive_job(ctx.base_output_dir, csv_data.year_month, ctx.employee_name, csv_data.df,
+                                  csv_data.attendance, ctx.department, ctx.archive_format))
+    if summary is not None and csv_data.attendance is not None:
+        summary.add(ctx.employee_name, ctx.department, csv_data.year_month, csv_data.attendance, ctx.work_rules)
+    return result
+
+
+def run_job(ctx: JobContext,
+            template_cache: Optional[TemplateCache] = None,
+            progress_callback: Optional[ProgressCallback] = None,
+            cancel_token: Optional[CancellationToken] = None,
+            summary: Optional[SummaryCollector] = None) -> Dict[str, Any]:
+    """
+    1ジョブを実行：CSV読み込み → Excel転記 → 保存
+
+    共有するのはテンプレートキャッシュ（不変のbytes）のみのため、
+    複数スレッドから同時に呼び出してよい。
+
+    Args:
+        ctx: ジョブコンテキスト
+        template_cache: テンプレートキャッシュ（省略時はプロセス共有のキャッシュ）
+        progress_callback: 工程ごとの進捗通知コールバック（任意）
+        cancel_token: 中断トークン（任意）。保存前に中断された場合は何も書き出さない
+        summary: 部署別集計のコレクター（任意。バッチで共有する）
+
+    Returns:
+        処理結果辞書（KintenProcessor.process_files と同じ形式）
+    """
+    started = time.perf_counter()
+    try:
+        ctx = normalize_context(ctx)
+
+        csv_data = parse_stage(ctx)
+        report_stage(progress_callback, 'csv_loaded', row_count=csv_data.row_count)
+        if csv_data.validation is not None:
+            report_stage(progress_callback, 'validated', warning_count=len(csv_data.validation.warnings))
+        if is_cancelled(cancel_token):
+            return cancelled_result(cancel_token)
+
+        filled = fill_stage(ctx, csv_data, template_cache)
+        report_stage(progress_callback, 'template_loaded')
+        report_stage(progress_callback, 'data_written')
+
+        # 中断要求があれば保存せずに終了
+        if is_cancelled(cancel_token):
+            return cancelled_result(cancel_token)
+        result = save_stage(filled, summary)
+        result['elapsed_seconds'] = round(time.perf_counter() - started, 3)
+        report_stage(progress_callback, 'saved', output_path=result['output_path'])
+        return result
+
+    except JobError as e:
+        return e.to_result()
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        print(f"Detailed error: {error_details}")
+        return {
+            'success': False,
+            'error': f"処理エラー: {str(e)}",
+            'details': error_details
+        }
@@ -10,7 +10,7 @@ import os
 import json
 import traceback
 from pathlib import Path
-from datetime import datetime
+from typing import Any, Dict, Optional, TextIO
 
 # バックエンドモジュールをインポート
 # KintenProcessor のインポートを堅牢化
@@ -27,6 +27,11 @@ except Exception:
         sys.path.insert(0, os.path.dirname(__file__))
         from main_processor import KintenProcessor  # type: ignore
 
+from cancellation import CancellationToken  # type: ignore
+from premiums import work_rules_from_dict  # type: ignore
+from structured_log import RequestLog, log_writer  # type: ignore
+from zip_export import default_export_path  # type: ignore
+
 def _resolve_log_dir(data: dict) -> str:
     try:
         for key in ('output_dir', 'base_output_dir', 'output_folder'):
@@ -46,17 +51,64 @@ def _resolve_log_dir(data: dict) -> str:
     return p
 
 
-def _write_log(log_dir: str, message: str) -> None:
+def _request_log(data: dict, **context: Any) -> RequestLog:
+    """リクエストのログ（request_id 未指定時は生成。ログフォルダを用意できない場合は記録しない）"""
     try:
-        ts = datetime.now().strftime('%Y-%m-%d %H:%M:%S')
-        with open(os.path.join(log_dir, 'backend.log'), 'a', encoding='utf-8') as f:
-            f.write(f'[{ts}] {message}\n')
+        writer = log_writer(_resolve_log_dir(data))
     except Exception:
-        pass
+        writer = None
+    return RequestLog(writer, data.get('request_id') or None, **context)
+
+
+def _build_cancel_token(data: dict) -> CancellationToken:
+    """リクエストの deadline_seconds / cancel_file から中断トークンを生成"""
+    deadline_seconds = None
+    try:
+        if data.get('deadline_seconds') is not None:
+            deadline_seconds = float(data['deadline_seconds'])
+    except (TypeError, ValueError):
+        deadline_seconds = None
+    cancel_file = data.get('cancel_file') or None
+    return CancellationToken(deadline_seconds=deadline_seconds, cancel_file=cancel_file)
+
+
+def _export_path(data: dict, base_dir: str) -> Optional[str]:
+    """export_zip（true で <基準フォルダ>/<フォルダ名>.zip、文字列でそのパス）から引き渡し用ZIPのパスを決定"""
+    value = data.get('export_zip')
+    if not value:
+        return None
+    if value is True:
+        return default_export_path(base_dir)
+    return str(value)
+
+
+def _emit_event(stream_out: TextIO, event: str, payload: Dict[str, Any]) -> None:
+    """NDJSON形式で1イベントを出力（ストリーミングモード用）"""
+    record: Dict[str, Any] = {'event': event}
+    record.update(payload)
+    stream_out.write(json.dumps(record, ensure_ascii=False) + '\n')
+    stream_out.flush()
+
+
+def _print_result(result: Dict[str, Any], stream_out: Optional[TextIO] = None) -> None:
+    """
+    最終結果を出力
+
+    通常モードでは従来どおり1つのJSONを出力する。
+    ストリーミングモードでは各ファイルの結果を item イベントで送信済みのため、
+    一覧を除いたサマリーを result イベントとして出力する。
+    """
+    if stream_out is None:
+        print(json.dumps(result, ensure_ascii=False))
+        return
+    summary = {k: v for k, v in result.items() if k not in ('converted_files', 'failed_files', 'processed_files', 'unchanged_files')}
+    _emit_event(stream_out, 'result', summary)
 
 
 def main():
     """メイン処理関数"""
+    stream_out: Optional[TextIO] = None
+    log: Optional[RequestLog] = None
     try:
         # 標準入力からJSONデータを読み取り
         input_data = sys.stdin.read()
@@ -66,71 +118,227 @@ def main():
         
         # JSONをパース
         data = json.loads(input_data)
-        log_dir = _resolve_log_dir(data)
-        _write_log(log_dir, 'backend start')
-        _write_log(log_dir, f'cwd={os.getcwd()}')
-        _write_log(log_dir, f'python={sys.version}')
-        _write_log(log_dir, f'platform={sys.platform}')
-        
+
+        # ストリーミングモード（NDJSON）: 進捗・各ファイル結果・サマリーを逐次出力
+        progress_callback = None
+        if data.get('stream'):
+            stream_out = sys.stdout
+            # 処理中のデバッグ出力がNDJSONに混ざらないよう標準エラーへ逃がす
+            sys.stdout = sys.stderr
+            progress_callback = lambda event, payload: _emit_event(stream_out, event, payload)  # type: ignore[arg-type]
+
         # 処理タイプを取得
         process_type = data.get('process_type', 'csv_to_excel')
-        _write_log(log_dir, f'process_type={process_type}')
+        
+        # 構造化ログ（JSON Lines。書き込みはバックグラウンドで行い、1件ごとの結果も記録する）
+        log = _request_log(data, process_type=process_type)
+        log.event('start', cwd=os.getcwd(), python=sys.version, platform=sys.platform)
+        progress_callback = log.progress_callback(progress_callback)
         
         # メインプロセッサーを初期化
         processor = KintenProcessor()
+
+        # テンプレートフォルダ（取引先ごとのテンプレートをIDで指定する場合）
+        if data.get('template_dir'):
+            templates_result = processor.load_templates(data['template_dir'])
+            if not templates_result['success']:
+                _print_result(templates_result, stream_out)
+                return
+        
+        # 出力の索引（index: true または index_path 指定時のみ記録。index_path で場所を指定）
+        if data.get('index_path'):
+            processor.index_path = data['index_path']
+            processor.index_enabled = data.get('index') is not False
+        elif data.get('index'):
+            processor.index_enabled = True
+        
+        # 勤怠データのアーカイブ（archive: true で Parquet、"arrow" で Arrow IPC）
+        if data.get('archive'):
+            processor.archive_format = 'parquet' if data['archive'] is True else str(data['archive'])
+        
+        # 再現可能な出力（同じ入力から同じバイト列のワークブック・PDF）
+        if data.get('deterministic'):
+            processor.deterministic = True
+            processor.pdf_converter.deterministic = True
+        
+        # 中断トークン（期限・キャンセルファイル・シグナル）
+        cancel_token = _build_cancel_token(data)
+        if process_type in ('csv_to_excel', 'csv_batch', 'convert_to_pdf', 'watch_folder'):
+            cancel_token.install_signal_handlers()
         
         if process_type == 'csv_to_excel':
             # CSV to Excel処理
             csv_path = data.get('csv_path', '')
-            template_path = data.get('template_path', '')
             output_dir = data.get('output_dir', '')
             employee_name = data.get('employee_name', '')
+            try:
+                template_path = processor.resolve_template(data.get('template_path', ''), data.get('template_id', ''))
+            except ValueError as e:
+                _print_result({"error": str(e)}, stream_out)
+                return
             
             # パラメータの検証
             if not all([csv_path, template_path, output_dir, employee_name]):
-                print(json.dumps({"error": "必要なパラメータが不足しています"}))
+                _print_result({"error": "必要なパラメータが不足しています"}, stream_out)
                 return
             
             # ファイルの存在確認
             if not os.path.exists(csv_path):
-                print(json.dumps({"error": f"CSVファイルが見つかりません: {csv_path}"}))
+                _print_result({"error": f"CSVファイルが見つかりません: {csv_path}"}, stream_out)
                 return
             
             if not os.path.exists(template_path):
-                print(json.dumps({"error": f"テンプレートファイルが見つかりません: {template_path}"}))
+                _print_result({"error": f"テンプレートファイルが見つかりません: {template_path}"}, stream_out)
                 return
             
             # 出力ディレクトリの作成
             os.makedirs(output_dir, exist_ok=True)
             
             # 処理を実行
-            result = processor.process_files(
-                csv_path=csv_path,
-                template_path=template_path,
-                base_output_dir=output_dir,
-                employee_name=employee_name
-            )
-            _write_log(log_dir, f'csv_to_excel success={result.get("success")} output_dir={output_dir}')
+            with log.stage('csv_to_excel'):
+                result = processor.process_files(
+                    csv_path=csv_path,
+                    template_path=template_path,
+                    base_output_dir=output_dir,
+                    employee_name=employee_name,
+                    progress_callback=progress_callback,
+                    cancel_token=cancel_token,
+                    work_rules=work_rules_from_dict(data.get('work_rules')),
+                    incremental=bool(data.get('incremental', False))
+                )
+            log.event('csv_to_excel', success=result.get('success'), output_dir=output_dir)
+        
+        elif process_type == 'csv_batch':
+            # 複数CSVの一括処理（ジョブごとに template_id で取引先のテンプレートを指定可能）
+            jobs = data.get('jobs', [])
+            output_dir = data.get('output_dir', '')
+            try:
+                template_path = processor.resolve_template(data.get('template_path', ''), data.get('template_id', ''))
+                # テンプレートIDは実行前にすべて解決しておく（未登録・検証エラーは処理前に返す）
+                for job in jobs:
+                    processor.resolve_template(template_path, job.get('template_id', '') or '')
+            except ValueError as e:
+                _print_result({"error": str(e)}, stream_out)
+                return
+            all_have_template = bool(jobs) and all(job.get('template_id') for job in jobs)
+            
+            if not jobs or not (template_path or all_have_template) or not output_dir:
+                _print_result({"error": "必要なパラメータが不足しています"}, stream_out)
+                return
+            
+            if template_path and not os.path.exists(template_path):
+                _print_result({"error": f"テンプレートファイルが見つかりません: {template_path}"}, stream_out)
+                return
+
+            if data.get('output_mode') == 'department' and data.get('incremental'):
+                # 部署別ワークブックは複数従業員のシートをまとめて作り直すため、差分更新に対応しない
+                _print_result({"error": "部署別出力（output_mode: department）では差分更新（incremental）は使用できません"}, stream_out)
+                return
+
+            os.makedirs(output_dir, exist_ok=True)
+            with log.stage('csv_batch', jobs=len(jobs)):
+                if data.get('output_mode') == 'department':
+                    # 部署×年月ごとに1ワークブック（従業員ごとに1シート）
+                    result = processor.process_department_batch(
+                        jobs=jobs,
+                        template_path=template_path,
+                        base_output_dir=output_dir,
+                        progress_callback=progress_callback,
+                        cancel_token=cancel_token,
+                        max_workers=int(data.get('max_workers', 1) or 1),
+                        work_rules=work_rules_from_dict(data.get('work_rules')),
+                        summary=bool(data.get('summary', False)),
+                        export_path=_export_path(data, output_dir)
+                    )
+                elif data.get('pipeline'):
+                    # ステージパイプライン（読み込み・転記・保存・PDF変換を重ねて実行）
+                    result = processor.process_pipeline(
+                        jobs=jobs,
+                        template_path=template_path,
+                        base_output_dir=output_dir,
+                        pdf_output_folder=data.get('pdf_output_folder') or None,
+                        progress_callback=progress_callback,
+                        cancel_token=cancel_token,
+                        workers=int(data.get('max_workers', 2) or 2),
+                        queue_size=int(data.get('queue_size', 4) or 4),
+                        work_rules=work_rules_from_dict(data.get('work_rules')),
+                        summary=bool(data.get('summary', False)),
+                        incremental=bool(data.get('incremental', False)),
+                        export_path=_export_path(data, output_dir)
+                    )
+                else:
+                    result = processor.process_batch(
+                        jobs=jobs,
+                        template_path=template_path,
+                        base_output_dir=output_dir,
+                        progress_callback=progress_callback,
+                        cancel_token=cancel_token,
+                        max_workers=int(data.get('max_workers', 1) or 1),
+                        work_rules=work_rules_from_dict(data.get('work_rules')),
+                        summary=bool(data.get('summary', False)),
+                        incremental=bool(data.get('incremental', False)),
+                        export_path=_export_path(data, output_dir)
+                    )
+            log.event('csv_batch', success=result.get('success'), processed=result.get('total_processed'),
+                      failed=result.get('total_failed'), cancelled=result.get('cancelled', False),
+                      stage_seconds=result.get('stage_seconds'))
+        
+        elif process_type == 'watch_folder':
+            # 受信フォルダの監視（中断されるまで、または once 指定時は1回分を処理して終了）
+            inbox_dir = data.get('inbox_dir', '')
+            output_dir = data.get('output_dir', '')
+            try:
+                template_path = processor.resolve_template(data.get('template_path', ''), data.get('template_id', ''))
+            except ValueError as e:
+                _print_result({"error": str(e)}, stream_out)
+                return
+            
+            if not all([inbox_dir, template_path, output_dir]):
+                _print_result({"error": "必要なパラメータが不足しています"}, stream_out)
+                return
+            
+            if not os.path.exists(template_path):
+                _print_result({"error": f"テンプレートファイルが見つかりません: {template_path}"}, stream_out)
+                return
+            
+            log.event('watch_folder_start', inbox=inbox_dir)
+            with log.stage('watch_folder'):
+                result = processor.watch_folder(
+                    inbox_dir=inbox_dir,
+                    template_path=template_path,
+                    base_output_dir=output_dir,
+                    pdf_output_folder=data.get('pdf_output_folder') or None,
+                    progress_callback=progress_callback,
+                    cancel_token=cancel_token,
+                    max_workers=int(data.get('max_workers', 1) or 1),
+                    settle_seconds=float(data.get('settle_seconds', 2.0)),
+                    poll_interval=float(data.get('poll_interval', 2.0)),
+                    work_rules=work_rules_from_dict(data.get('work_rules')),
+                    incremental=bool(data.get('incremental', False)),
+                    once=bool(data.get('once', False))
+                )
+            log.event('watch_folder', success=result.get('success'), processed=result.get('total_processed'),
+                      failed=result.get('total_failed'))
         
         elif process_type == 'get_excel_files':
             # Excelファイル取得処理
             folder_path = data.get('folder_path', '')
             if not folder_path:
-                print(json.dumps({"error": "フォルダパスが指定されていません"}))
+                _print_result({"error": "フォルダパスが指定されていません"}, stream_out)
                 return
             
             result = processor.get_excel_files(folder_path)
-            _write_log(log_dir, f'get_excel_files success={result.get("success")} folder={folder_path}')
+            log.event('get_excel_files', success=result.get('success'), folder=folder_path)
         
         elif process_type == 'create_pdf_output_folder':
             # PDF出力フォルダ作成処理
             base_output_dir = data.get('base_output_dir', '')
             if not base_output_dir:
-                print(json.dumps({"error": "出力ディレクトリが指定されていません"}))
+                _print_result({"error": "出力ディレクトリが指定されていません"}, stream_out)
                 return
             
             result = processor.create_pdf_output_folder(base_output_dir)
-            _write_log(log_dir, f'create_pdf_output_folder success={result.get("success")} base={base_output_dir}')
+            log.event('create_pdf_output_folder', success=result.get('success'), base=base_output_dir)
         
         elif process_type == 'convert_to_pdf':
             # PDF変換処理
@@ -138,47 +346,88 @@ def main():
             output_folder = data.get('output_folder', '')
             
             if not excel_files or not output_folder:
-                print(json.dumps({"error": "Excelファイルまたは出力フォルダが指定されていません"}))
+                _print_result({"error": "Excelファイルまたは出力フォルダが指定されていません"}, stream_out)
+                return
+            
+            with log.stage('convert_to_pdf'):
+                result = processor.convert_excel_to_pdf(excel_files, output_folder, progress_callback=progress_callback,
+                                                        cancel_token=cancel_token,
+                                                        bundle_name=data.get('bundle_name') or None,
+                                                        export_path=_export_path(data, os.path.dirname(os.path.abspath(output_folder))))
+            log.event('convert_to_pdf', success=result.get('success'), out=output_folder,
+                      converted=result.get('total_converted'))
+        
+        elif process_type == 'query_outputs':
+            # 出力の索引の検索（stale: true で古くなった出力のみ）
+            output_dir = data.get('output_dir', '')
+            if not output_dir and not data.get('index_path'):
+                _print_result({"error": "出力ディレクトリが指定されていません"}, stream_out)
+                return
+            
+            result = processor.query_outputs(
+                output_dir,
+                kind=data.get('kind') or None,
+                year_month=data.get('year_month') or None,
+                employee_name=data.get('employee_name') or None,
+                department=data.get('department') or None,
+                stale=bool(data.get('stale', False))
+            )
+            log.event('query_outputs', success=result.get('success'), count=result.get('count'))
+        
+        elif process_type == 'archive_totals':
+            # アーカイブからの勤務時間集計（複数年分でもCSV・ワークブックを読み直さない）
+            output_dir = data.get('output_dir', '')
+            if not output_dir:
+                _print_result({"error": "出力ディレクトリが指定されていません"}, stream_out)
                 return
             
-            result = processor.convert_excel_to_pdf(excel_files, output_folder)
-            _write_log(log_dir, f'convert_to_pdf success={result.get("success")} out={output_folder} converted={result.get("total_converted")}')
+            result = processor.archive_totals(
+                output_dir,
+                year_months=data.get('year_months') or None,
+                employees=data.get('employees') or None,
+                archive_format=data.get('archive_format') or 'parquet'
+            )
+            log.event('archive_totals', success=result.get('success'), count=result.get('count'))
+        
+        elif process_type == 'list_templates':
+            # テンプレートフォルダ内のテンプレート一覧（検証結果付き）
+            if not data.get('template_dir'):
+                _print_result({"error": "テンプレートフォルダが指定されていません"}, stream_out)
+                return
+            result = processor.load_templates(data['template_dir'])
+            log.event('list_templates', count=len(result.get('templates', [])))
         
         elif process_type == 'open_folder':
             # フォルダを開く処理
             folder_path = data.get('folder_path', '')
             if not folder_path:
-                print(json.dumps({"error": "フォルダパスが指定されていません"}))
+                _print_result({"error": "フォルダパスが指定されていません"}, stream_out)
                 return
             
             result = processor.open_folder(folder_path)
-            _write_log(log_dir, f'open_folder success={result.get("success")} folder={folder_path}')
+            log.event('open_folder', success=result.get('success'), folder=folder_path)
         
         else:
-            print(json.dumps({"error": f"不明な処理タイプ: {process_type}"}))
+            _print_result({"error": f"不明な処理タイプ: {process_type}"}, stream_out)
             return
         
         # 結果をJSONで出力
-        print(json.dumps(result, ensure_ascii=False))
-        _write_log(log_dir, f'completed success={result.get("success")}')
+        _print_result(result, stream_out)
+        log.event('completed', success=result.get('success'), seconds=log.elapsed())
         
     except json.JSONDecodeError as e:
-        try:
-            _write_log(_resolve_log_dir({}), f'json decode error: {str(e)}')
-        except Exception:
-            pass
-        print(json.dumps({"error": f"JSONパースエラー: {str(e)}"}))
+        _request_log({}).error('json_decode_error', error=str(e))
+        _print_result({"error": f"JSONパースエラー: {str(e)}"}, stream_out)
     except Exception as e:
         error_info = {
             "error": f"予期しないエラーが発生しました: {str(e)}",
             "traceback": traceback.format_exc()
         }
-        try:
-            _write_log(_resolve_log_dir({}), f'exception: {str(e)}')
-            _write_log(_resolve_log_dir({}), error_info.get('traceback',''))
-        except Exception:
-            pass
-        print(json.dumps(error_info, ensure_ascii=False))
+        (log or _request_log({})).error('exception', error=str(e), traceback=error_info['traceback'])
+        _print_result(error_info, stream_out)
+    finally:
+        if stream_out is not None:
+            sys.stdout = stream_out
 
 if __name__ == "__main__":
     main() 
\ No newline at end of file
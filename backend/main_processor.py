@@ -6,23 +6,203 @@ CSVとExcel処理を統合する
 """
 
 import os
-import sys
-from pathlib import Path
-from typing import Dict, Any
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Any, List, Optional
+from async_pipeline import run_pipeline
+from attendance_archive import archive_totals
+from cancellation import CancellationToken, is_cancelled
 from csv_processor import CSVProcessor
-from excel_processor import ExcelProcessor
+from department_books import run_department_batch
+from excel_processor import ExcelProcessor, TemplateCache, default_template_cache
+from jobs import JobContext, run_job, notify_progress, cancelled_result, output_folder_for
+from output_index import OutputIndex, default_index_path
 from pdf_converter import PDFConverter
+from premiums import WorkRules
+from progress import ProgressCallback
+from summary import SummaryCollector, write_summary_files
+from template_registry import TemplateRegistry
+from watch_folder import FolderWatcher
+from zip_export import ZipExporter, exporting_callback
 
 
 class KintenProcessor:
     """Kintenメイン処理クラス"""
     
-    def __init__(self):
+    def __init__(self, template_cache: Optional[TemplateCache] = None):
+        self.template_cache = template_cache or default_template_cache
         self.csv_processor = CSVProcessor()
-        self.excel_processor = ExcelProcessor()
+        self.excel_processor = ExcelProcessor(template_cache=self.template_cache)
         self.pdf_converter = PDFConverter()
+        self.template_registry: Optional[TemplateRegistry] = None
+        # 出力の索引（index: true または index_path 指定時のみ記録。場所の既定は出力フォルダの kinten_index.sqlite3）
+        self.index_enabled = False
+        self.index_path: Optional[str] = None
+        self._indexes: Dict[str, OutputIndex] = {}
+        self._index_lock = threading.Lock()
+        # 勤怠データのアーカイブ形式（parquet / arrow。空の場合は出力しない）
+        self.archive_format = ''
+        # 再現可能な出力（同じ入力から同じバイト列のワークブック・PDF）
+        self.deterministic = False
     
-    def process_files(self, csv_path: str, template_path: str, base_output_dir: str, employee_name: str) -> Dict[str, Any]:
+    def load_templates(self, template_dir: str) -> Dict[str, Any]:
+        """
+        テンプレートフォルダ内のテンプレートを読み込み・検証してIDで使えるようにする
+        
+        Args:
+            template_dir: テンプレートフォルダ（ファイル名の拡張子なしがテンプレートID）
+            
+        Returns:
+            結果辞書（templates: 各テンプレートのID・パス・検証結果）
+        """
+        if not os.path.isdir(template_dir):
+            return {'success': False, 'error': f"テンプレートフォルダが見つかりません: {template_dir}"}
+        if self.template_registry is None or self.template_registry.directory != os.path.abspath(template_dir):
+            self.template_registry = TemplateRegistry(template_dir, self.template_cache)
+        entries = self.template_registry.refresh()
+        return {
+            'success': True,
+            'template_dir': self.template_registry.directory,
+            'templates': [entry.to_dict() for entry in entries]
+        }
+    
+    def resolve_template(self, template_path: str = '', template_id: str = '') -> str:
+        """
+        テンプレートIDまたはパスからテンプレートのパスを決定（ID指定が優先）
+        
+        Raises:
+            ValueError: ID指定でテンプレートフォルダ未読み込み・未登録・検証エラーの場合
+        """
+        if not template_id:
+            return template_path
+        if self.template_registry is None:
+            raise ValueError("テンプレートフォルダが読み込まれていません（template_dir を指定してください）")
+        return self.template_registry.resolve(template_id)
+    
+    def _index_path(self, base_output_dir: str) -> str:
+        return os.path.abspath(self.index_path or default_index_path(base_output_dir))
+    
+    def _open_index(self, path: str) -> OutputIndex:
+        with self._index_lock:
+            index = self._indexes.get(path)
+            if index is None:
+                index = OutputIndex(path)
+                self._indexes[path] = index
+            return index
+    
+    def output_index(self, base_output_dir: str) -> Optional[OutputIndex]:
+        """出力の索引（記録が有効でない場合は None）"""
+        if not self.index_enabled:
+            return None
+        return self._open_index(self._index_path(base_output_dir))
+    
+    def _index_workbooks(self, base_output_dir: str, results: List[Dict[str, Any]],
+                         contexts: List[JobContext]) -> None:
+        """保存したワークブック（パイプラインで変換したPDFも）を索引に記録（失敗しても処理は続ける）"""
+        try:
+            index = self.output_index(base_output_dir)
+            if index is None:
+                return
+            index.record_workbooks(results, {ctx.csv_path: ctx.template_path for ctx in contexts})
+            index.record_pdfs([
+                {'excel_file': r['output_path'], 'pdf_file': r['pdf_file'],
+                 'engine': r.get('pdf_engine', ''), 'elapsed_seconds': r.get('pdf_elapsed_seconds')}
+                for r in results if r.get('pdf_file')
+            ])
+        except Exception as e:
+            print(f"出力索引の記録エラー: {e}")
+    
+    def _index_pdfs(self, output_folder: str, result: Dict[str, Any],
+                    bundle_seconds: Optional[float] = None) -> None:
+        """変換したPDFを索引に記録（PDF出力フォルダの親フォルダ＝出力フォルダの索引）"""
+        try:
+            index = self.output_index(os.path.dirname(os.path.abspath(output_folder)))
+            if index is None:
+                return
+            index.record_pdfs(result.get('converted_files') or [])
+            if isinstance(result.get('bundle'), dict):
+                index.record_bundle(result['bundle'], bundle_seconds)
+        except Exception as e:
+            print(f"出力索引の記録エラー: {e}")
+    
+    def _start_export(self, export_path: Optional[str], base_dir: str) -> Optional[ZipExporter]:
+        """引き渡し用ZIPの書き込みを開始（export_path 未指定時は None）"""
+        if not export_path:
+            return None
+        return ZipExporter(export_path, base_dir)
+    
+    def _finish_export(self, exporter: Optional[ZipExporter], result: Dict[str, Any],
+                       cancel_token: Optional[CancellationToken] = None,
+                       extra_paths: Optional[List[str]] = None) -> None:
+        """ZIPを完成させ、結果辞書に export（失敗・中断時は export_error）を追加"""
+        if exporter is None:
+            return
+        if is_cancelled(cancel_token):
+            # 途中までの出力を引き渡し用として残さない
+            exporter.abort()
+            result['export_error'] = '処理が中断されたためZIPを作成しませんでした'
+            return
+        try:
+            exporter.add_all(extra_paths or [])
+            result['export'] = exporter.close()
+        except Exception as e:
+            exporter.abort()
+            result['export_error'] = f"ZIPエクスポートエラー: {str(e)}"
+    
+    def query_outputs(self, base_output_dir: str, kind: Optional[str] = None, year_month: Optional[str] = None,
+                      employee_name: Optional[str] = None, department: Optional[str] = None,
+                      stale: bool = False) -> Dict[str, Any]:
+        """
+        出力の索引を検索
+        
+        Args:
+            base_output_dir: 基本出力ディレクトリパス（索引の場所）
+            kind: workbook / pdf / bundle（任意）
+            year_month: 年月（YYYYMM または YYYY_MM。任意）
+            employee_name: 従業員名（任意）
+            department: 部署（任意）
+            stale: True の場合、古くなった出力（入力の変更・ファイルの削除など）だけを返す
+            
+        Returns:
+            結果辞書（outputs: 出力の記録のリスト）
+        """
+        # 検索は記録の有効・無効によらず、既存の索引を開く（索引が無ければ作らない）
+        path = self._index_path(base_output_dir)
+        if not os.path.exists(path):
+            return {'success': False, 'error': f"出力の索引がありません（index: true で記録します）: {path}"}
+        index = self._open_index(path)
+        if stale:
+            outputs = index.stale(kind=kind, year_month=year_month)
+        else:
+            outputs = index.find(kind=kind, year_month=year_month, employee_name=employee_name, department=department)
+        return {'success': True, 'index_path': index.db_path, 'outputs': outputs, 'count': len(outputs)}
+    
+    def archive_totals(self, base_output_dir: str, year_months: Optional[List[str]] = None,
+                       employees: Optional[List[str]] = None, archive_format: str = 'parquet') -> Dict[str, Any]:
+        """
+        アーカイブから年月・従業員ごとの勤務時間を集計（CSV・ワークブックは読まない）
+        
+        Args:
+            base_output_dir: 基本出力ディレクトリパス（アーカイブの場所）
+            year_months: 年月（YYYYMM）の一覧（任意）
+            employees: 従業員名の一覧（任意）
+            archive_format: parquet または arrow
+            
+        Returns:
+            結果辞書（totals: 年月・従業員ごとの勤務時間・勤務日数）
+        """
+        try:
+            totals = archive_totals(base_output_dir, year_months, employees, archive_format)
+        except (RuntimeError, ValueError) as e:
+            return {'success': False, 'error': str(e)}
+        return {'success': True, 'totals': totals, 'count': len(totals)}
+    
+    def process_files(self, csv_path: str, template_path: str, base_output_dir: str, employee_name: str,
+                      progress_callback: Optional[ProgressCallback] = None,
+                      cancel_token: Optional[CancellationToken] = None,
+                      work_rules: Optional[WorkRules] = None,
+                      incremental: bool = False) -> Dict[str, Any]:
         """
         メイン処理：CSV読み込み → Excel転記 → 保存
         
@@ -31,102 +211,290 @@ class KintenProcessor:
             template_path: テンプレートExcelパス
             base_output_dir: 基本出力ディレクトリパス
             employee_name: 従業員名（GUIから取得）
+            progress_callback: 工程ごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）。保存前に中断された場合は何も書き出さない
+            work_rules: 休憩・時間外・深夜・休日の規則（任意）
+            incremental: True の場合、既存の出力ワークブックの変わった日の行だけを書き直す
             
         Returns:
             処理結果辞書
         """
-        try:
-            # macOS ではパスを正規化
-            try:
-                if sys.platform == 'darwin':
-                    csv_path = str(Path(csv_path))
-                    template_path = str(Path(template_path))
-                    base_output_dir = str(Path(base_output_dir))
-            except Exception:
-                pass
-            # 1. CSVファイル読み込み
-            # 従業員名を設定
-            self.csv_processor.set_employee_name(employee_name)
-            
-            csv_result = self.csv_processor.load_csv(csv_path)
-            if not csv_result['success']:
-                return {
-                    'success': False,
-                    'error': f"CSV読み込みエラー: {csv_result['error']}"
-                }
-            
-            # 2. 出力先フォルダとファイル名を生成
-            year_month = csv_result['year_month']
-            
-            # 出力先フォルダを作成（例：2025_07）
-            output_folder = os.path.join(base_output_dir, f"{year_month[:4]}_{year_month[4:]}")
-            output_folder = os.path.abspath(output_folder)  # 絶対パスに変換
-            print(f"Generated output folder: {output_folder}")
-            os.makedirs(output_folder, exist_ok=True)
-            
-            # 出力ファイル名を生成（例：勤怠表_202501_サンプル.xlsx）
-            output_filename = f"勤怠表_{year_month}_{employee_name}.xlsx"
-            output_path = os.path.join(output_folder, output_filename)
-            
-            # 3. テンプレートExcel読み込み
-            excel_result = self.excel_processor.load_template(template_path)
-            if not excel_result['success']:
-                return {
-                    'success': False,
-                    'error': f"Excel読み込みエラー: {excel_result['error']}"
-                }
-            
-            # 4. シート名変更（氏名を含む）
-            if not self.excel_processor.update_sheet_name(year_month, employee_name):
-                return {
-                    'success': False,
-                    'error': "シート名変更エラー"
-                }
-            
-            # 5. 従業員情報書き込み
-            year = year_month[:4]
-            month = year_month[4:]
-            
-            if not self.excel_processor.write_employee_info(employee_name, year, month):
-                return {
-                    'success': False,
-                    'error': "従業員情報書き込みエラー"
-                }
+        # ジョブの状態はコンテキストに閉じ込め、インスタンスには持たない（同一インスタンスで並行実行可能）
+        ctx = JobContext(
+            csv_path=csv_path,
+            template_path=template_path,
+            base_output_dir=base_output_dir,
+            employee_name=employee_name,
+            work_rules=work_rules,
+            incremental=incremental,
+            archive_format=self.archive_format,
+            deterministic=self.deterministic
+        )
+        result = run_job(
+            ctx,
+            template_cache=self.template_cache,
+            progress_callback=progress_callback,
+            cancel_token=cancel_token
+        )
+        self._index_workbooks(base_output_dir, [result], [ctx])
+        return result
+    
+    def process_batch(self, jobs: List[Dict[str, str]], template_path: str, base_output_dir: str,
+                      progress_callback: Optional[ProgressCallback] = None,
+                      cancel_token: Optional[CancellationToken] = None,
+                      max_workers: int = 1,
+                      work_rules: Optional[WorkRules] = None,
+                      summary: bool = False,
+                      incremental: bool = False,
+                      export_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        複数CSVの一括処理（CSV読み込み → Excel転記 → 保存 を1件ずつ実行）
+        
+        Args:
+            jobs: {'csv_path': ..., 'employee_name': ..., 'department': ...（任意）, 'template_id': ...（任意）} のリスト
+            template_path: テンプレートExcelパス
+            base_output_dir: 基本出力ディレクトリパス
+            progress_callback: 1件ごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）。件と件の間で確認する
+            max_workers: 同時実行数（2以上でスレッドプール実行。テンプレートはキャッシュを共有）
+            work_rules: 休憩・時間外・深夜・休日の規則（任意）
+            summary: True の場合、従業員別・部署別の集計ファイルを年月フォルダへ出力する
+            incremental: True の場合、既存の出力ワークブックの変わった日の行だけを書き直す
+            export_path: 指定時は保存できたワークブック（と集計ファイル）を順にこのZIPへ書き込む
             
-            # 6. 勤怠データ転記
-            df = self.csv_processor.get_processed_data()
-            if not self.excel_processor.write_attendance_data(df, employee_name):
-                return {
-                    'success': False,
-                    'error': "勤怠データ転記エラー"
-                }
+        Returns:
+            結果辞書
+        """
+        contexts = self._build_contexts(jobs, template_path, base_output_dir, work_rules, incremental)
+        collector = SummaryCollector() if summary else None
+        exporter = self._start_export(export_path, base_output_dir)
+        processed_files: List[Dict[str, Any]] = []
+        failed_files: List[Dict[str, Any]] = []
+        finished: set = set()
+        total = len(contexts)
+
+        def _run(ctx: JobContext) -> Dict[str, Any]:
+            if is_cancelled(cancel_token):
+                return cancelled_result(cancel_token)
+            return run_job(ctx, template_cache=self.template_cache, cancel_token=cancel_token, summary=collector)
+
+        def _collect(position: int, result: Dict[str, Any]) -> None:
+            if result.get('cancelled'):
+                return
+            finished.add(position)
+            done = len(finished)
+            if result.get('success'):
+                processed_files.append(result)
+                if exporter is not None:
+                    # 保存できた順にZIPへ（他のジョブの処理と並行して書き込む）
+                    exporter.add(result.get('output_path'))
+                notify_progress(progress_callback, 'item', dict(result, status='processed', index=done, total=total))
+            else:
+                failed_files.append({'file': contexts[position].csv_path, 'error': result.get('error', '')})
+                if 'validation' in result:
+                    failed_files[-1]['validation'] = result['validation']
+                notify_progress(progress_callback, 'item', dict(failed_files[-1], status='failed', index=done, total=total))
+            notify_progress(progress_callback, 'progress', {'done': done, 'total': total})
+
+        if max_workers <= 1 or total <= 1:
+            for position, ctx in enumerate(contexts):
+                if is_cancelled(cancel_token):
+                    break
+                _collect(position, _run(ctx))
+        else:
+            with ThreadPoolExecutor(max_workers=max_workers) as executor:
+                futures = {executor.submit(_run, ctx): position for position, ctx in enumerate(contexts)}
+                for future in as_completed(futures):
+                    _collect(futures[future], future.result())
+
+        batch_result: Dict[str, Any] = {
+            'success': len(processed_files) > 0 or total == 0,
+            'processed_files': processed_files,
+            'failed_files': failed_files,
+            'total_processed': len(processed_files),
+            'total_failed': len(failed_files)
+        }
+        if not batch_result['success']:
+            batch_result['error'] = 'すべてのCSVの処理に失敗しました'
+        if len(finished) < total:
+            batch_result.update(cancelled_result(cancel_token))
+            batch_result['skipped_files'] = [ctx.csv_path for i, ctx in enumerate(contexts) if i not in finished]
+        self._write_summary(collector, base_output_dir, batch_result)
+        self._finish_export(exporter, batch_result, cancel_token, batch_result.get('summary_files'))
+        self._index_workbooks(base_output_dir, processed_files, contexts)
+        return batch_result
+    
+    def process_pipeline(self, jobs: List[Dict[str, str]], template_path: str, base_output_dir: str,
+                         pdf_output_folder: Optional[str] = None,
+                         progress_callback: Optional[ProgressCallback] = None,
+                         cancel_token: Optional[CancellationToken] = None,
+                         workers: int = 2,
+                         queue_size: int = 4,
+                         work_rules: Optional[WorkRules] = None,
+                         summary: bool = False,
+                         incremental: bool = False,
+                         export_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        複数CSVをステージパイプラインで一括処理（読み込み・転記・保存・PDF変換を重ねて実行）
+        
+        Args:
+            jobs: {'csv_path': ..., 'employee_name': ..., 'template_id': ...（任意）} のリスト
+            template_path: テンプレートExcelパス
+            base_output_dir: 基本出力ディレクトリパス
+            pdf_output_folder: 指定時は保存したワークブックを続けてPDF変換する
+            progress_callback: 1件ごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）
+            workers: 読み込み・転記・保存の各段のワーカー数
+            queue_size: 段間キューの上限（保持する中間データ量の上限）
+            work_rules: 休憩・時間外・深夜・休日の規則（任意）
+            summary: True の場合、従業員別・部署別の集計ファイルを年月フォルダへ出力する
+            incremental: True の場合、既存の出力ワークブックの変わった日の行だけを書き直す
+            export_path: 指定時は出力（ワークブック・PDF・集計ファイル）を最終段で順にこのZIPへ書き込む
             
-            # 7. ファイル保存
-            save_result = self.excel_processor.save_workbook(output_path)
-            if not save_result['success']:
-                return {
-                    'success': False,
-                    'error': f"ファイル保存エラー: {save_result['error']}"
-                }
+        Returns:
+            結果辞書
+        """
+        contexts = self._build_contexts(jobs, template_path, base_output_dir, work_rules, incremental)
+        collector = SummaryCollector() if summary else None
+        exporter = self._start_export(export_path, base_output_dir)
+        batch_result = run_pipeline(
+            contexts,
+            template_cache=self.template_cache,
+            pdf_output_folder=pdf_output_folder,
+            progress_callback=progress_callback,
+            cancel_token=cancel_token,
+            workers=workers,
+            queue_size=queue_size,
+            summary=collector,
+            pdf_converter=self.pdf_converter,
+            exporter=exporter
+        )
+        self._write_summary(collector, base_output_dir, batch_result)
+        self._finish_export(exporter, batch_result, cancel_token, batch_result.get('summary_files'))
+        self._index_workbooks(base_output_dir, batch_result.get('processed_files', []), contexts)
+        return batch_result
+    
+    def process_department_batch(self, jobs: List[Dict[str, str]], template_path: str, base_output_dir: str,
+                                 progress_callback: Optional[ProgressCallback] = None,
+                                 cancel_token: Optional[CancellationToken] = None,
+                                 max_workers: int = 1,
+                                 work_rules: Optional[WorkRules] = None,
+                                 summary: bool = False,
+                                 export_path: Optional[str] = None) -> Dict[str, Any]:
+        """
+        複数CSVを部署×年月ごとに1ワークブック（従業員ごとに1シート）へ出力
+        
+        Args:
+            jobs: {'csv_path': ..., 'employee_name': ..., 'department': ...（任意）, 'template_id': ...（任意）} のリスト
+            template_path: テンプレートExcelパス
+            base_output_dir: 基本出力ディレクトリパス
+            progress_callback: 1件ごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）。ワークブック単位で確認する
+            max_workers: CSV読み込みの同時実行数
+            work_rules: 休憩・時間外・深夜・休日の規則（任意）
+            summary: True の場合、従業員別・部署別の集計ファイルを年月フォルダへ出力する
+            export_path: 指定時は保存できた部署別ワークブック（と集計ファイル）を順にこのZIPへ書き込む
             
-            return {
-                'success': True,
-                'employee_name': employee_name,
-                'year_month': year_month,
-                'output_path': output_path,
-                'output_folder': output_folder,
-                'row_count': csv_result['row_count']
-            }
+        Returns:
+            結果辞書（process_batch の形式 + department_files）
+        """
+        contexts = self._build_contexts(jobs, template_path, base_output_dir, work_rules)
+        collector = SummaryCollector() if summary else None
+        exporter = self._start_export(export_path, base_output_dir)
+        batch_result = run_department_batch(
+            contexts,
+            template_cache=self.template_cache,
+            progress_callback=progress_callback,
+            cancel_token=cancel_token,
+            max_workers=max_workers,
+            summary=collector,
+            exporter=exporter
+        )
+        self._write_summary(collector, base_output_dir, batch_result)
+        self._finish_export(exporter, batch_result, cancel_token, batch_result.get('summary_files'))
+        self._index_workbooks(base_output_dir, batch_result.get('processed_files', []), contexts)
+        return batch_result
+    
+    def watch_folder(self, inbox_dir: str, template_path: str, base_output_dir: str,
+                     pdf_output_folder: Optional[str] = None,
+                     progress_callback: Optional[ProgressCallback] = None,
+                     cancel_token: Optional[CancellationToken] = None,
+                     max_workers: int = 1,
+                     settle_seconds: float = 2.0,
+                     poll_interval: float = 2.0,
+                     work_rules: Optional[WorkRules] = None,
+                     incremental: bool = False,
+                     once: bool = False) -> Dict[str, Any]:
+        """
+        受信フォルダを監視し、新規・内容が変わったCSVを自動で処理する
+        
+        従業員名はファイル名（勤怠詳細_山田太郎_2025_07.csv）から取得する。
+        
+        Args:
+            inbox_dir: 受信フォルダ
+            template_path: テンプレートExcelパス
+            base_output_dir: 基本出力ディレクトリパス
+            pdf_output_folder: 指定時は保存したワークブックを続けてPDF変換する
+            progress_callback: 1件ごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）。中断されるまで監視を続ける
+            max_workers: 同時に処理する件数
+            settle_seconds: 書き込み完了とみなすまでの待ち時間（秒）
+            poll_interval: 受信フォルダの走査間隔（秒）
+            work_rules: 休憩・時間外・深夜・休日の規則（任意）
+            incremental: True の場合、既存の出力ワークブックの変わった日の行だけを書き直す
+            once: True の場合、その時点で処理できるCSVを処理したら終了する
             
+        Returns:
+            結果辞書（processed_files, failed_files, unchanged_files）
+        """
+        watcher = FolderWatcher(
+            self, inbox_dir, template_path, base_output_dir,
+            pdf_output_folder=pdf_output_folder,
+            max_workers=max_workers,
+            settle_seconds=settle_seconds,
+            poll_interval=poll_interval,
+            work_rules=work_rules,
+            incremental=incremental
+        )
+        return watcher.run(cancel_token=cancel_token, progress_callback=progress_callback, once=once)
+    
+    def _build_contexts(self, jobs: List[Dict[str, str]], template_path: str, base_output_dir: str,
+                        work_rules: Optional[WorkRules], incremental: bool = False) -> List[JobContext]:
+        """
+        バッチ入力のジョブ辞書をジョブコンテキストに変換
+        
+        ジョブに template_id があればそのテンプレート（取引先ごとのテンプレート）を使う。
+        
+        Raises:
+            ValueError: テンプレートIDを解決できない場合
+        """
+        return [
+            JobContext(
+                csv_path=job.get('csv_path', ''),
+                template_path=self.resolve_template(template_path, job.get('template_id', '') or ''),
+                base_output_dir=base_output_dir,
+                employee_name=job.get('employee_name', ''),
+                work_rules=work_rules,
+                department=job.get('department', '') or '',
+                incremental=incremental,
+                archive_format=self.archive_format,
+                deterministic=self.deterministic
+            )
+            for job in jobs
+        ]
+    
+    def _write_summary(self, collector: Optional[SummaryCollector], base_output_dir: str,
+                       batch_result: Dict[str, Any]) -> None:
+        """集計ファイルを出力し、結果辞書に summary_files（失敗時は summary_error）を追加"""
+        if collector is None or len(collector) == 0:
+            return
+        try:
+            batch_result['summary_files'] = write_summary_files(
+                collector.build(),
+                lambda year_month: output_folder_for(base_output_dir, year_month)
+            )
         except Exception as e:
-            import traceback
-            error_details = traceback.format_exc()
-            print(f"Detailed error: {error_details}")
-            return {
-                'success': False,
-                'error': f"処理エラー: {str(e)}",
-                'details': error_details
-            }
+            batch_result['summary_error'] = f"集計ファイル出力エラー: {str(e)}"
     
     def validate_inputs(self, csv_path: str, template_path: str, output_dir: str) -> Dict[str, Any]:
         """
@@ -189,33 +557,62 @@ class KintenProcessor:
         """
         return self.pdf_converter.create_output_folder(base_output_dir)
     
-    def convert_excel_to_pdf(self, excel_files: list, output_folder: str) -> Dict[str, Any]:
+    def convert_excel_to_pdf(self, excel_files: list, output_folder: str,
+                             progress_callback: Optional[ProgressCallback] = None,
+                             cancel_token: Optional[CancellationToken] = None,
+                             bundle_name: Optional[str] = None,
+                             export_path: Optional[str] = None) -> Dict[str, Any]:
         """
         ExcelファイルをPDFに変換
         
         Args:
             excel_files: 変換するExcelファイルのパスリスト
             output_folder: 出力フォルダパス
+            progress_callback: 1ファイルごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）
+            bundle_name: 指定時は全ファイルを1つにまとめたPDF（しおり・索引付き）も出力する
+            export_path: 指定時は変換できたPDF（とまとめPDF）を順にこのZIPへ書き込む
+                         （ZIP内のパスはPDF出力フォルダの親フォルダからの相対パス）
             
         Returns:
             結果辞書
         """
+        exporter = None
         try:
             # ここでの月フォルダ作成は行わない（呼び出し側で既に日付フォルダを作成済み）
             # 渡された output_folder をそのまま利用
             os.makedirs(output_folder, exist_ok=True)
+            exporter = self._start_export(export_path, os.path.dirname(os.path.abspath(output_folder)))
+            convert_callback = exporting_callback(exporter, progress_callback) if exporter else progress_callback
 
             # PDF変換を実行（指定フォルダに出力）
-            result = self.pdf_converter.convert_to_pdf(excel_files, output_folder)
+            result = self.pdf_converter.convert_to_pdf(excel_files, output_folder, progress_callback=convert_callback,
+                                                       cancel_token=cancel_token)
 
             # 変換されたファイル数を追加
             if result.get('success'):
                 result['converted_count'] = len(excel_files)
                 result['output_folder'] = output_folder
 
+            # 配布用のまとめPDF
+            bundle_seconds = None
+            if bundle_name and not is_cancelled(cancel_token):
+                if not bundle_name.lower().endswith('.pdf'):
+                    bundle_name = f"{bundle_name}.pdf"
+                started = time.perf_counter()
+                result['bundle'] = self.pdf_converter.build_pdf_bundle(
+                    excel_files, os.path.join(output_folder, bundle_name),
+                    progress_callback=progress_callback, cancel_token=cancel_token)
+                bundle_seconds = round(time.perf_counter() - started, 3)
+
+            bundle_file = result['bundle'].get('pdf_file') if isinstance(result.get('bundle'), dict) else None
+            self._finish_export(exporter, result, cancel_token, [bundle_file] if bundle_file else None)
+            self._index_pdfs(output_folder, result, bundle_seconds)
             return result
             
         except Exception as e:
+            if exporter is not None:
+                exporter.abort()
             import traceback
             error_details = traceback.format_exc()
             print(f"convert_excel_to_pdf error: {error_details}")
@@ -225,13 +622,17 @@ class KintenProcessor:
                 'details': error_details
             }
     
-    def convert_folder_to_pdf(self, input_folder: str, output_folder: str) -> Dict[str, Any]:
+    def convert_folder_to_pdf(self, input_folder: str, output_folder: str,
+                              progress_callback: Optional[ProgressCallback] = None,
+                              cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         フォルダ内のすべてのExcelファイルをPDFに変換
         
         Args:
             input_folder: 入力フォルダパス（Excelファイルが含まれる）
             output_folder: 出力フォルダパス
+            progress_callback: 1ファイルごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）
             
         Returns:
             結果辞書
@@ -253,13 +654,15 @@ class KintenProcessor:
             file_paths = [file['path'] for file in excel_files]
             
             # PDF変換を実行
-            result = self.pdf_converter.convert_to_pdf(file_paths, output_folder)
+            result = self.pdf_converter.convert_to_pdf(file_paths, output_folder, progress_callback=progress_callback,
+                                                       cancel_token=cancel_token)
             
             # 変換されたファイル数を追加
             if result['success']:
                 result['converted_count'] = len(file_paths)
                 result['output_folder'] = output_folder
             
+            self._index_pdfs(output_folder, result)
             return result
             
         except Exception as e:
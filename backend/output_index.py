@@ -0,0 +1,323 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+出力ファイルの索引（SQLite）
+生成したワークブック・PDF・まとめPDFを、従業員・年月・入力ファイルとそのハッシュ・
+変換エンジン・処理時間とともに記録する。
+「2025年7月のPDFすべて」「入力が変わって古くなった出力」などの検索をフォルダの走査ではなく
+索引付きのクエリで行う。
+
+- 1ファイル（またはシート）につき1行。同じ出力を作り直した場合は行を置き換える
+- 部署別ワークブックは従業員ごとに1行（同じパスで従業員名が異なる）
+- 索引の記録に失敗しても出力処理は失敗させない（呼び出し側で警告のみ）
+"""
+
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+
+INDEX_FILENAME = 'kinten_index.sqlite3'
+SCHEMA_VERSION = 1
+
+# 出力の種類
+KIND_WORKBOOK = 'workbook'
+KIND_PDF = 'pdf'
+KIND_BUNDLE = 'bundle'
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS artifacts (
+    path            TEXT NOT NULL,
+    employee_name   TEXT NOT NULL DEFAULT '',
+    kind            TEXT NOT NULL,
+    year_month      TEXT NOT NULL DEFAULT '',
+    department      TEXT NOT NULL DEFAULT '',
+    source_path     TEXT NOT NULL DEFAULT '',
+    source_digest   TEXT NOT NULL DEFAULT '',
+    source_mtime_ns INTEGER,
+    source_size     INTEGER,
+    template_path   TEXT NOT NULL DEFAULT '',
+    template_digest TEXT NOT NULL DEFAULT '',
+    engine          TEXT NOT NULL DEFAULT '',
+    elapsed_seconds REAL,
+    created_at      TEXT NOT NULL,
+    PRIMARY KEY (path, employee_name)
+);
+CREATE INDEX IF NOT EXISTS idx_artifacts_kind_month ON artifacts (kind, year_month);
+CREATE INDEX IF NOT EXISTS idx_artifacts_employee ON artifacts (employee_name, year_month);
+CREATE INDEX IF NOT EXISTS idx_artifacts_source ON artifacts (source_path);
+"""
+
+_COLUMNS = ('path', 'employee_name', 'kind', 'year_month', 'department', 'source_path', 'source_digest',
+            'source_mtime_ns', 'source_size', 'template_path', 'template_digest', 'engine',
+            'elapsed_seconds', 'created_at')
+
+
+def default_index_path(base_output_dir: str) -> str:
+    """出力フォルダの索引ファイルのパス"""
+    return os.path.join(base_output_dir, INDEX_FILENAME)
+
+
+def normalize_year_month(year_month: str) -> str:
+    """年月を YYYYMM に揃える（'2025_07'・'2025-07' も可）"""
+    return re.sub(r'\D', '', year_month or '')
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _stamp(path: str) -> Tuple[Optional[int], Optional[int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None, None
+    return st.st_mtime_ns, st.st_size
+
+
+def _written_at(path: str) -> str:
+    """出力ファイルの書き込み日時（差分更新で保存しなかった場合も実際の日時になる）"""
+    try:
+        timestamp = os.path.getmtime(path)
+    except OSError:
+        timestamp = datetime.now().timestamp()
+    return datetime.fromtimestamp(timestamp).isoformat(timespec='microseconds')
+
+
+class OutputIndex:
+    """
+    出力ファイルの索引（複数スレッドから使用可能）
+
+    Args:
+        db_path: 索引ファイル（SQLite）のパス
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        os.makedirs(os.path.dirname(os.path.abspath(db_path)), exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.row_factory = sqlite3.Row
+        self._lock = threading.Lock()
+        # テンプレートのハッシュ（パス → (stamp, ハッシュ)）
+        self._template_digests: Dict[str, Tuple[Tuple[Optional[int], Optional[int]], str]] = {}
+        with self._lock, self._conn:
+            self._conn.execute('PRAGMA journal_mode=WAL')
+            self._conn.executescript(_SCHEMA)
+            self._conn.execute(f'PRAGMA user_version = {SCHEMA_VERSION}')
+
+    def __enter__(self) -> 'OutputIndex':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+    def _template_digest(self, template_path: str) -> str:
+        if not template_path:
+            return ''
+        stamp = _stamp(template_path)
+        cached = self._template_digests.get(template_path)
+        if cached is not None and cached[0] == stamp:
+            return cached[1]
+        try:
+            digest = _file_digest(template_path)
+        except OSError:
+            return ''
+        self._template_digests[template_path] = (stamp, digest)
+        return digest
+
+    def _recorded_digest(self, source_path: str, mtime_ns: Optional[int], size: Optional[int]) -> Optional[str]:
+        """同じ更新日時・サイズで記録済みの入力ファイルのハッシュ（無ければ None）"""
+        if not source_path or mtime_ns is None:
+            return None
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT source_digest FROM artifacts WHERE source_path = ? AND source_mtime_ns = ? "
+                "AND source_size = ? AND source_digest != '' LIMIT 1",
+                (source_path, mtime_ns, size)).fetchone()
+        return row['source_digest'] if row is not None else None
+
+    def _source_row(self, source_path: str) -> Dict[str, Any]:
+        mtime_ns, size = _stamp(source_path)
+        # 更新日時・サイズが記録時と同じ入力は読み直さない（stale の判定と同じ基準）
+        digest = self._recorded_digest(source_path, mtime_ns, size)
+        if digest is None:
+            try:
+                digest = _file_digest(source_path) if source_path else ''
+            except OSError:
+                digest = ''
+        return {'source_path': source_path, 'source_digest': digest,
+                'source_mtime_ns': mtime_ns, 'source_size': size}
+
+    def _upsert(self, rows: Iterable[Dict[str, Any]]) -> int:
+        values = []
+        for row in rows:
+            record = {column: row.get(column) for column in _COLUMNS}
+            for column in ('employee_name', 'year_month', 'department', 'source_path', 'source_digest',
+                           'template_path', 'template_digest', 'engine'):
+                record[column] = record[column] or ''
+            record['path'] = os.path.abspath(record['path'])
+            record['created_at'] = _written_at(record['path'])
+            values.append(tuple(record[column] for column in _COLUMNS))
+        if not values:
+            return 0
+        placeholders = ', '.join('?' for _ in _COLUMNS)
+        with self._lock, self._conn:
+            self._conn.executemany(
+                f"INSERT OR REPLACE INTO artifacts ({', '.join(_COLUMNS)}) VALUES ({placeholders})", values)
+        return len(values)
+
+    def record_workbooks(self, results: Iterable[Dict[str, Any]], template_paths: Dict[str, str]) -> int:
+        """
+        保存したワークブックを記録
+
+        Args:
+            results: ジョブの結果辞書（success・output_path・csv_path を持つもの）
+            template_paths: CSVパス → テンプレートパス
+
+        Returns:
+            記録した件数
+        """
+        rows = []
+        for result in results:
+            if not result.get('success') or not result.get('output_path'):
+                continue
+            csv_path = os.path.abspath(result['csv_path']) if result.get('csv_path') else ''
+            template_path = template_paths.get(result.get('csv_path', ''), '')
+            row = {
+                'path': result['output_path'],
+                'employee_name': result.get('employee_name', ''),
+                'kind': KIND_WORKBOOK,
+                'year_month': result.get('year_month', ''),
+                'department': result.get('department', ''),
+                'template_path': os.path.abspath(template_path) if template_path else '',
+                'template_digest': self._template_digest(template_path),
+                'engine': 'openpyxl' + (f"/{result['update_mode']}" if result.get('update_mode') else ''),
+                'elapsed_seconds': result.get('elapsed_seconds'),
+            }
+            row.update(self._source_row(csv_path))
+            rows.append(row)
+        return self._upsert(rows)
+
+    def _workbook_rows(self, excel_path: str) -> List[sqlite3.Row]:
+        with self._lock:
+            return self._conn.execute(
+                'SELECT employee_name, year_month, department FROM artifacts WHERE path = ? AND kind = ?',
+                (os.path.abspath(excel_path), KIND_WORKBOOK)).fetchall()
+
+    def record_pdfs(self, converted_files: Iterable[Dict[str, Any]]) -> int:
+        """
+        変換したPDFを記録（従業員・年月は元のワークブックの記録から引き継ぐ）
+
+        Args:
+            converted_files: PDFConverter.convert_to_pdf の converted_files
+
+        Returns:
+            記録した件数
+        """
+        rows = []
+        for entry in converted_files:
+            excel_path = os.path.abspath(entry.get('excel_file', ''))
+            source = self._source_row(excel_path)
+            workbooks = self._workbook_rows(excel_path) or [{'employee_name': '', 'year_month': '', 'department': ''}]
+            for workbook in workbooks:
+                row = {
+                    'path': entry['pdf_file'],
+                    'employee_name': workbook['employee_name'],
+                    'kind': KIND_PDF,
+                    'year_month': workbook['year_month'],
+                    'department': workbook['department'],
+                    'engine': entry.get('engine', ''),
+                    'elapsed_seconds': entry.get('elapsed_seconds'),
+                }
+                row.update(source)
+                rows.append(row)
+        return self._upsert(rows)
+
+    def record_bundle(self, bundle_result: Dict[str, Any], elapsed_seconds: Optional[float] = None) -> int:
+        """まとめPDFを記録（入力は複数のため元ファイルは記録しない）"""
+        if not bundle_result.get('success'):
+            return 0
+        return self._upsert([{
+            'path': bundle_result['pdf_file'],
+            'kind': KIND_BUNDLE,
+            'engine': 'reportlab',
+            'elapsed_seconds': elapsed_seconds,
+        }])
+
+    def find(self, kind: Optional[str] = None, year_month: Optional[str] = None,
+             employee_name: Optional[str] = None, department: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        条件に合う出力を検索（条件はすべて任意。年月は '2025_07' 形式も可）
+
+        Returns:
+            出力の記録のリスト（年月・従業員・種類・パス順）
+        """
+        conditions = []
+        params: List[Any] = []
+        for column, value in (('kind', kind), ('year_month', normalize_year_month(year_month or '')),
+                              ('employee_name', employee_name), ('department', department)):
+            if value:
+                conditions.append(f'{column} = ?')
+                params.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ''
+        with self._lock:
+            rows = self._conn.execute(
+                f'SELECT * FROM artifacts {where} ORDER BY year_month, employee_name, kind, path', params).fetchall()
+        return [dict(row) for row in rows]
+
+    def stale(self, kind: Optional[str] = None, year_month: Optional[str] = None) -> List[Dict[str, Any]]:
+        """
+        古くなった出力を検索
+
+        - missing: 出力ファイルが無い
+        - source_missing: 入力ファイル（CSV・ワークブック）が無い
+        - source_changed: 入力ファイルの内容が出力時から変わった（更新日時・サイズが変わった場合のみハッシュを比較）
+        - workbook_regenerated: PDFの作成後に元のワークブックが作り直された（索引内の比較のみ）
+
+        Returns:
+            出力の記録に reason を加えたリスト
+        """
+        stale: Dict[Tuple[str, str], Dict[str, Any]] = {}
+        with self._lock:
+            regenerated = self._conn.execute(
+                'SELECT DISTINCT p.path, p.employee_name FROM artifacts AS p '
+                'JOIN artifacts AS w ON w.path = p.source_path AND w.kind = ? '
+                'WHERE p.kind = ? AND w.created_at > p.created_at',
+                (KIND_WORKBOOK, KIND_PDF)).fetchall()
+        regenerated_keys = {(row['path'], row['employee_name']) for row in regenerated}
+
+        source_digests: Dict[str, Optional[str]] = {}
+        for row in self.find(kind=kind, year_month=year_month):
+            key = (row['path'], row['employee_name'])
+            reason = None
+            if not os.path.exists(row['path']):
+                reason = 'missing'
+            elif row['source_path']:
+                mtime_ns, size = _stamp(row['source_path'])
+                if mtime_ns is None:
+                    reason = 'source_missing'
+                elif (mtime_ns, size) != (row['source_mtime_ns'], row['source_size']):
+                    if row['source_path'] not in source_digests:
+                        try:
+                            source_digests[row['source_path']] = _file_digest(row['source_path'])
+                        except OSError:
+                            source_digests[row['source_path']] = None
+                    if source_digests[row['source_path']] != row['source_digest']:
+                        reason = 'source_changed'
+            if reason is None and key in regenerated_keys:
+                reason = 'workbook_regenerated'
+            if reason is not None:
+                stale[key] = dict(row, reason=reason)
+        return [stale[key] for key in sorted(stale, key=lambda k: (stale[k]['year_month'], k[1], k[0]))]
@@ -0,0 +1,225 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+PDFバンドル（部署・月末配布用の1ファイルPDF）
+複数ワークブックの描画結果を1つのPDFへ順に書き込み、従業員（シート）ごとのしおりと
+末尾のページ索引を付ける。
+
+ワークブック1件分の描画結果を受け取るたびにページへ組版して手放すため、
+全ワークブックの描画結果（表・セル）を同時にメモリへ持つことはない。
+"""
+
+import os
+from dataclasses import dataclass
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+# reportlab が無い環境でも import できるようにする（出力の可否は呼び出し側で判定）
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.pagesizes import A4
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import mm
+    from reportlab.platypus import (
+        BaseDocTemplate,
+        Flowable,
+        LongTable,
+        NextPageTemplate,
+        PageBreak,
+        Paragraph,
+        Spacer,
+        TableStyle,
+    )
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+    # フォールバック用のダミー定義
+    class Flowable:
+        pass
+
+from file_output import commit_file, discard, temp_path_for
+from sheet_renderer import RenderedSheet, page_template_for
+
+
+INDEX_TITLE = "索引"
+
+# 索引ページの余白（mm）
+_INDEX_MARGIN_MM = 15
+
+
+def _index_margins() -> Tuple[float, float, float, float]:
+    """索引ページの余白（左, 右, 上, 下）"""
+    margin = _INDEX_MARGIN_MM * mm
+    return (margin, margin, margin, margin)
+
+
+@dataclass(frozen=True)
+class BundleEntry:
+    """バンドル内の1シート（従業員）の位置"""
+    document: str
+    title: str
+    page: int
+
+
+class _Bookmark(Flowable):
+    """描画されたページにしおりを付ける大きさ0のフロー要素"""
+
+    def __init__(self, key: str, title: str, level: int, on_draw=None):
+        super().__init__()
+        self.key = key
+        self.title = title
+        self.level = level
+        self.on_draw = on_draw
+
+    def wrap(self, availWidth, availHeight):
+        return 0, 0
+
+    def draw(self):
+        canvas = self.canv
+        canvas.bookmarkPage(self.key)
+        canvas.addOutlineEntry(self.title, self.key, level=self.level, closed=self.level == 0)
+        if self.on_draw is not None:
+            self.on_draw(canvas.getPageNumber())
+
+
+class PdfBundleWriter:
+    """
+    描画結果を順に1つのPDFへ書き込む
+
+    使い方:
+        writer = PdfBundleWriter(path, font_name)
+        for ...:
+            writer.add_document(title, rendered_sheets)
+        writer.close()
+    """
+
+    def __init__(self, pdf_path: str, font_name: str = 'Helvetica', index: bool = True, invariant: bool = False):
+        self.pdf_path = pdf_path
+        self._temp_path: Optional[str] = None  # 書き出し中の一時ファイル（close で pdf_path に置き換える）
+        self.font_name = font_name
+        self.index = index
+        self.invariant = invariant  # 作成日時・文書IDを固定する（同じ内容から同じバイト列）
+        self.entries: List[BundleEntry] = []
+        self._doc: Optional[BaseDocTemplate] = None
+        self._templates: Dict[Tuple[Tuple[float, float], Tuple[float, float, float, float]], str] = {}
+        self._bookmarks = 0
+
+    def _template_id(self, page_size: Tuple[float, float], margins: Tuple[float, float, float, float]) -> str:
+        """用紙サイズ・余白ごとのページテンプレート（同じ設定のシートで共有）"""
+        key = (tuple(page_size), tuple(margins))
+        template_id = self._templates.get(key)
+        if template_id is None:
+            template_id = f'layout{len(self._templates)}'
+            self._templates[key] = template_id
+            template = page_template_for(page_size, margins, template_id)
+            if self._doc is None:
+                # 最初のテンプレートで組版を開始（1ページ目の用紙設定になる）
+                self._temp_path = temp_path_for(self.pdf_path)
+                self._doc = BaseDocTemplate(self._temp_path, pagesize=page_size, pageTemplates=[template],
+                                            pageCompression=1, invariant=1 if self.invariant else None)
+                self._doc._startBuild()
+            else:
+                self._doc.addPageTemplates(template)
+        return template_id
+
+    def _next_key(self) -> str:
+        self._bookmarks += 1
+        return f'bm{self._bookmarks}'
+
+    def _flow(self, story: List[Any]) -> None:
+        """フロー要素をページへ組版（BaseDocTemplate.build と同じ処理を要素の到着順に行う）"""
+        doc = self._doc
+        doc.canv._doctemplate = doc
+        try:
+            while story:
+                doc.clean_hanging()
+                doc.handle_flowable(story)
+        finally:
+            del doc.canv._doctemplate
+
+    def _start_page(self, template_id: str) -> List[Any]:
+        """新しいページ（最初の書き込み時は1ページ目をそのまま使う）"""
+        if self._bookmarks == 0:
+            return []
+        return [NextPageTemplate(template_id), PageBreak()]
+
+    def add_document(self, title: str, rendered: Iterable[RenderedSheet]) -> int:
+        """
+        1ワークブック分のシートを追加
+
+        シートが複数ある場合はワークブックのしおりの下にシートごとのしおりを付ける。
+
+        Returns:
+            追加したシート数
+        """
+        sheets = list(rendered)
+        if not sheets:
+            return 0
+        nested = len(sheets) > 1
+        for position, sheet in enumerate(sheets):
+            template_id = self._template_id(sheet.page_size, sheet.margins)
+            story = self._start_page(template_id)
+            if nested and position == 0:
+                story.append(_Bookmark(self._next_key(), title, 0))
+            sheet_title = sheet.title or title
+
+            def _record(page: int, sheet_title: str = sheet_title) -> None:
+                self.entries.append(BundleEntry(document=title, title=sheet_title, page=page))
+            story.append(_Bookmark(self._next_key(), sheet_title if nested else title, 1 if nested else 0, _record))
+            story.extend(sheet.flowables)
+            self._flow(story)
+        return len(sheets)
+
+    def _index_story(self) -> List[Any]:
+        heading = ParagraphStyle('bundle_index_heading', fontName=self.font_name, fontSize=14, leading=18)
+        rows: List[List[Any]] = [['No.', 'シート', 'ページ']]
+        for number, entry in enumerate(self.entries, 1):
+            rows.append([str(number), entry.title, str(entry.page)])
+        left, right, _, _ = _index_margins()
+        width = A4[0] - left - right
+        table = LongTable(rows, colWidths=[15 * mm, width - 40 * mm, 25 * mm], repeatRows=1)
+        table.setStyle(TableStyle([
+            ('FONTNAME', (0, 0), (-1, -1), self.font_name),
+            ('FONTSIZE', (0, 0), (-1, -1), 9),
+            ('LINEBELOW', (0, 0), (-1, 0), 0.75, colors.black),
+            ('LINEBELOW', (0, 1), (-1, -1), 0.25, colors.grey),
+            ('ALIGN', (0, 0), (0, -1), 'RIGHT'),
+            ('ALIGN', (2, 0), (2, -1), 'RIGHT'),
+        ]))
+        return [_Bookmark(self._next_key(), INDEX_TITLE, 0), Paragraph(INDEX_TITLE, heading),
+                Spacer(1, 4 * mm), table]
+
+    def close(self) -> Dict[str, Any]:
+        """
+        索引を追加してPDFを書き出す
+
+        Returns:
+            結果辞書（pdf_file, page_count, entries）
+        """
+        if self._doc is None:
+            return {'success': False, 'error': 'バンドルに含めるシートがありません'}
+        if self.index and self.entries:
+            template_id = self._template_id(A4, _index_margins())
+            self._flow(self._start_page(template_id) + self._index_story())
+        doc = self._doc
+        self._doc = None
+        page_count = doc.canv.getPageNumber()
+        temp_path, self._temp_path = self._temp_path, None
+        try:
+            doc._endBuild()
+        except BaseException:
+            discard(temp_path)
+            raise
+        commit_file(temp_path, self.pdf_path)
+        return {
+            'success': True,
+            'pdf_file': self.pdf_path,
+            'pdf_name': os.path.basename(self.pdf_path),
+            'page_count': page_count,
+            'entries': [{'document': e.document, 'title': e.title, 'page': e.page} for e in self.entries]
+        }
+
+    def abort(self) -> None:
+        """書き込みを中止して途中のファイルを残さない"""
+        self._doc = None
+        discard(self._temp_path)
+        self._temp_path = None
@@ -5,16 +5,26 @@ PDF変換機能（クロスプラットフォーム対応）
 ExcelファイルをPDFに変換する - Windows/Mac対応
 """
 
+import io
 import os
 import glob
 import platform
 import subprocess
 import sys
 from datetime import datetime
-from typing import Dict, Any, List, Optional, Tuple, Union, TYPE_CHECKING
+from typing import Dict, Any, Iterable, Iterator, List, Optional, Sized, Tuple, Union, TYPE_CHECKING
 from pathlib import Path
 import shutil
 import tempfile
+import time
+
+from cancellation import CancellationToken, OperationCancelled, is_cancelled
+from file_output import commit_file, discard, temp_path_for, write_bytes_if_changed
+from formula_engine import evaluate_sheet
+from pdf_bundle import PdfBundleWriter
+from progress import ProgressCallback
+from sheet_renderer import SheetRenderer, build_pdf
+from workbook_reader import WorkbookSource
 
 # Excel読み込み用
 try:
@@ -63,11 +73,25 @@ if REPORTLAB_AVAILABLE:
         JAPANESE_FONT = 'Helvetica'
 
 
+def _file_count(excel_files: Iterable[str]) -> int:
+    """変換対象の件数（逐次渡される場合は不明のため 0）"""
+    return len(excel_files) if isinstance(excel_files, Sized) else 0
+
+
+def _tracked(excel_files: Iterable[str], requested: List[str]) -> Iterator[str]:
+    """逐次渡されるファイルを、取り出した順に requested へ記録しながら渡す"""
+    for excel_file in excel_files:
+        requested.append(excel_file)
+        yield excel_file
+
+
 class PDFConverter:
     """クロスプラットフォーム対応PDF変換クラス"""
     
     def __init__(self):
         self.platform = platform.system()
+        # openpyxl+reportlab で出力するPDFの作成日時・文書IDを固定する（Excelによる出力は対象外）
+        self.deterministic = False
         self._check_dependencies()
         
     def _check_dependencies(self) -> Dict[str, bool]:
@@ -139,6 +163,69 @@ class PDFConverter:
                 pythoncom.CoUninitialize()
             except Exception:
                 pass
+
+    def _report_item(self, progress_callback: Optional[ProgressCallback], status: str,
+                     entry: Dict[str, str], index: int, total: int) -> None:
+        """
+        1ファイル分の変換結果を進捗コールバックへ通知
+
+        Args:
+            progress_callback: 進捗通知コールバック（None の場合は何もしない）
+            status: 'converted'・'bundled' または 'failed'
+            entry: converted_files / failed_files に追加した要素
+            index: 処理済みファイル数（1始まり）
+            total: 対象ファイル総数
+        """
+        if progress_callback is None:
+            return
+        try:
+            item = {'status': status, 'index': index, 'total': total}
+            item.update(entry)
+            progress_callback('item', item)
+            progress_callback('progress', {'done': index, 'total': total})
+        except Exception as e:
+            # 通知失敗で変換処理自体は止めない
+            print(f"進捗通知エラー: {str(e)}")
+
+    def _remove_partial_output(self, path: Optional[str]) -> None:
+        """失敗・中断時に書きかけの出力ファイルを削除"""
+        try:
+            if path and os.path.exists(path):
+                os.remove(path)
+        except Exception:
+            pass
+
+    def _run_cancellable(self, cmd: List[str], timeout_seconds: float,
+                         cancel_token: Optional[CancellationToken] = None) -> Tuple[int, str, str]:
+        """
+        サブプロセスを実行し、タイムアウトまたは中断要求があれば強制終了する
+
+        Returns:
+            (returncode, stdout, stderr)
+
+        Raises:
+            subprocess.TimeoutExpired: タイムアウト時
+            OperationCancelled: 中断要求時
+        """
+        if cancel_token is not None:
+            remaining = cancel_token.remaining()
+            if remaining is not None:
+                timeout_seconds = min(timeout_seconds, remaining)
+        proc = subprocess.Popen(cmd, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        started = time.monotonic()
+        while True:
+            try:
+                stdout, stderr = proc.communicate(timeout=0.5)
+                return proc.returncode, stdout or '', stderr or ''
+            except subprocess.TimeoutExpired:
+                if is_cancelled(cancel_token):
+                    proc.kill()
+                    proc.communicate()
+                    raise OperationCancelled(cancel_token.reason if cancel_token else 'requested')
+                if time.monotonic() - started >= timeout_seconds:
+                    proc.kill()
+                    proc.communicate()
+                    raise subprocess.TimeoutExpired(cmd, timeout_seconds)
         
     def get_excel_files(self, folder_path: str) -> Dict[str, Any]:
         """
@@ -307,40 +394,59 @@ class PDFConverter:
                 'system_info': self.get_system_info()
             }
     
-    def _validate_excel_file(self, file_path: str) -> Tuple[bool, str]:
-        """Excelファイルの妥当性を検証"""
+    def _validate_excel_file(self, file_path: str, source: Optional[WorkbookSource] = None) -> Tuple[bool, str]:
+        """
+        Excelファイルの妥当性を検証
+        
+        source を渡した場合はその解析結果を描画でも使い回す（ファイルの二重解析をしない）。
+        """
         try:
             if not OPENPYXL_AVAILABLE:
                 return False, "openpyxl が利用できません"
             
-            if not os.path.exists(file_path):
-                return False, "ファイルが見つかりません"
-            
-            if not os.access(file_path, os.R_OK):
-                return False, "ファイルの読み取り権限がありません"
-            
-            # ファイルサイズの確認
-            file_size = os.path.getsize(file_path)
-            if file_size == 0:
-                return False, "ファイルが空です"
-            
-            if file_size > 100 * 1024 * 1024:  # 100MB制限
-                return False, "ファイルサイズが大きすぎます (100MB以上)"
-            
-            # Excelファイルの読み込みテスト
-            try:
-                workbook = openpyxl.load_workbook(file_path, data_only=True)
-                if not workbook.sheetnames:
-                    return False, "シートが見つかりません"
-                workbook.close()
-            except Exception as e:
-                return False, f"Excelファイルの読み込みエラー: {str(e)}"
-            
-            return True, "OK"
+            if source is not None:
+                return source.validate()
+            with WorkbookSource(file_path) as own_source:
+                return own_source.validate()
             
         except Exception as e:
             return False, f"ファイル検証エラー: {str(e)}"
     
+    def _render_workbook(self, source: WorkbookSource) -> List[Any]:
+        """
+        ワークブックの各シートを印刷範囲・列幅・結合セルに従って描画（行数・列数の上限なし）
+        
+        Returns:
+            描画できたシートの RenderedSheet のリスト
+        """
+        # 数式のまま読み込み、日付・曜日などの数式は自前で計算する
+        # （openpyxlで保存したファイルには計算結果が保存されていないため）
+        renderer = SheetRenderer(font_name=JAPANESE_FONT)
+        rendered = []
+        for sheet in source.workbook.worksheets:
+            try:
+                evaluation = evaluate_sheet(sheet)
+                values = evaluation.values
+                if evaluation.unsupported:
+                    # 未対応の数式はExcelで保存された計算結果があればそれを使う
+                    values.update(source.cached_values(sheet.title, evaluation.unsupported))
+                sheet_render = renderer.render(sheet, values)
+            except Exception as e:
+                print(f"シート描画エラー({sheet.title}): {str(e)}")
+                continue
+            if sheet_render is not None:
+                rendered.append(sheet_render)
+        return rendered
+    
+    def _open_workbook(self, excel_file: str) -> WorkbookSource:
+        """ワークブックを開く（macOS ではパスを正規化）"""
+        try:
+            if sys.platform == 'darwin':
+                excel_file = str(Path(excel_file))
+        except Exception:
+            pass
+        return WorkbookSource(excel_file)
+    
     def _excel_to_pdf_openpyxl(self, excel_file: str, pdf_path: str) -> Tuple[bool, str]:
         """
         openpyxlを使用してExcelからPDFを生成
@@ -356,100 +462,111 @@ class PDFConverter:
             if not REPORTLAB_AVAILABLE:
                 return False, "reportlab が利用できません"
             
-            # Excelファイルを読み込み（macOS ではパスを正規化）
-            try:
-                if sys.platform == 'darwin':
-                    excel_file = str(Path(excel_file))
-            except Exception:
-                pass
-            workbook = openpyxl.load_workbook(excel_file, data_only=True)
-            
-            # PDFドキュメントを作成
-            doc = SimpleDocTemplate(
-                pdf_path,
-                pagesize=A4,
-                rightMargin=20*mm,
-                leftMargin=20*mm,
-                topMargin=20*mm,
-                bottomMargin=20*mm
-            )
-            
-            story = []
-            styles = getSampleStyleSheet()
-            # 日本語対応（段落ヘッダーは作らず、シンプルに表のみ出力）
-            normal_jp = ParagraphStyle(
-                'NormalJP',
-                parent=styles['Normal'],
-                fontName=JAPANESE_FONT,
-                fontSize=9
-            )
-            
-            # FMT（独自見出し）は出力しない
-            
-            # 各シートを処理
-            processed_sheets = 0
-            for sheet_name in workbook.sheetnames:
-                try:
-                    sheet = workbook[sheet_name]
-                    
-                    # シートのデータを取得
-                    data = self._get_sheet_data(sheet)
-                    
-                    if data:
-                        # テーブルを作成
-                        table = Table(data)
-                        table.setStyle(TableStyle([
-                            ('BACKGROUND', (0, 0), (-1, 0), colors.grey),
-                            ('TEXTCOLOR', (0, 0), (-1, 0), colors.whitesmoke),
-                            ('ALIGN', (0, 0), (-1, -1), 'LEFT'),
-                            ('FONTNAME', (0, 0), (-1, 0), JAPANESE_FONT),
-                            ('FONTSIZE', (0, 0), (-1, 0), 10),
-                            ('BOTTOMPADDING', (0, 0), (-1, 0), 12),
-                            ('BACKGROUND', (0, 1), (-1, -1), colors.beige),
-                            ('FONTNAME', (0, 1), (-1, -1), JAPANESE_FONT),
-                            ('FONTSIZE', (0, 1), (-1, -1), 8),
-                            ('GRID', (0, 0), (-1, -1), 1, colors.black)
-                        ]))
-                        
-                        story.append(table)
-                        processed_sheets += 1
-                    else:
-                        story.append(Paragraph("", normal_jp))
-                    
-                    story.append(PageBreak())
-                    
-                except Exception as e:
-                    # ログのみ。PDFには余計な文言は出さない
-                    story.append(PageBreak())
-                    continue
-            
-            workbook.close()
+            # 検証と描画で同じ解析結果を使う
+            with self._open_workbook(excel_file) as source:
+                ok, message = self._validate_excel_file(excel_file, source)
+                if not ok:
+                    return False, message
+                rendered = self._render_workbook(source)
+            processed_sheets = len(rendered)
             
             if processed_sheets == 0:
                 return False, "処理可能なシートが見つかりませんでした"
             
-            # PDFを生成
-            doc.build(story)
-            
-            # ファイルが正常に作成されたかチェック
-            if not os.path.exists(pdf_path):
-                return False, "PDFファイルの作成に失敗しました"
-            
-            if os.path.getsize(pdf_path) == 0:
-                return False, "PDFファイルが空です"
+            # PDFを生成（シートごとに用紙サイズ・余白を切り替える）
+            if self.deterministic:
+                # 内容が同じなら書き込まない（更新日時を保つ）
+                buffer = io.BytesIO()
+                build_pdf(buffer, rendered, invariant=True)
+                write_bytes_if_changed(pdf_path, buffer.getvalue())
+            else:
+                # 一時ファイルへ書き出してから置き換える（失敗しても既存のPDFを壊さない）
+                temp_path = temp_path_for(pdf_path)
+                try:
+                    build_pdf(temp_path, rendered)
+                    if not os.path.exists(temp_path):
+                        return False, "PDFファイルの作成に失敗しました"
+                    if os.path.getsize(temp_path) == 0:
+                        return False, "PDFファイルが空です"
+                    commit_file(temp_path, pdf_path)
+                finally:
+                    discard(temp_path)
             
             return True, f"成功 ({processed_sheets} シート処理)"
             
         except Exception as e:
             return False, f"PDF変換エラー: {str(e)}"
 
-    def _excel_to_pdf_win32(self, excel_files: List[str], output_folder: str) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    def build_pdf_bundle(self, excel_files: List[str], bundle_path: str,
+                         progress_callback: Optional[ProgressCallback] = None,
+                         cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
+        """
+        複数のExcelファイルを1つのPDFにまとめる（従業員ごとのしおり・末尾にページ索引）
+        
+        ファイルを1件ずつ描画してすぐにページへ組版するため、メモリ上に持つ描画結果は常に1ファイル分。
+        
+        Args:
+            excel_files: まとめるExcelファイルのパスリスト（この順に並ぶ）
+            bundle_path: 出力PDFのパス
+            progress_callback: 1ファイルごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）。中断時は途中のPDFを削除する
+            
+        Returns:
+            結果辞書（pdf_file, page_count, entries, failed_files）
+        """
+        if not (OPENPYXL_AVAILABLE and REPORTLAB_AVAILABLE):
+            return {'success': False, 'error': 'openpyxl と reportlab が必要です'}
+        
+        writer = PdfBundleWriter(bundle_path, font_name=JAPANESE_FONT, invariant=self.deterministic)
+        failed_files: List[Dict[str, str]] = []
+        total = len(excel_files)
+        try:
+            for index, excel_path in enumerate(excel_files, 1):
+                if is_cancelled(cancel_token):
+                    writer.abort()
+                    return {
+                        'success': False,
+                        'cancelled': True,
+                        'cancel_reason': cancel_token.reason if cancel_token else '',
+                        'error': f"処理が中断されました（{cancel_token.reason if cancel_token else ''}）"
+                    }
+                title = os.path.splitext(os.path.basename(excel_path))[0]
+                error = '処理可能なシートが見つかりませんでした'
+                sheet_count = 0
+                try:
+                    with self._open_workbook(excel_path) as source:
+                        ok, message = self._validate_excel_file(excel_path, source)
+                        if ok:
+                            sheet_count = writer.add_document(title, self._render_workbook(source))
+                        else:
+                            error = message
+                except Exception as e:
+                    error = f"PDF変換エラー: {str(e)}"
+                    print(f"バンドル追加エラー({excel_path}): {str(e)}")
+                if sheet_count == 0:
+                    failed_files.append({'file': excel_path, 'error': error})
+                    self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
+                else:
+                    self._report_item(progress_callback, 'bundled',
+                                      {'excel_file': excel_path, 'sheet_count': sheet_count}, index, total)
+            result = writer.close()
+        except Exception as e:
+            writer.abort()
+            return {'success': False, 'error': f'PDFバンドル作成エラー: {str(e)}'}
+        result['failed_files'] = failed_files
+        return result
+
+    def _excel_to_pdf_win32(self, excel_files: Iterable[str], output_folder: str,
+                            progress_callback: Optional[ProgressCallback] = None,
+                            cancel_token: Optional[CancellationToken] = None) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
         """
         Windows + Excel(COM)でワークブック内の全シートをPDF化（高速・レイアウト忠実）
 
         Args:
-            excel_files: 変換するExcelファイルパス一覧
+            excel_files: 変換するExcelファイルパス一覧（逐次渡すイテレータも可）
             output_folder: 出力フォルダ
+            progress_callback: 1ファイルごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（ファイル間で確認し、中断時は残りを処理しない）
 
         Returns:
             (converted_files, failed_files) のタプル
@@ -489,15 +606,18 @@ class PDFConverter:
             except Exception:
                 pass
 
-            for excel_file in excel_files:
+            total = _file_count(excel_files)
+            for index, excel_file in enumerate(excel_files, 1):
+                if is_cancelled(cancel_token):
+                    break
+                started = time.monotonic()
+                temp_path = None
                 try:
-                    # PDF出力先パスを作成
+                    # PDF出力先パスを作成（Excelには一時ファイルへ出力させ、完成後に衝突しない名前で確定）
                     base_name = os.path.splitext(os.path.basename(excel_file))[0]
                     pdf_name = f"{base_name}.pdf"
                     pdf_path = os.path.join(output_folder, pdf_name)
-                    if os.path.exists(pdf_path):
-                        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-                        pdf_path = os.path.join(output_folder, f"{base_name}_{timestamp}.pdf")
+                    temp_path = temp_path_for(pdf_path)
 
                     # ブックを開く（読み取り専用・リンク更新や推奨読み取り専用を無視）
                     wb = excel_app.Workbooks.Open(
@@ -515,7 +635,7 @@ class PDFConverter:
                         # Type=0 (xlTypePDF)
                         wb.ExportAsFixedFormat(
                             0,
-                            pdf_path,
+                            temp_path,
                             Quality=0,  # xlQualityStandard
                             IncludeDocProperties=True,
                             IgnorePrintAreas=False,  # 既存の印刷範囲/ページ設定を尊重
@@ -524,23 +644,31 @@ class PDFConverter:
                     finally:
                         wb.Close(SaveChanges=False)
 
-                    if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 0:
+                    if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
+                        pdf_path = commit_file(temp_path, pdf_path, overwrite=False)
                         converted_files.append({
                             'excel_file': excel_file,
                             'pdf_file': pdf_path,
                             'pdf_name': os.path.basename(pdf_path),
-                            'message': 'Excelの全シートをPDFとして保存'
+                            'message': 'Excelの全シートをPDFとして保存',
+                            'engine': 'excel',
+                            'elapsed_seconds': round(time.monotonic() - started, 3)
                         })
+                        self._report_item(progress_callback, 'converted', converted_files[-1], index, total)
                     else:
+                        self._remove_partial_output(temp_path)
                         failed_files.append({
                             'file': excel_file,
                             'error': 'PDFファイルが作成されませんでした'
                         })
+                        self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
                 except Exception as e:
+                    self._remove_partial_output(temp_path)
                     failed_files.append({
                         'file': excel_file,
                         'error': f'Excel出力エラー: {str(e)}'
                     })
+                    self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
 
         except Exception as e:
             failed_files.append({
@@ -697,7 +825,9 @@ finally:
         except Exception as e:
             return False, str(e), None
 
-    def _excel_to_pdf_macos_excel(self, excel_files: List[str], output_folder: str, timeout_seconds: int = 90) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    def _excel_to_pdf_macos_excel(self, excel_files: Iterable[str], output_folder: str, timeout_seconds: int = 90,
+                                  progress_callback: Optional[ProgressCallback] = None,
+                                  cancel_token: Optional[CancellationToken] = None) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
         """macOSのMicrosoft ExcelをAppleScript経由で用いてPDF出力"""
         converted_files: List[Dict[str, str]] = []
         failed_files: List[Dict[str, str]] = []
@@ -740,32 +870,51 @@ end run
             return [], [{'file': '(batch)', 'error': f'AppleScript作成エラー: {str(e)}'}]
 
         try:
-            for excel_file in excel_files:
+            total = _file_count(excel_files)
+            for index, excel_file in enumerate(excel_files, 1):
+                if is_cancelled(cancel_token):
+                    break
+                started = time.monotonic()
+                temp_path = None
                 try:
                     base_name = os.path.splitext(os.path.basename(excel_file))[0]
                     pdf_path = os.path.join(output_folder, f"{base_name}.pdf")
-                    if os.path.exists(pdf_path):
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        pdf_path = os.path.join(output_folder, f"{base_name}_{timestamp}.pdf")
+                    temp_path = temp_path_for(pdf_path)
 
-                    proc = subprocess.run([
-                        'osascript', script_path, excel_file, pdf_path
-                    ], capture_output=True, text=True, timeout=timeout_seconds)
+                    returncode, _, stderr = self._run_cancellable(
+                        ['osascript', script_path, excel_file, temp_path],
+                        timeout_seconds,
+                        cancel_token,
+                    )
 
-                    if proc.returncode == 0 and os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 0:
+                    if returncode == 0 and os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
+                        pdf_path = commit_file(temp_path, pdf_path, overwrite=False)
                         converted_files.append({
                             'excel_file': excel_file,
                             'pdf_file': pdf_path,
                             'pdf_name': os.path.basename(pdf_path),
-                            'message': 'Excel (macOS) によるPDF保存'
+                            'message': 'Excel (macOS) によるPDF保存',
+                            'engine': 'excel_applescript',
+                            'elapsed_seconds': round(time.monotonic() - started, 3)
                         })
+                        self._report_item(progress_callback, 'converted', converted_files[-1], index, total)
                     else:
-                        err = proc.stderr.strip() or 'Excel (macOS) 変換エラー'
+                        self._remove_partial_output(temp_path)
+                        err = stderr.strip() or 'Excel (macOS) 変換エラー'
                         failed_files.append({'file': excel_file, 'error': err})
+                        self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
+                except OperationCancelled:
+                    # 変換途中で中断された場合は書きかけのPDFを残さない（未処理として扱う）
+                    self._remove_partial_output(temp_path)
+                    break
                 except subprocess.TimeoutExpired:
+                    self._remove_partial_output(temp_path)
                     failed_files.append({'file': excel_file, 'error': f'Excel (macOS) がタイムアウトしました（{timeout_seconds}秒）'})
+                    self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
                 except Exception as e:
+                    self._remove_partial_output(temp_path)
                     failed_files.append({'file': excel_file, 'error': str(e)})
+                    self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
         finally:
             try:
                 os.remove(script_path)
@@ -774,7 +923,9 @@ end run
 
         return converted_files, failed_files
 
-    def _excel_to_pdf_macos_xlwings(self, excel_files: List[str], output_folder: str) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
+    def _excel_to_pdf_macos_xlwings(self, excel_files: Iterable[str], output_folder: str,
+                                    progress_callback: Optional[ProgressCallback] = None,
+                                    cancel_token: Optional[CancellationToken] = None) -> Tuple[List[Dict[str, str]], List[Dict[str, str]]]:
         """macOSのMicrosoft Excelをxlwings経由で用いてPDF出力（印刷範囲尊重・全シート）"""
         converted_files: List[Dict[str, str]] = []
         failed_files: List[Dict[str, str]] = []
@@ -785,34 +936,45 @@ end run
             app = xw.App(visible=False, add_book=False)
             app.display_alerts = False
             app.screen_updating = False
-            for excel_file in excel_files:
+            total = _file_count(excel_files)
+            for index, excel_file in enumerate(excel_files, 1):
+                if is_cancelled(cancel_token):
+                    break
+                started = time.monotonic()
+                temp_path = None
                 try:
                     base_name = os.path.splitext(os.path.basename(excel_file))[0]
                     pdf_path = os.path.join(output_folder, f"{base_name}.pdf")
-                    if os.path.exists(pdf_path):
-                        timestamp = datetime.now().strftime('%Y%m%d_%H%M%S')
-                        pdf_path = os.path.join(output_folder, f"{base_name}_{timestamp}.pdf")
+                    temp_path = temp_path_for(pdf_path)
 
                     wb = app.books.open(excel_file, update_links=False, read_only=True)
                     try:
                         # すべてのシートを対象にPDF出力（xlwings標準API）
                         # macOSでは内部的にAppleScriptを利用
-                        wb.to_pdf(path=pdf_path)
+                        wb.to_pdf(path=temp_path)
                     finally:
                         # xlwingsのBook.closeは引数なしが正しい（macOSでSaveChangesキーワードは未対応）
                         wb.close()
 
-                    if os.path.exists(pdf_path) and os.path.getsize(pdf_path) > 0:
+                    if os.path.exists(temp_path) and os.path.getsize(temp_path) > 0:
+                        pdf_path = commit_file(temp_path, pdf_path, overwrite=False)
                         converted_files.append({
                             'excel_file': excel_file,
                             'pdf_file': pdf_path,
                             'pdf_name': os.path.basename(pdf_path),
-                            'message': 'Excel (xlwings) によるPDF保存'
+                            'message': 'Excel (xlwings) によるPDF保存',
+                            'engine': 'xlwings',
+                            'elapsed_seconds': round(time.monotonic() - started, 3)
                         })
+                        self._report_item(progress_callback, 'converted', converted_files[-1], index, total)
                     else:
+                        self._remove_partial_output(temp_path)
                         failed_files.append({'file': excel_file, 'error': 'PDFファイルが作成されませんでした'})
+                        self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
                 except Exception as e:
+                    self._remove_partial_output(temp_path)
                     failed_files.append({'file': excel_file, 'error': str(e)})
+                    self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
         except Exception as e:
             failed_files.append({'file': '(batch)', 'error': f'xlwingsでのExcel起動エラー: {str(e)}'})
         finally:
@@ -825,92 +987,18 @@ end run
                 pass
         return converted_files, failed_files
     
-    def _get_sheet_data(self, sheet: Any, max_rows: int = 100, max_cols: int = 20) -> List[List[str]]:
-        """
-        シートからデータを取得
-        
-        Args:
-            sheet: ワークシート
-            max_rows: 最大行数
-            max_cols: 最大列数
-            
-        Returns:
-            データリスト
-        """
-        try:
-            data: List[List[str]] = []
-
-            # 使用範囲を決定
-            try:
-                max_row_attr = getattr(sheet, 'max_row', 0) or 0
-                max_col_attr = getattr(sheet, 'max_column', 0) or 0
-                max_row = min(max_row_attr if isinstance(max_row_attr, int) else 0, max_rows)
-                max_col = min(max_col_attr if isinstance(max_col_attr, int) else 0, max_cols)
-            except Exception:
-                max_row = min(100, max_rows)
-                max_col = min(20, max_cols)
-
-            if max_row <= 0 or max_col <= 0:
-                return []
-
-            # 高速な一括取得（values_only=True）
-            iter_rows = getattr(sheet, 'iter_rows', None)
-            if callable(iter_rows):
-                for values in sheet.iter_rows(min_row=1, max_row=max_row, min_col=1, max_col=max_col, values_only=True):
-                    row_output: List[str] = []
-                    has_text = False
-                    for value in values:
-                        if value is None:
-                            s = ''
-                        elif isinstance(value, (int, float)):
-                            s = str(value)
-                        else:
-                            s = str(value)
-                            if len(s) > 100:
-                                s = s[:100] + "..."
-                        if isinstance(s, str) and s.strip():
-                            has_text = True
-                        row_output.append(s)
-                    if has_text:
-                        data.append(row_output)
-            else:
-                # フォールバック（古いAPIやWorksheet互換）
-                for row in range(1, max_row + 1):
-                    row_output = []
-                    has_text = False
-                    for col in range(1, max_col + 1):
-                        try:
-                            cell = sheet.cell(row=row, column=col) if hasattr(sheet, 'cell') else None
-                            value = getattr(cell, 'value', None)
-                            if value is None:
-                                s = ''
-                            elif isinstance(value, (int, float)):
-                                s = str(value)
-                            else:
-                                s = str(value)
-                                if len(s) > 100:
-                                    s = s[:100] + "..."
-                            if isinstance(s, str) and s.strip():
-                                has_text = True
-                            row_output.append(s)
-                        except Exception:
-                            row_output.append('')
-                    if has_text:
-                        data.append(row_output)
-
-            return data
-
-        except Exception as e:
-            print(f"シートデータ取得エラー: {str(e)}")
-            return []
-    
-    def convert_to_pdf(self, excel_files: List[str], output_folder: str) -> Dict[str, Any]:
+    def convert_to_pdf(self, excel_files: Iterable[str], output_folder: str,
+                       progress_callback: Optional[ProgressCallback] = None,
+                       cancel_token: Optional[CancellationToken] = None) -> Dict[str, Any]:
         """
         ExcelファイルをPDFに変換（クロスプラットフォーム対応）
         
         Args:
-            excel_files: 変換するExcelファイルのパスリスト
+            excel_files: 変換するExcelファイルのパスリスト。イテレータを渡すと、Excelを1回だけ起動したまま
+                         取り出せた順に変換する（パイプラインで保存済みのワークブックを逐次渡す場合）
             output_folder: 出力フォルダパス
+            progress_callback: 1ファイルごとの進捗通知コールバック（任意）
+            cancel_token: 中断トークン（任意）。中断時は未処理ファイルを skipped_files に返す
             
         Returns:
             結果辞書
@@ -931,6 +1019,12 @@ end run
             converted_files: List[Dict[str, str]] = []
             failed_files: List[Dict[str, str]] = []
             validation_errors: List[Dict[str, str]] = []
+            # 逐次渡される場合は取り出したファイルを記録する（中断時の skipped_files 用）
+            requested: List[str] = []
+            if not isinstance(excel_files, (list, tuple)):
+                excel_files = _tracked(excel_files, requested)
+            else:
+                requested = list(excel_files)
 
             # プラットフォーム別処理
             if self.platform == 'Windows':
@@ -941,53 +1035,50 @@ end run
                         'error': 'Excelがインストールされていません',
                         'error_type': 'excel_not_installed'
                     }
-                conv, fail = self._excel_to_pdf_win32(excel_files, output_folder)
+                conv, fail = self._excel_to_pdf_win32(excel_files, output_folder, progress_callback=progress_callback, cancel_token=cancel_token)
                 converted_files.extend(conv)
                 failed_files.extend(fail)
 
             elif self.platform == 'Darwin':
                 # macOS: まずExcel(デスクトップ版)経由（xlwings優先→AppleScript）を試み、失敗時はopenpyxl+reportlabでフォールバック
                 if self._is_macos_xlwings_available():
-                    conv, fail = self._excel_to_pdf_macos_xlwings(excel_files, output_folder)
+                    conv, fail = self._excel_to_pdf_macos_xlwings(excel_files, output_folder, progress_callback=progress_callback, cancel_token=cancel_token)
                     converted_files.extend(conv)
                     failed_files.extend(fail)
                 elif self._is_macos_excel_available():
-                    conv, fail = self._excel_to_pdf_macos_excel(excel_files, output_folder)
+                    conv, fail = self._excel_to_pdf_macos_excel(excel_files, output_folder, progress_callback=progress_callback, cancel_token=cancel_token)
                     converted_files.extend(conv)
                     failed_files.extend(fail)
                 else:
                     # Excelが無い場合は、reportlabがあればフォールバックを試す
                     if OPENPYXL_AVAILABLE and REPORTLAB_AVAILABLE:
-                        for excel_path in excel_files:
+                        total = _file_count(excel_files)
+                        for index, excel_path in enumerate(excel_files, 1):
+                            if is_cancelled(cancel_token):
+                                break
+                            started = time.monotonic()
                             base_name = os.path.splitext(os.path.basename(excel_path))[0]
                             pdf_path = os.path.join(output_folder, f"{base_name}.pdf")
                             ok, msg = self._excel_to_pdf_openpyxl(excel_path, pdf_path)
+                            message = 'openpyxl+reportlab によるPDF保存'
+                            if not ok and not is_cancelled(cancel_token):
+                                # 失敗したファイルは通知の前に1回だけ再試行する（1ファイルにつき結果の通知は1回。
+                                # 逐次渡される場合も後続のファイルを待たずに結果が決まる）
+                                ok, msg = self._excel_to_pdf_openpyxl(excel_path, pdf_path)
+                                message = 'openpyxl+reportlab フォールバックPDF保存'
                             if ok:
                                 converted_files.append({
                                     'excel_file': excel_path,
                                     'pdf_file': pdf_path,
                                     'pdf_name': os.path.basename(pdf_path),
-                                    'message': 'openpyxl+reportlab によるPDF保存'
+                                    'message': message,
+                                    'engine': 'reportlab',
+                                    'elapsed_seconds': round(time.monotonic() - started, 3)
                                 })
+                                self._report_item(progress_callback, 'converted', converted_files[-1], index, total)
                             else:
                                 failed_files.append({'file': excel_path, 'error': msg})
-                    # すべて失敗した場合のフォールバック
-                    if len(converted_files) == 0 and len(failed_files) > 0 and OPENPYXL_AVAILABLE and REPORTLAB_AVAILABLE:
-                        for excel_path in excel_files:
-                            base_name = os.path.splitext(os.path.basename(excel_path))[0]
-                            pdf_path = os.path.join(output_folder, f"{base_name}.pdf")
-                            ok, msg = self._excel_to_pdf_openpyxl(excel_path, pdf_path)
-                            if ok:
-                                converted_files.append({
-                                    'excel_file': excel_path,
-                                    'pdf_file': pdf_path,
-                                    'pdf_name': os.path.basename(pdf_path),
-                                    'message': 'openpyxl+reportlab フォールバックPDF保存'
-                                })
-                            else:
-                                # 既に失敗に入っている場合は重複させない
-                                if not any(f.get('file') == excel_path for f in failed_files):
-                                    failed_files.append({'file': excel_path, 'error': msg})
+                                self._report_item(progress_callback, 'failed', failed_files[-1], index, total)
             else:
                 # その他プラットフォームは非対応
                 return {
@@ -1012,6 +1103,17 @@ end run
                 result['success'] = False
                 result['error'] = 'すべてのファイルの変換に失敗しました'
 
+            # 中断された場合は未処理ファイルを明示（エンジンはループ脱出時に各finallyで終了済み）
+            if is_cancelled(cancel_token):
+                processed = {f.get('excel_file') for f in converted_files} | {f.get('file') for f in failed_files}
+                skipped_files = [f for f in requested if f not in processed]
+                if skipped_files:
+                    result['success'] = False
+                    result['cancelled'] = True
+                    result['cancel_reason'] = cancel_token.reason if cancel_token else ''
+                    result['skipped_files'] = skipped_files
+                    result['error'] = f"処理が中断されました（{result['cancel_reason']}）"
+
             return result
 
         except Exception as e:
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+割増時間の計算
+AttendanceTable の分単位配列と祝日カレンダーから、時間外・深夜・休日の労働時間を一括で算出する
+"""
+
+from dataclasses import dataclass, field
+from typing import Dict, Any, Optional, Tuple
+
+import numpy as np
+
+from attendance import (
+    AttendanceTable,
+    BreakRule,
+    DAY_TYPE_HOLIDAY,
+    MINUTES_PER_DAY,
+    MISSING_MINUTES,
+    STATUTORY_BREAK_TIERS,
+)
+from work_calendar import is_public_holiday, weekdays
+
+
+@dataclass(frozen=True)
+class WorkRules:
+    """勤務・割増の規則"""
+    break_rule: BreakRule = field(default_factory=BreakRule)
+    daily_limit_minutes: int = 8 * 60          # 法定労働時間（1日）
+    late_night_start: int = 22 * 60            # 深夜時間帯の開始（22:00）
+    late_night_end: int = 5 * 60               # 深夜時間帯の終了（翌5:00）
+    holiday_weekdays: Tuple[int, ...] = (6,)   # 休日とする曜日（月=0 … 日=6）
+    public_holidays: bool = True               # 祝日を休日として扱う
+
+
+DEFAULT_WORK_RULES = WorkRules()
+
+
+@dataclass(frozen=True)
+class PremiumTable:
+    """1行ごとの割増対象時間（分、int32）"""
+    worked_min: np.ndarray
+    overtime_min: np.ndarray     # 時間外（休日労働日を除き、1日の法定時間を超えた分）
+    late_night_min: np.ndarray   # 深夜（22:00〜翌5:00 に重なる分）
+    holiday_min: np.ndarray      # 休日労働（休日・祝日・休日出勤の勤務分）
+    is_holiday: np.ndarray       # bool（その日が休日扱いか）
+
+    def totals(self) -> Dict[str, Any]:
+        """月間合計（時間単位、小数2桁）"""
+        def _hours(values: np.ndarray) -> float:
+            return round(int(values.sum()) / 60.0, 2)
+
+        return {
+            'worked_hours': _hours(self.worked_min),
+            'overtime_hours': _hours(self.overtime_min),
+            'late_night_hours': _hours(self.late_night_min),
+            'holiday_hours': _hours(self.holiday_min),
+            'working_days': int((self.worked_min > 0).sum()),
+            'holiday_working_days': int((self.holiday_min > 0).sum())
+        }
+
+
+def _late_night_overlap(start: np.ndarray, end: np.ndarray, rules: WorkRules) -> np.ndarray:
+    """[start, end) と深夜時間帯（前日・当日・翌日分）の重なり（分）"""
+    total = np.zeros(len(start), dtype=np.int32)
+    window = (rules.late_night_end - rules.late_night_start) % MINUTES_PER_DAY
+    for day in (-1, 0, 1):
+        window_start = day * MINUTES_PER_DAY + rules.late_night_start
+        window_end = window_start + window
+        overlap = np.minimum(end, window_end) - np.maximum(start, window_start)
+        total += np.maximum(overlap, 0)
+    return total
+
+
+def compute_premiums(table: AttendanceTable, rules: Optional[WorkRules] = None) -> PremiumTable:
+    """
+    割増対象時間を算出
+
+    休憩は深夜時間帯以外で取得したものとして、深夜時間は拘束時間との重なりで計算する。
+    日付を解析できない行は休日判定の対象外（平日扱い）とする。
+    """
+    rules = rules or DEFAULT_WORK_RULES
+    worked = table.worked_min.astype(np.int32)
+    working = worked > 0
+
+    is_holiday = np.isin(weekdays(table.date), rules.holiday_weekdays)
+    if rules.public_holidays:
+        is_holiday |= is_public_holiday(table.date)
+    is_holiday |= table.day_type == DAY_TYPE_HOLIDAY
+
+    holiday_min = np.where(is_holiday & working, worked, 0).astype(np.int32)
+    overtime_min = np.where(~is_holiday & working,
+                            np.maximum(worked - rules.daily_limit_minutes, 0), 0).astype(np.int32)
+
+    parsed = (table.start_min != MISSING_MINUTES) & (table.end_min != MISSING_MINUTES) & table.has_times
+    start = table.start_min.astype(np.int32)
+    end = table.end_min.astype(np.int32)
+    late_night_min = np.where(parsed, _late_night_overlap(start, end, rules), 0).astype(np.int32)
+
+    return PremiumTable(
+        worked_min=worked,
+        overtime_min=overtime_min,
+        late_night_min=late_night_min,
+        holiday_min=holiday_min,
+        is_holiday=is_holiday
+    )
+
+
+def _parse_clock(value: Any, default: int) -> int:
+    """'22:00' 形式または分の整数を分に変換"""
+    if value is None or value == '':
+        return default
+    if isinstance(value, (int, float)):
+        return int(value)
+    hours, _, minutes = str(value).partition(':')
+    return int(hours) * 60 + int(minutes or 0)
+
+
+def work_rules_from_dict(data: Optional[Dict[str, Any]]) -> WorkRules:
+    """
+    JSON入力の work_rules から WorkRules を生成
+
+    例: {"break": "statutory", "daily_limit_hours": 8, "late_night": ["22:00", "5:00"],
+         "holiday_weekdays": [5, 6], "public_holidays": true}
+    "break" には分の整数（固定休憩）、"statutory"（労基法の段階休憩）、
+    または [[閾値分, 休憩分], ...] を指定できる。
+    """
+    if not data:
+        return DEFAULT_WORK_RULES
+
+    break_value = data.get('break')
+    if break_value == 'statutory':
+        break_rule = BreakRule(tiers=STATUTORY_BREAK_TIERS)
+    elif isinstance(break_value, list):
+        break_rule = BreakRule(tiers=tuple((int(t), int(m)) for t, m in break_value))
+    elif break_value is not None:
+        break_rule = BreakRule(fixed_minutes=int(break_value))
+    else:
+        break_rule = BreakRule()
+
+    late_night = data.get('late_night') or ()
+    return WorkRules(
+        break_rule=break_rule,
+        daily_limit_minutes=int(float(data.get('daily_limit_hours', 8)) * 60),
+        late_night_start=_parse_clock(late_night[0] if len(late_night) > 0 else None, 22 * 60),
+        late_night_end=_parse_clock(late_night[1] if len(late_night) > 1 else None, 5 * 60),
+        holiday_weekdays=tuple(int(d) for d in data.get('holiday_weekdays', (6,))),
+        public_holidays=bool(data.get('public_holidays', True))
+    )
@@ -0,0 +1,23 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+進捗通知
+処理の進捗（item / progress / stage イベント）を呼び出し側のコールバックへ渡す。
+ログ・監視・ZIPエクスポート等の軽いモジュールからも使えるよう、他のモジュールに依存しない。
+"""
+
+from typing import Dict, Any, Callable, Optional
+
+
+# 進捗通知コールバック（イベント名, ペイロード）
+ProgressCallback = Callable[[str, Dict[str, Any]], None]
+
+
+def notify_progress(progress_callback: Optional[ProgressCallback], event: str, payload: Dict[str, Any]) -> None:
+    """進捗コールバックへ通知（未指定時は何もしない。通知失敗で処理は止めない）"""
+    if progress_callback is None:
+        return
+    try:
+        progress_callback(event, payload)
+    except Exception as e:
+        print(f"進捗通知エラー: {str(e)}")
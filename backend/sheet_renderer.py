@@ -0,0 +1,631 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+シートのPDFレンダリング（Excel が無い環境用）
+印刷範囲・列幅・行高・セル結合・罫線・塗りつぶし・配置・表示形式をワークブックから読み取り、
+行をまとまり（チャンク）ごとの LongTable に分けて描画する。
+セル数に比例した時間で描画でき、行数・列数・文字数の上限は設けない。
+"""
+
+import re
+from dataclasses import dataclass
+from datetime import date, datetime, time, timedelta
+from typing import Dict, Any, List, Optional, Tuple
+
+# openpyxl・reportlab が無い環境でも import できるようにする（描画の可否は呼び出し側で判定）
+try:
+    from openpyxl.utils import range_boundaries
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+try:
+    from reportlab.lib import colors
+    from reportlab.lib.enums import TA_LEFT, TA_CENTER, TA_RIGHT
+    from reportlab.lib.pagesizes import A3, A4, A5, B4, B5, LETTER, LEGAL, landscape, portrait
+    from reportlab.lib.styles import ParagraphStyle
+    from reportlab.lib.units import inch
+    from reportlab.platypus import (
+        BaseDocTemplate,
+        Frame,
+        LongTable,
+        NextPageTemplate,
+        PageBreak,
+        PageTemplate,
+        Paragraph,
+    )
+    REPORTLAB_AVAILABLE = True
+except ImportError:
+    REPORTLAB_AVAILABLE = False
+
+
+# 1テーブルあたりの行数（大きな表を1つの Table にすると分割のたびに全行を再計算するため）
+DEFAULT_CHUNK_ROWS = 200
+
+# Excel の用紙サイズ番号 → reportlab の用紙サイズ
+PAPER_SIZES = {1: LETTER, 5: LEGAL, 8: A3, 9: A4, 11: A5, 12: B4, 13: B5} if REPORTLAB_AVAILABLE else {}
+
+# 罫線の種類 → (線幅pt, 破線パターン)
+BORDER_STYLES = {
+    'hair': (0.25, None),
+    'thin': (0.5, None),
+    'medium': (1.0, None),
+    'thick': (1.5, None),
+    'double': (1.5, None),
+    'dotted': (0.5, (1, 1)),
+    'dashed': (0.5, (3, 2)),
+    'dashDot': (0.5, (3, 1, 1, 1)),
+    'dashDotDot': (0.5, (3, 1, 1, 1, 1, 1)),
+    'mediumDashed': (1.0, (3, 2)),
+    'mediumDashDot': (1.0, (3, 1, 1, 1)),
+    'mediumDashDotDot': (1.0, (3, 1, 1, 1, 1, 1)),
+    'slantDashDot': (1.0, (3, 1, 1, 1)),
+}
+
+DEFAULT_FONT_SIZE = 11.0
+DEFAULT_COLUMN_WIDTH = 8.43   # 文字数
+DEFAULT_ROW_HEIGHT = 15.0     # pt
+WEEKDAY_NAMES_JP = '月火水木金土日'
+WEEKDAY_LONG_NAMES_JP = ('月曜日', '火曜日', '水曜日', '木曜日', '金曜日', '土曜日', '日曜日')
+
+_DATE_TOKEN = re.compile(r'yyyy|yy|mmmm|mmm|mm|m|dd|d|aaaa|aaa|hh|h|ss|s|am/pm', re.IGNORECASE)
+_BRACKETS = re.compile(r'\[[^\]]*\]')
+
+
+# ---------------------------------------------------------------------------
+# 表示形式
+
+def _split_sections(number_format: str) -> List[str]:
+    """表示形式を ; で区切る（引用符内は区切らない）"""
+    sections, current, quoted = [], '', False
+    for ch in number_format:
+        if ch == '"':
+            quoted = not quoted
+        if ch == ';' and not quoted:
+            sections.append(current)
+            current = ''
+        else:
+            current += ch
+    sections.append(current)
+    return sections
+
+
+def _strip_format(section: str) -> Tuple[str, str, str]:
+    """数値の表示形式を (接頭辞, 数値部, 接尾辞) に分解（色指定・位置調整は除去）"""
+    section = _BRACKETS.sub('', section)
+    section = re.sub(r'_.', '', section).replace('*', '')
+    prefix, body, suffix = '', '', ''
+    i = 0
+    while i < len(section):
+        ch = section[i]
+        if ch == '"':
+            end = section.find('"', i + 1)
+            end = len(section) if end < 0 else end
+            literal = section[i + 1:end]
+            if body:
+                suffix += literal
+            else:
+                prefix += literal
+            i = end + 1
+            continue
+        if ch == '\\' and i + 1 < len(section):
+            if body:
+                suffix += section[i + 1]
+            else:
+                prefix += section[i + 1]
+            i += 2
+            continue
+        if ch in '0#?,.%':
+            body += ch
+        elif body:
+            suffix += ch
+        else:
+            prefix += ch
+        i += 1
+    return prefix, body, suffix
+
+
+def _format_number(value: float, number_format: str) -> str:
+    sections = _split_sections(number_format)
+    section = sections[0]
+    if value < 0 and len(sections) > 1:
+        section = sections[1]
+        value = -value
+    elif value == 0 and len(sections) > 2:
+        section = sections[2]
+    prefix, body, suffix = _strip_format(section)
+    if not body:
+        return f"{prefix}{suffix}" if (prefix or suffix) else _format_general(value)
+    if '%' in body:
+        value *= 100
+    decimals = len(body.split('.', 1)[1].replace('%', '').replace(',', '')) if '.' in body else 0
+    grouping = ',' if ',' in body.split('.', 1)[0] else ''
+    return f"{prefix}{value:{grouping}.{decimals}f}{'%' if '%' in body else ''}{suffix}"
+
+
+def _format_general(value: float) -> str:
+    if float(value).is_integer():
+        return str(int(value))
+    return f"{value:.10g}"
+
+
+def _is_date_format(number_format: str) -> bool:
+    body = _BRACKETS.sub('', re.sub(r'"[^"]*"', '', number_format)).lower()
+    return any(token in body for token in ('y', 'd', 'h', 's', 'aaa')) or body.strip() in ('m', 'mm')
+
+
+def _format_datetime(value: datetime, number_format: str) -> str:
+    """日付・時刻を表示形式に従って文字列化（主要なトークンのみ対応）"""
+    section = _BRACKETS.sub('', _split_sections(number_format)[0])
+    tokens = list(_DATE_TOKEN.finditer(section))
+    output, last = [], 0
+    for index, match in enumerate(tokens):
+        output.append(section[last:match.start()].replace('"', '').replace('\\', ''))
+        token = match.group(0).lower()
+        prev_token = tokens[index - 1].group(0).lower() if index > 0 else ''
+        next_token = tokens[index + 1].group(0).lower() if index + 1 < len(tokens) else ''
+        is_minute = token in ('m', 'mm') and (prev_token.startswith('h') or next_token.startswith('s'))
+        if token == 'yyyy':
+            output.append(f"{value.year:04d}")
+        elif token == 'yy':
+            output.append(f"{value.year % 100:02d}")
+        elif is_minute:
+            output.append(f"{value.minute:02d}" if token == 'mm' else str(value.minute))
+        elif token == 'mmmm':
+            output.append(value.strftime('%B'))
+        elif token == 'mmm':
+            output.append(value.strftime('%b'))
+        elif token == 'mm':
+            output.append(f"{value.month:02d}")
+        elif token == 'm':
+            output.append(str(value.month))
+        elif token == 'dd':
+            output.append(f"{value.day:02d}")
+        elif token == 'd':
+            output.append(str(value.day))
+        elif token == 'aaaa':
+            output.append(WEEKDAY_LONG_NAMES_JP[value.weekday()])
+        elif token == 'aaa':
+            output.append(WEEKDAY_NAMES_JP[value.weekday()])
+        elif token == 'hh':
+            output.append(f"{value.hour:02d}")
+        elif token == 'h':
+            output.append(str(value.hour))
+        elif token == 'ss':
+            output.append(f"{value.second:02d}")
+        elif token == 's':
+            output.append(str(value.second))
+        elif token == 'am/pm':
+            output.append('AM' if value.hour < 12 else 'PM')
+        last = match.end()
+    output.append(section[last:].replace('"', '').replace('\\', ''))
+    return ''.join(output)
+
+
+def format_value(value: Any, number_format: str = 'General') -> str:
+    """セルの値を表示形式に従って文字列化"""
+    if value is None:
+        return ''
+    number_format = number_format or 'General'
+    general = number_format.lower() == 'general'
+    if isinstance(value, bool):
+        return 'TRUE' if value else 'FALSE'
+    if isinstance(value, datetime):
+        if general:
+            return value.strftime('%Y/%m/%d') if value.time() == time(0) else value.strftime('%Y/%m/%d %H:%M')
+        return _format_datetime(value, number_format)
+    if isinstance(value, date):
+        return _format_datetime(datetime(value.year, value.month, value.day), 'yyyy/m/d' if general else number_format)
+    if isinstance(value, time):
+        return _format_datetime(datetime.combine(date(1900, 1, 1), value), 'h:mm' if general else number_format)
+    if isinstance(value, timedelta):
+        minutes = int(round(value.total_seconds() / 60))
+        return f"{minutes // 60}:{minutes % 60:02d}"
+    if isinstance(value, (int, float)):
+        if general:
+            return _format_general(value)
+        if _is_date_format(number_format):
+            # シリアル値（1900年日付系）
+            base = datetime(1899, 12, 30)
+            return _format_datetime(base + timedelta(days=float(value)), number_format)
+        return _format_number(float(value), number_format)
+    return str(value)
+
+
+# ---------------------------------------------------------------------------
+# レイアウト
+
+@dataclass(frozen=True)
+class SheetArea:
+    """描画対象の範囲（印刷範囲、無ければ使用範囲）"""
+    min_col: int
+    min_row: int
+    max_col: int
+    max_row: int
+
+
+def sheet_area(sheet) -> Optional[SheetArea]:
+    """印刷範囲（複数ある場合は最初の範囲）または使用範囲"""
+    print_area = getattr(sheet, 'print_area', None)
+    if print_area:
+        first = print_area.split(',')[0].split('!')[-1].replace('$', '')
+        min_col, min_row, max_col, max_row = range_boundaries(first)
+        return SheetArea(min_col, min_row, max_col, max_row)
+    if not sheet.max_row or not sheet.max_column:
+        return None
+    return SheetArea(sheet.min_column or 1, sheet.min_row or 1, sheet.max_column, sheet.max_row)
+
+
+def _column_widths(sheet, columns: List[int]) -> List[float]:
+    """列幅（pt）。列幅の設定は min〜max の範囲単位で持たれている"""
+    default = sheet.sheet_format.defaultColWidth or (
+        (sheet.sheet_format.baseColWidth + 0.71) if sheet.sheet_format.baseColWidth else DEFAULT_COLUMN_WIDTH)
+    by_index: Dict[int, Any] = {}
+    for dimension in sheet.column_dimensions.values():
+        low = dimension.min or 0
+        high = dimension.max or low
+        for idx in range(max(low, columns[0] if columns else 0), min(high, columns[-1] if columns else 0) + 1):
+            by_index[idx] = dimension
+    widths = []
+    for idx in columns:
+        dimension = by_index.get(idx)
+        width = dimension.width if dimension is not None and dimension.width else default
+        # 文字数 → ピクセル（1文字7px + 余白5px）→ pt
+        widths.append((width * 7 + 5) * 0.75)
+    return widths
+
+
+def _hidden_columns(sheet) -> Dict[int, bool]:
+    hidden: Dict[int, bool] = {}
+    for dimension in sheet.column_dimensions.values():
+        if dimension.hidden:
+            for idx in range(dimension.min or 0, (dimension.max or dimension.min or 0) + 1):
+                hidden[idx] = True
+    return hidden
+
+
+def _row_heights(sheet, rows: List[int]) -> List[float]:
+    default = sheet.sheet_format.defaultRowHeight or DEFAULT_ROW_HEIGHT
+    dimensions = sheet.row_dimensions
+    return [(dimensions[r].height if r in dimensions and dimensions[r].height else default) for r in rows]
+
+
+def _page_size(sheet) -> Tuple[float, float]:
+    setup = sheet.page_setup
+    try:
+        size = PAPER_SIZES.get(int(setup.paperSize), A4) if setup.paperSize else A4
+    except (TypeError, ValueError):
+        size = A4
+    return landscape(size) if setup.orientation == 'landscape' else portrait(size)
+
+
+def _margins(sheet) -> Tuple[float, float, float, float]:
+    """(左, 右, 上, 下) の余白（pt）"""
+    m = sheet.page_margins
+    return (
+        (m.left if m.left is not None else 0.7) * inch,
+        (m.right if m.right is not None else 0.7) * inch,
+        (m.top if m.top is not None else 0.75) * inch,
+        (m.bottom if m.bottom is not None else 0.75) * inch,
+    )
+
+
+def _scale(sheet, content_width: float, content_height: float, frame_width: float, frame_height: float) -> float:
+    """拡大縮小率（ページ設定の倍率、または「次のページ数に合わせて印刷」）"""
+    setup = sheet.page_setup
+    properties = sheet.sheet_properties.pageSetUpPr
+    scale = (setup.scale or 100) / 100.0
+    if properties is not None and properties.fitToPage:
+        fit_width = setup.fitToWidth if setup.fitToWidth is not None else 1
+        fit_height = setup.fitToHeight if setup.fitToHeight is not None else 1
+        scale = 1.0
+        if fit_width:
+            scale = min(scale, frame_width * fit_width / content_width)
+        if fit_height:
+            scale = min(scale, frame_height * fit_height / content_height)
+    # 用紙からはみ出す幅は描画できないため、幅は常に用紙に収める
+    if content_width * scale > frame_width:
+        scale = frame_width / content_width
+    return scale
+
+
+def _title_rows(sheet, area: SheetArea) -> List[int]:
+    """印刷タイトル行（各ページに繰り返す行）"""
+    titles = getattr(sheet, 'print_title_rows', None)
+    if not titles:
+        return []
+    first, _, last = titles.replace('$', '').partition(':')
+    try:
+        return [r for r in range(int(first), int(last or first) + 1) if area.min_row <= r <= area.max_row]
+    except ValueError:
+        return []
+
+
+# ---------------------------------------------------------------------------
+# 書式
+
+@dataclass(frozen=True)
+class _CellFormat:
+    number_format: str
+    font_size: float
+    text_color: Optional[str]
+    background: Optional[str]
+    align: Optional[str]
+    valign: str
+    wrap: bool
+    borders: Tuple[Tuple[str, float, Optional[Tuple[float, ...]], str], ...]  # (辺, 線幅, 破線, 色)
+
+
+def _rgb(color: Any) -> Optional[str]:
+    rgb = getattr(color, 'rgb', None)
+    if isinstance(rgb, str) and len(rgb) == 8:
+        return '#' + rgb[2:]
+    return None
+
+
+def _cell_format(cell) -> _CellFormat:
+    font = cell.font
+    alignment = cell.alignment
+    fill = cell.fill
+    borders = []
+    for side_name, command in (('top', 'LINEABOVE'), ('bottom', 'LINEBELOW'), ('left', 'LINEBEFORE'), ('right', 'LINEAFTER')):
+        side = getattr(cell.border, side_name)
+        if side is not None and side.style:
+            width, dash = BORDER_STYLES.get(side.style, (0.5, None))
+            borders.append((command, width, dash, _rgb(side.color) or '#000000'))
+    text_color = _rgb(font.color) if font is not None and font.color is not None else None
+    horizontal = alignment.horizontal if alignment is not None else None
+    vertical = alignment.vertical if alignment is not None else None
+    return _CellFormat(
+        number_format=cell.number_format or 'General',
+        font_size=float(font.sz) if font is not None and font.sz else DEFAULT_FONT_SIZE,
+        text_color=None if text_color in (None, '#000000') else text_color,
+        background=_rgb(fill.fgColor) if fill is not None and fill.fill_type == 'solid' else None,
+        align={'center': 'CENTER', 'centerContinuous': 'CENTER', 'right': 'RIGHT', 'left': 'LEFT',
+               'distributed': 'CENTER', 'justify': 'LEFT'}.get(horizontal or '', None),
+        valign={'top': 'TOP', 'center': 'MIDDLE', 'distributed': 'MIDDLE', 'justify': 'MIDDLE'}.get(vertical or '', 'BOTTOM'),
+        wrap=bool(alignment is not None and alignment.wrap_text),
+        borders=tuple(borders)
+    )
+
+
+# ---------------------------------------------------------------------------
+# 描画
+
+@dataclass
+class RenderedSheet:
+    """1シート分の描画結果"""
+    flowables: List[Any]
+    page_size: Tuple[float, float]
+    margins: Tuple[float, float, float, float]
+    title: str = ''
+
+
+class SheetRenderer:
+    """
+    ワークシートを reportlab の LongTable 群に変換
+
+    values には数式の計算結果など、セルの値を上書きする {(行, 列): 値} を渡せる。
+    """
+
+    def __init__(self, font_name: str = 'Helvetica', chunk_rows: int = DEFAULT_CHUNK_ROWS):
+        self.font_name = font_name
+        self.chunk_rows = max(1, int(chunk_rows))
+        self._paragraph_styles: Dict[Tuple[float, str], 'ParagraphStyle'] = {}
+
+    def _paragraph_style(self, size: float, align: str) -> 'ParagraphStyle':
+        key = (size, align)
+        style = self._paragraph_styles.get(key)
+        if style is None:
+            style = ParagraphStyle(
+                f'cell_{len(self._paragraph_styles)}',
+                fontName=self.font_name,
+                fontSize=size,
+                leading=size * 1.15,
+                alignment={'CENTER': TA_CENTER, 'RIGHT': TA_RIGHT}.get(align, TA_LEFT)
+            )
+            self._paragraph_styles[key] = style
+        return style
+
+    def render(self, sheet, values: Optional[Dict[Tuple[int, int], Any]] = None) -> Optional[RenderedSheet]:
+        area = sheet_area(sheet)
+        if area is None:
+            return None
+        values = values or {}
+
+        hidden_cols = _hidden_columns(sheet)
+        columns = [c for c in range(area.min_col, area.max_col + 1) if not hidden_cols.get(c, False)]
+        row_dims = sheet.row_dimensions
+        rows = [r for r in range(area.min_row, area.max_row + 1) if not (r in row_dims and row_dims[r].hidden)]
+        if not columns or not rows:
+            return None
+        col_pos = {c: i for i, c in enumerate(columns)}
+        row_pos = {r: i for i, r in enumerate(rows)}
+
+        page_size = _page_size(sheet)
+        margins = _margins(sheet)
+        frame_width = page_size[0] - margins[0] - margins[1]
+        frame_height = page_size[1] - margins[2] - margins[3]
+        widths = _column_widths(sheet, columns)
+        heights = _row_heights(sheet, rows)
+        scale = _scale(sheet, sum(widths), sum(heights), frame_width, frame_height)
+        widths = [w * scale for w in widths]
+        heights = [h * scale for h in heights]
+
+        # セル内容と書式（書式はスタイルIDごとに1回だけ解析）
+        formats: Dict[int, _CellFormat] = {}
+        cells: List[List[Any]] = []
+        row_commands: List[List[Tuple]] = []
+        printable: List[bool] = []
+        for row_cells in sheet.iter_rows(min_row=area.min_row, max_row=area.max_row,
+                                         min_col=area.min_col, max_col=area.max_col):
+            r = row_cells[0].row
+            if r not in row_pos:
+                continue
+            line: List[Any] = []
+            commands: List[Tuple] = []
+            run_start, run_style = 0, None
+            has_content = False
+            for cell in row_cells:
+                if cell.column not in col_pos:
+                    continue
+                style_id = cell.style_id if cell.has_style else 0
+                fmt = formats.get(style_id)
+                if fmt is None:
+                    fmt = _cell_format(cell)
+                    formats[style_id] = fmt
+                value = values.get((r, cell.column), cell.value)
+                if isinstance(value, str) and value.startswith('='):
+                    # 計算されていない数式は表示しない
+                    value = None
+                text = format_value(value, fmt.number_format)
+                has_content = has_content or bool(text) or bool(fmt.borders) or fmt.background is not None
+                if text and fmt.wrap:
+                    line.append(Paragraph(_escape(text), self._paragraph_style(fmt.font_size * scale, fmt.align or 'LEFT')))
+                else:
+                    line.append(text)
+                position = len(line) - 1
+                # 同じ書式が続く範囲はまとめてコマンド化する
+                if style_id != run_style:
+                    if run_style is not None:
+                        commands.extend(self._style_commands(formats[run_style], run_start, position - 1, scale))
+                    run_start, run_style = position, style_id
+                if fmt.align is None and isinstance(value, (int, float)) and not isinstance(value, bool):
+                    commands.append(('ALIGN', position, position, 'RIGHT'))
+            if run_style is not None:
+                commands.extend(self._style_commands(formats[run_style], run_start, len(line) - 1, scale))
+            cells.append(line)
+            row_commands.append(commands)
+            printable.append(has_content)
+
+        # 末尾の空行（値・罫線・塗りつぶしなし）は Excel と同様に印刷しない
+        while len(cells) > 1 and not printable[-1]:
+            cells.pop()
+            row_commands.pop()
+            printable.pop()
+        rows = rows[:len(cells)]
+        heights = heights[:len(cells)]
+        row_pos = {r: i for i, r in enumerate(rows)}
+
+        # 結合セル（行位置・列位置に変換）
+        spans: List[Tuple[int, int, int, int]] = []
+        no_break_after = set()
+        for merged in sheet.merged_cells.ranges:
+            if merged.max_row < area.min_row or merged.min_row > area.max_row:
+                continue
+            if merged.max_col < area.min_col or merged.min_col > area.max_col:
+                continue
+            mc = [col_pos[c] for c in range(merged.min_col, merged.max_col + 1) if c in col_pos]
+            mr = [row_pos[r] for r in range(merged.min_row, merged.max_row + 1) if r in row_pos]
+            if not mc or not mr or (len(mc) == 1 and len(mr) == 1):
+                continue
+            spans.append((mc[0], mr[0], mc[-1], mr[-1]))
+            no_break_after.update(range(mr[0], mr[-1]))
+
+        title_positions = [row_pos[r] for r in _title_rows(sheet, area) if r in row_pos]
+        h_align = 'CENTER' if sheet.print_options.horizontalCentered else 'LEFT'
+
+        flowables: List[Any] = []
+        for start, end in self._chunks(len(rows), no_break_after):
+            # 2つ目以降のチャンクには印刷タイトル行を先頭に付ける
+            header = [p for p in title_positions if p < start]
+            if start == 0:
+                repeat_rows = sum(1 for i, p in enumerate(title_positions) if p == i and p < end)
+            else:
+                repeat_rows = len(header)
+            positions = header + list(range(start, end))
+            local = {p: i for i, p in enumerate(positions)}
+            style = [
+                ('FONTNAME', (0, 0), (-1, -1), self.font_name),
+                ('FONTSIZE', (0, 0), (-1, -1), DEFAULT_FONT_SIZE * scale),
+                ('LEFTPADDING', (0, 0), (-1, -1), 1.5 * scale),
+                ('RIGHTPADDING', (0, 0), (-1, -1), 1.5 * scale),
+                ('TOPPADDING', (0, 0), (-1, -1), 0),
+                ('BOTTOMPADDING', (0, 0), (-1, -1), 1 * scale),
+            ]
+            for p in positions:
+                y = local[p]
+                for command in row_commands[p]:
+                    name, x0, x1 = command[0], command[1], command[2]
+                    style.append((name, (x0, y), (x1, y)) + tuple(command[3:]))
+            for x0, y0, x1, y1 in spans:
+                if y0 in local and y1 in local:
+                    style.append(('SPAN', (x0, local[y0]), (x1, local[y1])))
+            table = LongTable(
+                [cells[p] for p in positions],
+                colWidths=widths,
+                rowHeights=[heights[p] for p in positions],
+                repeatRows=repeat_rows,
+                hAlign=h_align
+            )
+            table.setStyle(style)
+            flowables.append(table)
+
+        return RenderedSheet(flowables=flowables, page_size=page_size, margins=margins, title=sheet.title)
+
+    def _chunks(self, total: int, no_break_after: set) -> List[Tuple[int, int]]:
+        """行を chunk_rows 行ごとに区切る（結合セルの途中では区切らない）"""
+        chunks = []
+        start = 0
+        while start < total:
+            end = min(start + self.chunk_rows, total)
+            while end < total and (end - 1) in no_break_after:
+                end += 1
+            chunks.append((start, end))
+            start = end
+        return chunks
+
+    def _style_commands(self, fmt: _CellFormat, x0: int, x1: int, scale: float) -> List[Tuple]:
+        """書式1つ分のテーブルスタイルコマンド（行位置は後で付与）"""
+        commands: List[Tuple] = []
+        if x1 < x0:
+            return commands
+        if fmt.font_size != DEFAULT_FONT_SIZE:
+            commands.append(('FONTSIZE', x0, x1, fmt.font_size * scale))
+        if fmt.align:
+            commands.append(('ALIGN', x0, x1, fmt.align))
+        commands.append(('VALIGN', x0, x1, fmt.valign))
+        if fmt.text_color:
+            commands.append(('TEXTCOLOR', x0, x1, colors.HexColor(fmt.text_color)))
+        if fmt.background:
+            commands.append(('BACKGROUND', x0, x1, colors.HexColor(fmt.background)))
+        for name, width, dash, color in fmt.borders:
+            line = (name, x0, x1, width * max(scale, 0.5), colors.HexColor(color))
+            if dash:
+                line = line + (None, dash)
+            commands.append(line)
+        return commands
+
+
+def _escape(text: str) -> str:
+    return text.replace('&', '&amp;').replace('<', '&lt;').replace('>', '&gt;').replace('\n', '<br/>')
+
+
+def page_template_for(page_size: Tuple[float, float], margins: Tuple[float, float, float, float],
+                      template_id: str) -> 'PageTemplate':
+    """用紙サイズ・余白（左, 右, 上, 下）から余白なしフレームのページテンプレートを作成"""
+    left, right, top, bottom = margins
+    width, height = page_size
+    frame = Frame(left, bottom, width - left - right, height - top - bottom,
+                  leftPadding=0, rightPadding=0, topPadding=0, bottomPadding=0, id=f'{template_id}_frame')
+    return PageTemplate(id=template_id, frames=[frame], pagesize=page_size)
+
+
+def build_pdf(pdf_path, rendered: List[RenderedSheet], invariant: bool = False) -> None:
+    """
+    シートごとに用紙サイズ・余白の異なるページテンプレートでPDFを生成
+
+    pdf_path はファイルパスまたは書き込み可能なバイナリストリーム。
+    invariant=True の場合は作成日時・文書IDを固定する（同じ内容から同じバイト列）。
+    """
+    templates = []
+    story: List[Any] = []
+    for index, sheet in enumerate(rendered):
+        templates.append(page_template_for(sheet.page_size, sheet.margins, f'sheet{index}'))
+        if index > 0:
+            story.append(NextPageTemplate(f'sheet{index}'))
+            story.append(PageBreak())
+        story.extend(sheet.flowables)
+    doc = BaseDocTemplate(pdf_path, pagesize=rendered[0].page_size, pageTemplates=templates,
+                          invariant=1 if invariant else None)
+    doc.build(story)
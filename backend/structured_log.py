@@ -0,0 +1,226 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+構造化ログ（JSON Lines・バックグラウンド書き込み・サイズでのローテーション）
+1レコード1行のJSONで、リクエストID・処理種別・工程ごとの処理時間を記録する。
+
+  {"ts": "2025-07-31T18:02:11.532", "level": "info", "request_id": "3f9c…", "event": "stage", "stage": "csv_batch", "seconds": 4.217}
+
+- 呼び出し側はレコード（辞書）をキューへ入れるだけ。ファイルへの書き込み・JSONへの整形は
+  書き込みスレッドが行い、ファイルは開いたまま、キューが空になった時点でまとめて flush する
+- ファイルが上限サイズを超えたら backend.log → backend.log.1 → … とずらし、古いものは削除する
+- 書き込みスレッドはログファイルごとにプロセスで1つ（常駐・一括処理で複数のリクエストを扱っても共有）。
+  プロセス終了時に残りのレコードを書き出してから閉じる
+- ログの書き込みに失敗しても処理は止めない（標準エラーへ出力するのみ）
+"""
+
+import atexit
+import json
+import os
+import queue
+import sys
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Any, Iterator, Optional
+
+from progress import ProgressCallback
+
+
+LOG_FILENAME = 'backend.log'
+DEFAULT_MAX_BYTES = 5 * 1024 * 1024
+DEFAULT_BACKUP_COUNT = 3
+
+# item イベントのうちログに残す項目（結果辞書全体は大きいため）
+_ITEM_KEYS = ('status', 'index', 'total', 'file', 'csv_path', 'output_path', 'pdf_file', 'error',
+              'elapsed_seconds', 'update_mode', 'engine')
+
+# 書き込みスレッドの終了を示す番兵
+_STOP = object()
+
+
+class LogWriter:
+    """
+    ログファイルへの書き込みスレッド
+
+    Args:
+        path: ログファイルのパス
+        max_bytes: ローテーションするサイズ（0 以下でローテーションしない）
+        backup_count: 残す古いログの数
+    """
+
+    def __init__(self, path: str, max_bytes: int = DEFAULT_MAX_BYTES, backup_count: int = DEFAULT_BACKUP_COUNT):
+        self.path = os.path.abspath(path)
+        self.max_bytes = max_bytes
+        self.backup_count = max(0, backup_count)
+        self._queue: 'queue.SimpleQueue[Any]' = queue.SimpleQueue()
+        self._file = None
+        self._size = 0
+        self._thread = threading.Thread(target=self._run, name='kinten-log-writer', daemon=True)
+        self._thread.start()
+
+    def write(self, record: Dict[str, Any]) -> None:
+        """レコードを書き込み待ちに加える（呼び出し側の処理はこれだけ）"""
+        self._queue.put(record)
+
+    def close(self, timeout: float = 5.0) -> None:
+        """書き込み待ちのレコードを書き出してから閉じる"""
+        if self._thread.is_alive():
+            self._queue.put(_STOP)
+            self._thread.join(timeout)
+
+    def _run(self) -> None:
+        stop = False
+        while not stop:
+            item = self._queue.get()
+            # 溜まっている分をまとめて書き、最後に1回だけ flush する
+            while True:
+                if item is _STOP:
+                    stop = True
+                else:
+                    self._write_record(item)
+                try:
+                    item = self._queue.get_nowait()
+                except queue.Empty:
+                    break
+            self._flush()
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def _write_record(self, record: Dict[str, Any]) -> None:
+        try:
+            if isinstance(record.get('ts'), float):
+                record['ts'] = datetime.fromtimestamp(record['ts']).isoformat(timespec='milliseconds')
+            line = (json.dumps(record, ensure_ascii=False, default=str) + '\n').encode('utf-8')
+            if self._file is None:
+                self._open()
+            if self.max_bytes > 0 and self._size > 0 and self._size + len(line) > self.max_bytes:
+                self._rotate()
+            self._file.write(line)
+            self._size += len(line)
+        except Exception as e:
+            print(f"ログ書き込みエラー: {e}", file=sys.stderr)
+
+    def _open(self) -> None:
+        os.makedirs(os.path.dirname(self.path), exist_ok=True)
+        self._file = open(self.path, 'ab')
+        self._size = os.fstat(self._file.fileno()).st_size
+
+    def _rotate(self) -> None:
+        """backend.log → backend.log.1 → … とずらして新しいファイルを開く"""
+        self._file.close()
+        self._file = None
+        if self.backup_count == 0:
+            os.remove(self.path)
+        else:
+            for number in range(self.backup_count - 1, 0, -1):
+                source = f"{self.path}.{number}"
+                if os.path.exists(source):
+                    os.replace(source, f"{self.path}.{number + 1}")
+            os.replace(self.path, f"{self.path}.1")
+        self._open()
+
+    def _flush(self) -> None:
+        try:
+            if self._file is not None:
+                self._file.flush()
+        except Exception as e:
+            print(f"ログ書き込みエラー: {e}", file=sys.stderr)
+
+
+_writers: Dict[str, LogWriter] = {}
+_writers_lock = threading.Lock()
+
+
+def log_writer(log_dir: str, max_bytes: int = DEFAULT_MAX_BYTES,
+               backup_count: int = DEFAULT_BACKUP_COUNT) -> LogWriter:
+    """ログフォルダの書き込みスレッド（無ければ開始。同じフォルダには同じものを返す）"""
+    path = os.path.abspath(os.path.join(log_dir, LOG_FILENAME))
+    with _writers_lock:
+        writer = _writers.get(path)
+        if writer is None:
+            if not _writers:
+                atexit.register(close_all)
+            writer = LogWriter(path, max_bytes, backup_count)
+            _writers[path] = writer
+        return writer
+
+
+def close_all() -> None:
+    """すべての書き込みスレッドを閉じる（書き込み待ちのレコードは書き出す）"""
+    with _writers_lock:
+        writers = list(_writers.values())
+        _writers.clear()
+    for writer in writers:
+        writer.close()
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex[:12]
+
+
+class RequestLog:
+    """
+    1リクエスト分のログ（すべてのレコードに request_id と共通項目を付ける）
+
+    Args:
+        writer: 書き込みスレッド（None の場合は何も記録しない）
+        request_id: リクエストID（未指定時は生成）
+        **context: すべてのレコードに付ける項目（process_type 等）
+
+    使用例:
+        log = RequestLog(log_writer(log_dir), process_type='csv_batch')
+        with log.stage('csv_batch'):
+            result = ...
+        log.event('completed', success=result.get('success'))
+    """
+
+    def __init__(self, writer: Optional[LogWriter], request_id: Optional[str] = None, **context: Any):
+        self.writer = writer
+        self.request_id = request_id or new_request_id()
+        self.context = context
+        self._started = time.perf_counter()
+
+    def elapsed(self) -> float:
+        """リクエスト開始からの経過秒数"""
+        return round(time.perf_counter() - self._started, 3)
+
+    def event(self, event: str, level: str = 'info', **fields: Any) -> None:
+        """1レコードを記録（値が None の項目は省く）"""
+        if self.writer is None:
+            return
+        record: Dict[str, Any] = {'ts': time.time(), 'level': level, 'request_id': self.request_id, 'event': event}
+        record.update(self.context)
+        record.update((key, value) for key, value in fields.items() if value is not None)
+        self.writer.write(record)
+
+    def error(self, event: str, **fields: Any) -> None:
+        self.event(event, level='error', **fields)
+
+    @contextmanager
+    def stage(self, name: str, **fields: Any) -> Iterator[Dict[str, Any]]:
+        """
+        工程の処理時間を記録（with の中で返り値の辞書に加えた項目も記録する）
+
+        例外で抜けた場合も記録し、例外はそのまま送出する。
+        """
+        extra: Dict[str, Any] = {}
+        started = time.perf_counter()
+        try:
+            yield extra
+        finally:
+            values = dict(fields)
+            values.update(extra)
+            self.event('stage', stage=name, seconds=round(time.perf_counter() - started, 3), **values)
+
+    def progress_callback(self, callback: Optional[ProgressCallback] = None) -> ProgressCallback:
+        """進捗コールバックを包み、1件ごとの結果（item イベント）を記録する"""
+        def _callback(event: str, payload: Dict[str, Any]) -> None:
+            if event == 'item':
+                self.event('item', **{key: payload[key] for key in _ITEM_KEYS if key in payload})
+            if callback is not None:
+                callback(event, payload)
+        return _callback
@@ -0,0 +1,160 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+部署別の月次集計
+バッチ中に処理済みの勤怠データを集め、最後に1回の groupby で従業員別・部署別の合計を求めて
+出力フォルダへ集計ワークブック（とCSV）を書き出す
+"""
+
+import os
+import threading
+from typing import Dict, Any, List, Optional
+
+import numpy as np
+import openpyxl
+import pandas as pd
+from openpyxl.styles import Font
+
+from attendance import AttendanceTable
+from file_output import atomic_write
+from premiums import WorkRules, compute_premiums
+
+
+SUMMARY_SHEET_NAME = "集計"
+
+# 部署未指定の従業員の部署名
+UNASSIGNED_DEPARTMENT = "（未設定）"
+
+# 集計値の列（分単位で合計し、出力時に時間へ換算する）
+_MINUTE_COLUMNS = ('worked_min', 'overtime_min', 'late_night_min', 'holiday_min')
+
+# 出力列（内部名 → 見出し）
+SUMMARY_COLUMNS = (
+    ('department', '部署'),
+    ('employee_name', '氏名'),
+    ('year_month', '年月'),
+    ('working_days', '勤務日数'),
+    ('worked_hours', '勤務時間'),
+    ('overtime_hours', '時間外'),
+    ('late_night_hours', '深夜'),
+    ('holiday_hours', '休日労働'),
+    ('holiday_working_days', '休日出勤日数'),
+)
+
+
+def summary_filename_for(year_month: str, extension: str = '.xlsx') -> str:
+    """集計ファイル名（例：勤怠集計_202501.xlsx）"""
+    return f"勤怠集計_{year_month}{extension}"
+
+
+class SummaryCollector:
+    """
+    バッチ中のジョブから日別の分単位データを集める（複数スレッドから add してよい）
+
+    保持するのは1行あたり数個の整数のみで、DataFrame や出力ワークブックは保持・再読込しない。
+    """
+
+    def __init__(self):
+        self._frames: List[pd.DataFrame] = []
+        self._lock = threading.Lock()
+
+    def add(self, employee_name: str, department: str, year_month: str,
+            table: AttendanceTable, work_rules: Optional[WorkRules] = None) -> None:
+        """1ジョブ分の勤怠表を追加"""
+        premiums = compute_premiums(table, work_rules)
+        frame = pd.DataFrame({
+            'worked_min': premiums.worked_min,
+            'overtime_min': premiums.overtime_min,
+            'late_night_min': premiums.late_night_min,
+            'holiday_min': premiums.holiday_min,
+            'working_day': (premiums.worked_min > 0).astype(np.int16),
+            'holiday_working_day': (premiums.holiday_min > 0).astype(np.int16),
+        })
+        frame['department'] = department or UNASSIGNED_DEPARTMENT
+        frame['employee_name'] = employee_name
+        frame['year_month'] = year_month
+        with self._lock:
+            self._frames.append(frame)
+
+    def __len__(self) -> int:
+        return len(self._frames)
+
+    def build(self) -> pd.DataFrame:
+        """
+        従業員別の合計行と部署計の行を持つ集計表を作成
+
+        日別データ全体を1回の groupby で従業員×年月に集約し、
+        部署計はその集約結果（従業員数分の行）から求める。
+        """
+        with self._lock:
+            frames = list(self._frames)
+        if not frames:
+            return pd.DataFrame(columns=[key for key, _ in SUMMARY_COLUMNS])
+
+        daily = pd.concat(frames, ignore_index=True)
+        keys = ['year_month', 'department', 'employee_name']
+        employees = daily.groupby(keys, sort=True, observed=True).sum(numeric_only=True).reset_index()
+
+        departments = employees.groupby(['year_month', 'department'], sort=True).sum(numeric_only=True).reset_index()
+        departments['employee_name'] = '部署計'
+
+        combined = pd.concat([employees, departments], ignore_index=True)
+        # 部署ごとに従業員行 → 部署計の順に並べる
+        combined['_order'] = (combined['employee_name'] == '部署計').astype(int)
+        combined = combined.sort_values(['year_month', 'department', '_order', 'employee_name'], kind='stable')
+
+        result = pd.DataFrame({
+            'department': combined['department'],
+            'employee_name': combined['employee_name'],
+            'year_month': combined['year_month'],
+            'working_days': combined['working_day'].astype(int),
+            'holiday_working_days': combined['holiday_working_day'].astype(int),
+        })
+        for column in _MINUTE_COLUMNS:
+            result[column.replace('_min', '_hours')] = (combined[column] / 60.0).round(2)
+        return result[[key for key, _ in SUMMARY_COLUMNS]].reset_index(drop=True)
+
+
+def write_summary_files(summary: pd.DataFrame, output_folder_for_month, write_csv: bool = True) -> List[str]:
+    """
+    年月ごとに集計ワークブック（とCSV）を書き出す
+
+    Args:
+        summary: SummaryCollector.build() の結果
+        output_folder_for_month: 年月 → 出力先フォルダ を返す関数
+        write_csv: CSVも出力するかどうか
+
+    Returns:
+        書き出したファイルパスのリスト
+    """
+    written: List[str] = []
+    headers = [label for _, label in SUMMARY_COLUMNS]
+    for year_month, rows in summary.groupby('year_month', sort=True):
+        folder = output_folder_for_month(year_month)
+        os.makedirs(folder, exist_ok=True)
+        table = rows.rename(columns=dict(SUMMARY_COLUMNS))
+
+        workbook = openpyxl.Workbook()
+        sheet = workbook.active
+        sheet.title = SUMMARY_SHEET_NAME
+        sheet.append(headers)
+        for cell in sheet[1]:
+            cell.font = Font(bold=True)
+        for record in table.itertuples(index=False):
+            sheet.append(list(record))
+            if record[1] == '部署計':
+                for cell in sheet[sheet.max_row]:
+                    cell.font = Font(bold=True)
+        sheet.freeze_panes = 'A2'
+        xlsx_path = os.path.join(folder, summary_filename_for(year_month))
+        with atomic_write(xlsx_path) as f:
+            workbook.save(f)
+        written.append(xlsx_path)
+
+        if write_csv:
+            csv_path = os.path.join(folder, summary_filename_for(year_month, '.csv'))
+            # Excelで文字化けしないようBOM付きUTF-8で出力
+            with atomic_write(csv_path, 'w', encoding='utf-8-sig', newline='') as f:
+                table.to_csv(f, index=False)
+            written.append(csv_path)
+    return written
@@ -0,0 +1,164 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+テンプレートレジストリ（取引先ごとのテンプレート切り替え）
+フォルダ内のテンプレート（*.xlsx）をまとめて読み込み・検証し、ファイル名（拡張子なし）を
+テンプレートIDとして登録する。リクエストはIDでテンプレートを指定する。
+
+- 検証（シートの有無・従業員名と日ごとの列の転記先があるか・転記先セルが結合セルの途中でないか）と書き込み計画のコンパイルは
+  ファイルが変わらない限り1回だけ行う（書き込み計画はジョブと同じキャッシュを使う）
+- テンプレートの内容（bytes）は TemplateCache に読み込んでおき、ジョブ間で共有する
+- テンプレート・マッピング設定ファイルの更新日時とサイズを確認し、変わっていれば検証し直す
+"""
+
+import os
+import threading
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from openpyxl.cell.cell import MergedCell
+
+from cell_mapping import CellPlan, default_plan_cache, mapping_path_for
+from excel_processor import TemplateCache, default_template_cache, get_template_sheet
+
+
+def template_id_for(path: str) -> str:
+    """テンプレートID（ファイル名から拡張子を除いたもの）"""
+    return os.path.splitext(os.path.basename(path))[0]
+
+
+def _stamp(path: str) -> Optional[Tuple[int, int]]:
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+@dataclass(frozen=True)
+class TemplateEntry:
+    """登録済みテンプレート"""
+    template_id: str
+    path: str
+    stamp: Tuple[Optional[Tuple[int, int]], Optional[Tuple[int, int]]]  # (テンプレート, マッピング設定)
+    plan: Optional[CellPlan]
+    error: Optional[str] = None
+
+    @property
+    def valid(self) -> bool:
+        return self.error is None
+
+    def to_dict(self) -> Dict[str, Any]:
+        result: Dict[str, Any] = {'template_id': self.template_id, 'path': self.path, 'valid': self.valid}
+        if self.plan is not None:
+            result['sheet_name'] = self.plan.sheet_name
+        if self.error:
+            result['error'] = self.error
+        return result
+
+
+def _validate_template(path: str, plan: CellPlan, template_cache: TemplateCache) -> Optional[str]:
+    """テンプレートを読み込んで転記先を確認（問題があればエラーメッセージ）"""
+    # 従業員名と日ごとの列を1つも書かない計画は、出力が空のワークブックになるため登録しない
+    if not any(source == 'employee_name' for _, _, source in plan.header):
+        return "従業員名の転記先（header の employee_name）がありません"
+    if not plan.columns:
+        return "日ごとの転記列（rows.columns）がありません"
+    sheet = get_template_sheet(template_cache.load(path), plan.sheet_name)
+    targets = [(row, column) for row, column, _ in plan.header]
+    # 日ごとの行は1か月分（最大31行）を確認
+    targets += [(plan.start_row + day, column) for day in range(31) for column in plan.column_indexes]
+    for row, column in targets:
+        if isinstance(sheet.cell(row=row, column=column), MergedCell):
+            return f"転記先 {sheet.cell(row=row, column=column).coordinate} が結合セルの途中にあります"
+    return None
+
+
+class TemplateRegistry:
+    """
+    フォルダ内のテンプレートをIDで引けるようにする（複数スレッドから使用可能）
+
+    Args:
+        directory: テンプレートフォルダ
+        template_cache: テンプレートの内容のキャッシュ（ジョブと共有する）
+    """
+
+    def __init__(self, directory: str, template_cache: Optional[TemplateCache] = None):
+        self.directory = os.path.abspath(directory)
+        self.template_cache = template_cache or default_template_cache
+        self._entries: Dict[str, TemplateEntry] = {}
+        self._lock = threading.Lock()
+
+    def _load_entry(self, path: str) -> TemplateEntry:
+        stamp = (_stamp(path), _stamp(mapping_path_for(path)))
+        template_id = template_id_for(path)
+        plan: Optional[CellPlan] = None
+        try:
+            plan = default_plan_cache.get(path)
+            error = _validate_template(path, plan, self.template_cache)
+        except Exception as e:
+            error = str(e)
+        return TemplateEntry(template_id=template_id, path=path, stamp=stamp, plan=plan, error=error)
+
+    def _current(self, entry: TemplateEntry) -> TemplateEntry:
+        """ファイルが変わっていれば検証し直したエントリ"""
+        if entry.stamp == (_stamp(entry.path), _stamp(mapping_path_for(entry.path))):
+            return entry
+        refreshed = self._load_entry(entry.path)
+        with self._lock:
+            self._entries[entry.template_id] = refreshed
+        return refreshed
+
+    def refresh(self) -> List[TemplateEntry]:
+        """
+        フォルダを読み直して登録内容を更新（追加・変更・削除を反映）
+
+        Returns:
+            登録済みテンプレートの一覧（ID順）
+        """
+        try:
+            names = sorted(os.listdir(self.directory))
+        except OSError:
+            names = []
+        paths = {}
+        for name in names:
+            # Excelの一時ファイル（~$で始まる）は除外
+            if name.lower().endswith('.xlsx') and not name.startswith('~$'):
+                path = os.path.join(self.directory, name)
+                paths[template_id_for(path)] = path
+
+        with self._lock:
+            known = dict(self._entries)
+        entries: Dict[str, TemplateEntry] = {}
+        for template_id, path in paths.items():
+            entry = known.get(template_id)
+            entries[template_id] = self._load_entry(path) if entry is None or entry.path != path \
+                else self._current(entry)
+        with self._lock:
+            self._entries = entries
+        return [entries[template_id] for template_id in sorted(entries)]
+
+    def entries(self) -> List[TemplateEntry]:
+        with self._lock:
+            return [self._entries[template_id] for template_id in sorted(self._entries)]
+
+    def resolve(self, template_id: str) -> str:
+        """
+        テンプレートIDからテンプレートのパスを取得
+
+        Raises:
+            ValueError: 未登録のID、または検証に失敗したテンプレート
+        """
+        with self._lock:
+            entry = self._entries.get(template_id)
+        if entry is None:
+            # 起動後に追加されたテンプレートを拾う
+            self.refresh()
+            with self._lock:
+                entry = self._entries.get(template_id)
+            if entry is None:
+                raise ValueError(f"テンプレートが見つかりません: {template_id}")
+        entry = self._current(entry)
+        if not entry.valid:
+            raise ValueError(f"テンプレート「{template_id}」が使用できません: {entry.error}")
+        return entry.path
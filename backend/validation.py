@@ -0,0 +1,185 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+勤怠CSVのデータ品質チェック
+全行を列単位の配列演算で一括検証し、行ごとの指摘をまとめたレポートを返す
+"""
+
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+from attendance import AttendanceTable, MISSING_MINUTES, has_value
+from work_calendar import is_public_holiday, weekdays
+
+
+SEVERITY_ERROR = 'error'
+SEVERITY_WARNING = 'warning'
+
+# 勤怠メモの最大文字数（備考欄に収まる目安）
+MEMO_MAX_LENGTH = 100
+
+
+@dataclass(frozen=True)
+class ValidationIssue:
+    """検証で見つかった1件の指摘"""
+    row: Optional[int]  # DataFrameの行位置（月単位の指摘は None）
+    column: str
+    code: str
+    severity: str
+    message: str
+    value: str = ''
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'row': self.row,
+            'column': self.column,
+            'code': self.code,
+            'severity': self.severity,
+            'message': self.message,
+            'value': self.value
+        }
+
+
+@dataclass(frozen=True)
+class ValidationReport:
+    """検証結果（error は処理を止める指摘、warning は処理を続ける指摘）"""
+    row_count: int
+    issues: Tuple[ValidationIssue, ...] = ()
+
+    @property
+    def errors(self) -> List[ValidationIssue]:
+        return [issue for issue in self.issues if issue.severity == SEVERITY_ERROR]
+
+    @property
+    def warnings(self) -> List[ValidationIssue]:
+        return [issue for issue in self.issues if issue.severity == SEVERITY_WARNING]
+
+    @property
+    def has_errors(self) -> bool:
+        return any(issue.severity == SEVERITY_ERROR for issue in self.issues)
+
+    def error_message(self, limit: int = 3) -> str:
+        """エラーの要約（先頭 limit 件）"""
+        errors = self.errors
+        parts = [
+            f"{issue.row + 1 if issue.row is not None else '-'}行目 {issue.column}: {issue.message}"
+            for issue in errors[:limit]
+        ]
+        if len(errors) > limit:
+            parts.append(f"ほか{len(errors) - limit}件")
+        return "CSVデータ検証エラー: " + " / ".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            'row_count': self.row_count,
+            'error_count': len(self.errors),
+            'warning_count': len(self.warnings),
+            'issues': [issue.to_dict() for issue in self.issues]
+        }
+
+
+def _collect(mask: np.ndarray, values: pd.Series, column: str, code: str,
+             severity: str, message: str) -> List[ValidationIssue]:
+    """マスクに該当する行だけ指摘を生成"""
+    positions = np.flatnonzero(mask)
+    if len(positions) == 0:
+        return []
+    texts = values.iloc[positions].astype('string').fillna('').tolist()
+    return [
+        ValidationIssue(row=int(pos), column=column, code=code, severity=severity, message=message, value=text)
+        for pos, text in zip(positions, texts)
+    ]
+
+
+def _column(df: pd.DataFrame, name: str) -> pd.Series:
+    if name in df.columns:
+        return df[name]
+    return pd.Series([None] * len(df), index=df.index, dtype='object')
+
+
+def _month_of(year_month: str) -> Optional[np.datetime64]:
+    """YYYYMM を datetime64[M] に変換（不正な値は None）"""
+    try:
+        return np.datetime64(f"{year_month[:4]}-{year_month[4:6]}", 'M')
+    except ValueError:
+        return None
+
+
+def _missing_weekdays(dates: np.ndarray, year_month: str) -> List[ValidationIssue]:
+    """対象月の平日（土日・祝日を除く）のうち行が無い日"""
+    first = _month_of(year_month)
+    if first is None:
+        return []
+    month_days = np.arange(first.astype('datetime64[D]'), (first + 1).astype('datetime64[D]'))
+    business = month_days[(weekdays(month_days) < 5) & ~is_public_holiday(month_days)]
+    missing = business[~np.isin(business, dates[~np.isnat(dates)])]
+    return [
+        ValidationIssue(row=None, column='日付', code='missing_weekday', severity=SEVERITY_WARNING,
+                        message='平日の行がありません', value=str(day))
+        for day in missing
+    ]
+
+
+def validate_attendance(df: pd.DataFrame,
+                        table: AttendanceTable,
+                        year_month: str,
+                        memo_max_length: int = MEMO_MAX_LENGTH) -> ValidationReport:
+    """
+    勤怠データを一括検証
+
+    error: 時刻を解析できない / 日付の重複
+    warning: 日付を解析できない / 対象月以外の日付 / 始業・終業の片方のみ /
+             終業が始業より前（日をまたぐ勤務として計算） / 勤怠メモが長すぎる / 平日の行が無い
+
+    Args:
+        df: 標準列名のDataFrame
+        table: df から構築した AttendanceTable
+        year_month: 対象年月（YYYYMM）
+        memo_max_length: 勤怠メモの最大文字数
+    """
+    issues: List[ValidationIssue] = []
+    date_values = _column(df, '日付')
+    start_values = _column(df, '始業時刻1')
+    end_values = _column(df, '終業時刻1')
+
+    # 日付
+    dates = table.date
+    valid_dates = ~np.isnat(dates)
+    issues += _collect(has_value(date_values) & ~valid_dates, date_values,
+                       '日付', 'invalid_date', SEVERITY_WARNING, '日付を解析できません')
+    duplicated = valid_dates & pd.Series(dates).duplicated(keep=False).to_numpy()
+    issues += _collect(duplicated, date_values, '日付', 'duplicate_date', SEVERITY_ERROR, '日付が重複しています')
+    target_month = _month_of(year_month)
+    if target_month is not None:
+        outside = valid_dates & (dates.astype('datetime64[M]') != target_month)
+        issues += _collect(outside, date_values, '日付', 'outside_month', SEVERITY_WARNING, '対象月以外の日付です')
+
+    # 時刻
+    has_start = table.has_start
+    has_end = table.has_end
+    issues += _collect(has_start & (table.start_min == MISSING_MINUTES), start_values,
+                       '始業時刻1', 'invalid_time', SEVERITY_ERROR, '時刻を解析できません')
+    issues += _collect(has_end & (table.end_min == MISSING_MINUTES), end_values,
+                       '終業時刻1', 'invalid_time', SEVERITY_ERROR, '時刻を解析できません')
+    issues += _collect(~has_start & has_end, start_values,
+                       '始業時刻1', 'missing_time', SEVERITY_WARNING, '終業時刻のみ入力されています')
+    issues += _collect(has_start & ~has_end, end_values,
+                       '終業時刻1', 'missing_time', SEVERITY_WARNING, '始業時刻のみ入力されています')
+    issues += _collect(table.overnight, end_values,
+                       '終業時刻1', 'end_before_start', SEVERITY_WARNING, '終業が始業より前です（日をまたぐ勤務として計算）')
+
+    # 勤怠メモ
+    if '勤怠メモ' in df.columns:
+        memo = df['勤怠メモ'].astype('string')
+        too_long = (memo.str.len() > memo_max_length).fillna(False).to_numpy(dtype=bool)
+        issues += _collect(too_long, df['勤怠メモ'], '勤怠メモ', 'memo_too_long', SEVERITY_WARNING,
+                           f'勤怠メモが{memo_max_length}文字を超えています')
+
+    # 平日の欠落（月単位）
+    issues += _missing_weekdays(dates, year_month)
+
+    issues.sort(key=lambda issue: (issue.row is None, issue.row if issue.row is not None else 0))
+    return ValidationReport(row_count=len(df), issues=tuple(issues))
@@ -0,0 +1,343 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+受信フォルダの監視（freee勤怠CSVの自動取り込み）
+受信フォルダに置かれたCSVを検出し、書き込みが落ち着いたものから順に
+CSV読み込み → Excel転記 → 保存（任意でPDF変換）を行う。
+
+- 検出は更新日時とサイズのポーリング（os.scandir で1回の走査）。watchdog が使える環境では
+  ファイル変更の通知で走査を前倒しする（通知は走査のきっかけにのみ使い、判定は常に走査で行う）
+- 書き込み途中のファイルを拾わないよう、更新日時・サイズが一定時間変わらなくなるまで待つ
+- 処理済みのファイルは出力フォルダの状態ファイルに記録し、新規・内容が変わったCSVだけを処理する
+- 同時に処理する件数は max_workers までに制限する
+"""
+
+import hashlib
+import json
+import os
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Dict, Any, List, Optional, Tuple
+
+from cancellation import CancellationToken
+from csv_processor import employee_name_from_filename
+from file_output import atomic_write
+from progress import ProgressCallback, notify_progress
+
+# ファイル変更の通知（任意）
+try:
+    from watchdog.events import FileSystemEventHandler  # type: ignore
+    from watchdog.observers import Observer  # type: ignore
+    WATCHDOG_AVAILABLE = True
+except ImportError:
+    WATCHDOG_AVAILABLE = False
+
+    class FileSystemEventHandler:  # type: ignore[no-redef]
+        pass
+
+
+# 処理済みファイルの記録（出力フォルダに置く）
+STATE_FILENAME = '.kinten_watch.json'
+STATE_VERSION = 1
+
+Stamp = Tuple[int, int]  # (更新日時[ns], サイズ)
+
+
+def _file_digest(path: str) -> str:
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+@dataclass(frozen=True)
+class ProcessedFile:
+    """処理済みファイルの記録"""
+    stamp: Stamp
+    digest: str
+    output_path: str = ''
+
+
+class WatchState:
+    """処理済みファイルの記録（状態ファイルに保存。パスは受信フォルダからの相対パス）"""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._files: Dict[str, ProcessedFile] = {}
+
+    def load(self) -> None:
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(data, dict) or data.get('version') != STATE_VERSION:
+            return
+        for name, entry in (data.get('files') or {}).items():
+            try:
+                self._files[name] = ProcessedFile(
+                    stamp=(int(entry['stamp'][0]), int(entry['stamp'][1])),
+                    digest=str(entry['digest']),
+                    output_path=str(entry.get('output_path', ''))
+                )
+            except (KeyError, TypeError, ValueError, IndexError):
+                continue
+
+    def save(self) -> None:
+        data = {
+            'version': STATE_VERSION,
+            'files': {
+                name: {'stamp': list(entry.stamp), 'digest': entry.digest, 'output_path': entry.output_path}
+                for name, entry in sorted(self._files.items())
+            }
+        }
+        try:
+            with atomic_write(self.path, 'w', encoding='utf-8') as f:
+                json.dump(data, f, ensure_ascii=False)
+        except OSError as e:
+            print(f"監視状態ファイル書き込みエラー: {e}")
+
+    def get(self, name: str) -> Optional[ProcessedFile]:
+        return self._files.get(name)
+
+    def record(self, name: str, entry: ProcessedFile) -> None:
+        self._files[name] = entry
+
+
+class _WakeHandler(FileSystemEventHandler):
+    """ファイル変更の通知で監視ループを起こす"""
+
+    def __init__(self, wake: threading.Event):
+        super().__init__()
+        self.wake = wake
+
+    def on_any_event(self, event) -> None:
+        self.wake.set()
+
+
+class FolderWatcher:
+    """
+    受信フォルダを監視してCSVを自動処理する
+
+    Args:
+        processor: KintenProcessor
+        inbox_dir: 受信フォルダ（直下の *.csv が対象）
+        template_path: テンプレートExcelパス
+        base_output_dir: 基本出力ディレクトリパス（状態ファイルもここに置く）
+        pdf_output_folder: 指定時は保存したワークブックを続けてPDF変換する
+        max_workers: 同時に処理する件数
+        settle_seconds: 更新日時・サイズがこの秒数変わらなければ書き込み完了とみなす
+        poll_interval: 走査の間隔（秒）
+        work_rules: 休憩・時間外・深夜・休日の規則（任意）
+        incremental: True の場合、既存の出力ワークブックの変わった日の行だけを書き直す
+    """
+
+    def __init__(self, processor, inbox_dir: str, template_path: str, base_output_dir: str,
+                 pdf_output_folder: Optional[str] = None,
+                 max_workers: int = 1,
+                 settle_seconds: float = 2.0,
+                 poll_interval: float = 2.0,
+                 work_rules=None,
+                 incremental: bool = False):
+        self.processor = processor
+        self.inbox_dir = os.path.abspath(inbox_dir)
+        self.template_path = template_path
+        self.base_output_dir = base_output_dir
+        self.pdf_output_folder = pdf_output_folder
+        self.max_workers = max(1, int(max_workers))
+        self.settle_seconds = max(0.0, float(settle_seconds))
+        self.poll_interval = max(0.1, float(poll_interval))
+        self.work_rules = work_rules
+        self.incremental = incremental
+        self.state = WatchState(os.path.join(base_output_dir, STATE_FILENAME))
+        # 書き込み完了待ちのファイル: 名前 → (最後に見た stamp, その stamp を最初に見た時刻)
+        self._pending: Dict[str, Tuple[Stamp, float]] = {}
+        self._wake = threading.Event()
+        self._given_up: set = set()  # once 実行時に読み込めなかったファイル（再試行しない）
+
+    def scan(self) -> List[Tuple[str, Stamp]]:
+        """
+        受信フォルダを走査し、書き込みが落ち着いた未処理・変更済みのCSVを返す
+
+        Returns:
+            (ファイル名, stamp) のリスト（ファイル名順）
+        """
+        now = time.monotonic()
+        wall_now = time.time()
+        seen: Dict[str, Stamp] = {}
+        try:
+            with os.scandir(self.inbox_dir) as it:
+                for entry in it:
+                    if not entry.name.lower().endswith('.csv') or entry.name.startswith(('~$', '.')):
+                        continue
+                    try:
+                        if not entry.is_file():
+                            continue
+                        st = entry.stat()
+                    except OSError:
+                        continue
+                    seen[entry.name] = (st.st_mtime_ns, st.st_size)
+        except OSError as e:
+            print(f"受信フォルダ走査エラー: {e}")
+            return []
+
+        ready: List[Tuple[str, Stamp]] = []
+        for name in sorted(seen):
+            stamp = seen[name]
+            processed = self.state.get(name)
+            if stamp[1] == 0 or name in self._given_up or (processed is not None and processed.stamp == stamp):
+                # 空のファイル（作成直後）は書き込みを待つ
+                self._pending.pop(name, None)
+                continue
+            previous = self._pending.get(name)
+            if previous is None or previous[0] != stamp:
+                self._pending[name] = (stamp, now)
+                previous = self._pending[name]
+            # 同じ stamp のまま settle_seconds 経過、または更新日時が十分古い（起動前から置かれている）
+            age = wall_now - stamp[0] / 1e9
+            if now - previous[1] >= self.settle_seconds or age >= self.settle_seconds:
+                ready.append((name, stamp))
+        # 消えたファイルは待ち状態から外す
+        for name in list(self._pending):
+            if name not in seen:
+                del self._pending[name]
+        return ready
+
+    def _process(self, name: str, stamp: Stamp) -> Dict[str, Any]:
+        """1ファイルを処理（内容が前回処理時と同じなら記録だけ更新して処理しない）"""
+        path = os.path.join(self.inbox_dir, name)
+        try:
+            digest = _file_digest(path)
+        except OSError as e:
+            # 他のプロセスが書き込み中（ロック中）など。次の走査で再試行する
+            return {'success': False, 'retry': True, 'file': path, 'error': f"ファイルを読み込めません: {e}"}
+        processed = self.state.get(name)
+        if processed is not None and processed.digest == digest:
+            return {'success': True, 'unchanged': True, 'file': path, 'digest': digest,
+                    'output_path': processed.output_path}
+
+        result = self.processor.process_files(
+            csv_path=path,
+            template_path=self.template_path,
+            base_output_dir=self.base_output_dir,
+            employee_name=employee_name_from_filename(name),
+            work_rules=self.work_rules,
+            incremental=self.incremental
+        )
+        result['file'] = path
+        result['digest'] = digest
+        if result.get('success') and self.pdf_output_folder:
+            pdf_result = self.processor.convert_excel_to_pdf([result['output_path']], self.pdf_output_folder)
+            result['pdf'] = {k: v for k, v in pdf_result.items() if k != 'details'}
+        return result
+
+    def _start_observer(self):
+        """ファイル変更の通知を開始（watchdog が無い・開始できない場合は None）"""
+        if not WATCHDOG_AVAILABLE:
+            return None
+        try:
+            observer = Observer()
+            observer.schedule(_WakeHandler(self._wake), self.inbox_dir, recursive=False)
+            observer.start()
+            return observer
+        except Exception as e:
+            print(f"ファイル変更の通知を開始できません（ポーリングのみで監視します）: {e}")
+            return None
+
+    def run(self, cancel_token: Optional[CancellationToken] = None,
+            progress_callback: Optional[ProgressCallback] = None,
+            once: bool = False) -> Dict[str, Any]:
+        """
+        監視を実行（中断トークンで停止。once=True の場合は処理できるものを処理したら終了）
+
+        Returns:
+            結果辞書（processed_files, failed_files, unchanged_files）
+        """
+        if not os.path.isdir(self.inbox_dir):
+            return {'success': False, 'error': f"受信フォルダが見つかりません: {self.inbox_dir}"}
+        os.makedirs(self.base_output_dir, exist_ok=True)
+        self.state.load()
+
+        processed_files: List[Dict[str, Any]] = []
+        failed_files: List[Dict[str, Any]] = []
+        unchanged_files: List[str] = []
+        in_flight: Dict[str, Tuple[Future, Stamp]] = {}
+        observer = self._start_observer()
+        notify_progress(progress_callback, 'watch', {
+            'status': 'started', 'inbox_dir': self.inbox_dir, 'notify': observer is not None
+        })
+
+        def _collect(name: str, stamp: Stamp, result: Dict[str, Any]) -> None:
+            if result.get('retry'):
+                if not once:
+                    return  # 次の走査で再試行する
+                self._given_up.add(name)
+            if result.get('unchanged'):
+                unchanged_files.append(result['file'])
+                self.state.record(name, ProcessedFile(stamp, result['digest'], result.get('output_path', '')))
+                notify_progress(progress_callback, 'item', {'file': result['file'], 'status': 'unchanged'})
+            elif result.get('success'):
+                processed_files.append(result)
+                self.state.record(name, ProcessedFile(stamp, result['digest'], result['output_path']))
+                notify_progress(progress_callback, 'item', dict(result, status='processed'))
+            else:
+                # 失敗したファイルも記録し、内容が変わるまで再処理しない
+                failed = {'file': result['file'], 'error': result.get('error', '')}
+                if 'validation' in result:
+                    failed['validation'] = result['validation']
+                failed_files.append(failed)
+                if 'digest' in result:
+                    self.state.record(name, ProcessedFile(stamp, result['digest']))
+                notify_progress(progress_callback, 'item', dict(failed, status='failed'))
+            self.state.save()
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                while True:
+                    for name, (future, stamp) in list(in_flight.items()):
+                        if future.done():
+                            del in_flight[name]
+                            _collect(name, stamp, future.result())
+                    if cancel_token is not None and cancel_token.is_cancelled():
+                        break
+
+                    ready = [(name, stamp) for name, stamp in self.scan() if name not in in_flight]
+                    for name, stamp in ready[:self.max_workers - len(in_flight)]:
+                        in_flight[name] = (executor.submit(self._process, name, stamp), stamp)
+
+                    if once and not in_flight and not self._pending_unready(ready):
+                        break
+                    # 処理中のものがあれば短い間隔で完了を確認する
+                    timeout = min(self.poll_interval, 0.2) if in_flight else self.poll_interval
+                    if self._wake.wait(timeout):
+                        self._wake.clear()
+                        # 通知直後は書き込み中のことが多いため、落ち着くまで待つ
+                        time.sleep(min(self.settle_seconds, self.poll_interval))
+                # 処理中のものは完了を待って記録する（中断時も書きかけのファイルは残さない）
+                for name, (future, stamp) in in_flight.items():
+                    _collect(name, stamp, future.result())
+        finally:
+            if observer is not None:
+                observer.stop()
+                observer.join()
+
+        result: Dict[str, Any] = {
+            'success': not failed_files or bool(processed_files),
+            'processed_files': processed_files,
+            'failed_files': failed_files,
+            'unchanged_files': unchanged_files,
+            'total_processed': len(processed_files),
+            'total_failed': len(failed_files)
+        }
+        if cancel_token is not None and cancel_token.is_cancelled():
+            result['stop_reason'] = cancel_token.reason
+        notify_progress(progress_callback, 'watch', {'status': 'stopped'})
+        return result
+
+    def _pending_unready(self, ready: List[Tuple[str, Stamp]]) -> bool:
+        """書き込み完了待ちのファイルが残っているか（once 実行時に待つかの判定）"""
+        ready_names = {name for name, _ in ready}
+        return any(name not in ready_names for name in self._pending)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+日本の祝日カレンダー
+祝日を年単位で計算して日付配列にまとめておき、日付列の判定は配列演算で行う
+（2000年以降の祝日法。2003年の海の日・敬老の日の月曜日への移動と、2019〜2021年の特例日を含む）
+"""
+
+from datetime import date, timedelta
+from functools import lru_cache
+from typing import Dict, Tuple
+
+import numpy as np
+
+
+# 事前計算する年の範囲（範囲外の年は必要になった時点で個別に計算する）
+CALENDAR_FIRST_YEAR = 2000
+CALENDAR_LAST_YEAR = 2099
+
+# 年ごとの特例（東京五輪・即位関連）
+_SPECIAL_HOLIDAYS: Dict[int, Dict[Tuple[int, int], str]] = {
+    2019: {(5, 1): '休日（即位の日）', (10, 22): '休日（即位礼正殿の儀の行われる日）'},
+}
+_MOVED_HOLIDAYS: Dict[int, Dict[str, Tuple[int, int]]] = {
+    2020: {'海の日': (7, 23), 'スポーツの日': (7, 24), '山の日': (8, 10)},
+    2021: {'海の日': (7, 22), 'スポーツの日': (7, 23), '山の日': (8, 8)},
+}
+
+
+def _nth_monday(year: int, month: int, n: int) -> date:
+    """その月の第n月曜日"""
+    first = date(year, month, 1)
+    offset = (0 - first.weekday()) % 7
+    return first + timedelta(days=offset + 7 * (n - 1))
+
+
+def _equinox_day(year: int, base: float) -> int:
+    """春分・秋分の日（1980〜2099年の近似式）"""
+    return int(base + 0.242194 * (year - 1980) - (year - 1980) // 4)
+
+
+def _base_holidays(year: int) -> Dict[date, str]:
+    """振替休日・国民の休日を除く祝日"""
+    moved = _MOVED_HOLIDAYS.get(year, {})
+
+    def _day(name: str, default: date) -> date:
+        if name in moved:
+            return date(year, *moved[name])
+        return default
+
+    holidays: Dict[date, str] = {
+        date(year, 1, 1): '元日',
+        _nth_monday(year, 1, 2): '成人の日',
+        date(year, 2, 11): '建国記念の日',
+        date(year, 3, _equinox_day(year, 20.8431)): '春分の日',
+        date(year, 4, 29): '昭和の日' if year >= 2007 else 'みどりの日',
+        date(year, 5, 3): '憲法記念日',
+        date(year, 5, 5): 'こどもの日',
+        # 海の日・敬老の日は2002年まで固定日（2003年から第3月曜日）
+        _day('海の日', _nth_monday(year, 7, 3) if year >= 2003 else date(year, 7, 20)): '海の日',
+        (_nth_monday(year, 9, 3) if year >= 2003 else date(year, 9, 15)): '敬老の日',
+        date(year, 9, _equinox_day(year, 23.2488)): '秋分の日',
+        _day('スポーツの日', _nth_monday(year, 10, 2)): 'スポーツの日' if year >= 2020 else '体育の日',
+        date(year, 11, 3): '文化の日',
+        date(year, 11, 23): '勤労感謝の日',
+    }
+    if year >= 2007:
+        holidays[date(year, 5, 4)] = 'みどりの日'
+    if year >= 2016:
+        holidays[_day('山の日', date(year, 8, 11))] = '山の日'
+    if year >= 2020:
+        holidays[date(year, 2, 23)] = '天皇誕生日'
+    elif year <= 2018:
+        holidays[date(year, 12, 23)] = '天皇誕生日'
+    for (month, day), name in _SPECIAL_HOLIDAYS.get(year, {}).items():
+        holidays[date(year, month, day)] = name
+    return holidays
+
+
+@lru_cache(maxsize=None)
+def japanese_holidays(year: int) -> Dict[date, str]:
+    """
+    指定年の祝日（日付 → 名称）
+
+    振替休日（日曜と重なった祝日の後の最初の平日）と
+    国民の休日（祝日に挟まれた平日）を含む。
+    """
+    holidays = _base_holidays(year)
+
+    # 振替休日
+    for day in sorted(holidays):
+        if day.weekday() == 6:
+            substitute = day + timedelta(days=1)
+            while substitute in holidays:
+                substitute += timedelta(days=1)
+            holidays[substitute] = '振替休日'
+
+    # 国民の休日（前後が祝日の平日）
+    for day in sorted(holidays):
+        between = day + timedelta(days=1)
+        if (between not in holidays and between.weekday() != 6
+                and between + timedelta(days=1) in holidays):
+            holidays[between] = '国民の休日'
+
+    return dict(sorted(holidays.items()))
+
+
+@lru_cache(maxsize=1)
+def _holiday_array() -> np.ndarray:
+    """事前計算範囲の祝日（昇順の datetime64[D] 配列）"""
+    days = [
+        day
+        for year in range(CALENDAR_FIRST_YEAR, CALENDAR_LAST_YEAR + 1)
+        for day in japanese_holidays(year)
+    ]
+    return np.array(days, dtype='datetime64[D]')
+
+
+def is_public_holiday(dates: np.ndarray) -> np.ndarray:
+    """日付配列（datetime64[D]、NaT可）の各要素が祝日かどうか"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    holidays = _holiday_array()
+    valid = ~np.isnat(dates)
+    positions = np.searchsorted(holidays, dates)
+    found = np.zeros(len(dates), dtype=bool)
+    in_range = valid & (positions < len(holidays))
+    found[in_range] = holidays[positions[in_range]] == dates[in_range]
+
+    # 事前計算範囲外の日付は年ごとに計算
+    years = dates[valid].astype('datetime64[Y]').astype(int) + 1970
+    outside = np.unique(years[(years < CALENDAR_FIRST_YEAR) | (years > CALENDAR_LAST_YEAR)])
+    for year in outside:
+        extra = np.array(list(japanese_holidays(int(year))), dtype='datetime64[D]')
+        found |= valid & np.isin(dates, extra)
+    return found
+
+
+def weekdays(dates: np.ndarray) -> np.ndarray:
+    """日付配列の曜日（月=0 … 日=6、NaT は -1）"""
+    dates = np.asarray(dates, dtype='datetime64[D]')
+    # 1970-01-01 は木曜日（=3）
+    result = ((dates.astype('int64') + 3) % 7).astype(np.int8)
+    result[np.isnat(dates)] = -1
+    return result
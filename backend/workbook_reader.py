@@ -0,0 +1,126 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+ワークブックの読み込み（PDF変換・検証用）
+ファイルを1回だけ読み込み、検証・描画・計算結果の参照で同じ内容を使い回す。
+
+- 値だけが必要な処理（検証・Excelで保存された計算結果の参照）は読み取り専用モードで行を順に読む
+  （全セルのオブジェクトを作らない）
+- 描画には列幅・行高・結合セル・印刷設定が必要で、これらは読み取り専用モードでは得られないため
+  通常モードで1回だけ解析し、検証もその解析結果で行う
+"""
+
+import io
+import os
+from typing import Dict, Any, Iterator, List, Optional, Tuple
+
+# openpyxl が無い環境でも import できるようにする（読み込みの可否は呼び出し側で判定）
+try:
+    import openpyxl
+    OPENPYXL_AVAILABLE = True
+except ImportError:
+    OPENPYXL_AVAILABLE = False
+
+
+# 読み込み可能な最大ファイルサイズ
+MAX_FILE_SIZE = 100 * 1024 * 1024
+
+
+class WorkbookSource:
+    """
+    1ファイル分の読み込み（with 文で使える）
+
+    ファイル内容はメモリ上に1回だけ読み込み、各モードの解析はそこから行う。
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._data: Optional[bytes] = None
+        self._workbook = None
+
+    def __enter__(self) -> 'WorkbookSource':
+        return self
+
+    def __exit__(self, exc_type, exc, tb) -> None:
+        self.close()
+
+    def check(self) -> Tuple[bool, str]:
+        """ファイルの存在・権限・サイズを確認"""
+        if not os.path.exists(self.path):
+            return False, "ファイルが見つかりません"
+        if not os.access(self.path, os.R_OK):
+            return False, "ファイルの読み取り権限がありません"
+        file_size = os.path.getsize(self.path)
+        if file_size == 0:
+            return False, "ファイルが空です"
+        if file_size > MAX_FILE_SIZE:
+            return False, "ファイルサイズが大きすぎます (100MB以上)"
+        return True, "OK"
+
+    def _buffer(self) -> io.BytesIO:
+        if self._data is None:
+            with open(self.path, 'rb') as f:
+                self._data = f.read()
+        return io.BytesIO(self._data)
+
+    @property
+    def workbook(self):
+        """描画用のワークブック（数式のまま・通常モード。初回のみ解析）"""
+        if self._workbook is None:
+            self._workbook = openpyxl.load_workbook(self._buffer())
+        return self._workbook
+
+    def validate(self) -> Tuple[bool, str]:
+        """
+        ファイルとして読み込めるかを検証（解析結果は描画でそのまま使う）
+
+        Returns:
+            (成功/失敗, エラーメッセージ)
+        """
+        ok, message = self.check()
+        if not ok:
+            return ok, message
+        try:
+            if not self.workbook.sheetnames:
+                return False, "シートが見つかりません"
+        except Exception as e:
+            return False, f"Excelファイルの読み込みエラー: {str(e)}"
+        return True, "OK"
+
+    def iter_values(self, sheet_name: str, data_only: bool = True,
+                    max_row: Optional[int] = None) -> Iterator[Tuple[Any, ...]]:
+        """シートの値を1行ずつ読む（読み取り専用モード）"""
+        workbook = openpyxl.load_workbook(self._buffer(), read_only=True, data_only=data_only)
+        try:
+            yield from workbook[sheet_name].iter_rows(max_row=max_row, values_only=True)
+        finally:
+            workbook.close()
+
+    def cached_values(self, sheet_name: str, cells: List[Tuple[int, int]]) -> Dict[Tuple[int, int], Any]:
+        """
+        Excelで保存された計算結果を取得（読み取り専用モードで必要な行まで読む）
+
+        Args:
+            sheet_name: シート名
+            cells: (行, 列) のリスト
+
+        Returns:
+            {(行, 列): 値}
+        """
+        if not cells:
+            return {}
+        wanted: Dict[int, List[int]] = {}
+        for row, column in cells:
+            wanted.setdefault(row, []).append(column)
+        values: Dict[Tuple[int, int], Any] = {(row, column): None for row, column in cells}
+        for row, row_values in enumerate(self.iter_values(sheet_name, max_row=max(wanted)), 1):
+            for column in wanted.get(row, ()):
+                if column <= len(row_values):
+                    values[(row, column)] = row_values[column - 1]
+        return values
+
+    def close(self) -> None:
+        if self._workbook is not None:
+            self._workbook.close()
+            self._workbook = None
+        self._data = None
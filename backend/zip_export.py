@@ -0,0 +1,162 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+"""
+出力のZIPエクスポート（引き渡し用）
+バッチ・PDF変換で生成したワークブック・PDF・集計ファイルを、できた順に1つのZIPへ書き込む。
+ファイルはコピーを作らずに元の出力から少しずつ読んで書き込むため、処理が終わった時点で
+ZIPも完成しており、引き渡しのために出力をもう一度すべて読み直す必要がない。
+
+- 圧縮はファイルの種類ごとに選ぶ（PDF・xlsx は圧縮済みのため無圧縮で格納、CSV等は deflate）
+- ZIP内のパスは基準フォルダからの相対パス（年月フォルダ・PDFフォルダの構成を保つ）
+- 書き込み中は同じフォルダの一時ファイルに書き、完成後に名前を変えて確定する
+"""
+
+import os
+import threading
+import zipfile
+from typing import Dict, Any, Iterable, List, Optional, Tuple
+
+from file_output import commit_file, discard, temp_path_for
+from progress import ProgressCallback
+
+
+# 拡張子 → (圧縮方式, 圧縮レベル)
+_COMPRESSION: Dict[str, Tuple[int, Optional[int]]] = {
+    '.pdf': (zipfile.ZIP_STORED, None),    # ページは作成時に圧縮済み
+    '.xlsx': (zipfile.ZIP_STORED, None),   # xlsx 自体がZIP（deflate済み）
+    '.xlsm': (zipfile.ZIP_STORED, None),
+    '.csv': (zipfile.ZIP_DEFLATED, 9),     # 小さく圧縮がよく効くテキスト
+    '.json': (zipfile.ZIP_DEFLATED, 9),
+}
+_DEFAULT_COMPRESSION: Tuple[int, Optional[int]] = (zipfile.ZIP_DEFLATED, 6)
+
+
+def default_export_path(base_dir: str) -> str:
+    """基準フォルダの引き渡し用ZIPのパス（<フォルダ>/<フォルダ名>.zip）"""
+    base_dir = os.path.normpath(os.path.abspath(base_dir))
+    return os.path.join(base_dir, f"{os.path.basename(base_dir)}.zip")
+
+
+def compression_for(path: str) -> Tuple[int, Optional[int]]:
+    """ファイルの種類に応じた圧縮方式と圧縮レベル"""
+    return _COMPRESSION.get(os.path.splitext(path)[1].lower(), _DEFAULT_COMPRESSION)
+
+
+class ZipExporter:
+    """
+    出力ファイルを順にZIPへ書き込む（複数スレッドから add を呼び出し可能）
+
+    Args:
+        zip_path: 出力するZIPのパス
+        base_dir: ZIP内のパスの基準フォルダ（このフォルダ外のファイルはファイル名のみで格納）
+
+    使用例:
+        exporter = ZipExporter(zip_path, base_dir)
+        for path in outputs:
+            exporter.add(path)
+        result = exporter.close()
+    """
+
+    def __init__(self, zip_path: str, base_dir: str):
+        self.zip_path = os.path.abspath(zip_path)
+        self.base_dir = os.path.abspath(base_dir)
+        self._lock = threading.Lock()
+        self._temp_path: Optional[str] = temp_path_for(self.zip_path)
+        self._zip: Optional[zipfile.ZipFile] = zipfile.ZipFile(self._temp_path, 'x', allowZip64=True)
+        self._names: set = set()
+        self.entries: List[Dict[str, Any]] = []
+        self.failed_files: List[Dict[str, str]] = []
+
+    def _arcname(self, path: str) -> str:
+        relative = os.path.relpath(path, self.base_dir)
+        if relative.startswith(os.pardir) or os.path.isabs(relative):
+            relative = os.path.basename(path)
+        return relative.replace(os.sep, '/')
+
+    def add(self, path: Optional[str]) -> bool:
+        """
+        ファイルを1件追加（同じパスの2回目以降・ZIP自身は追加しない）
+
+        Returns:
+            追加した場合は True（読み込みに失敗した場合は failed_files に記録して False）
+        """
+        if not path:
+            return False
+        path = os.path.abspath(path)
+        if path == self.zip_path:
+            return False
+        arcname = self._arcname(path)
+        compress_type, compress_level = compression_for(path)
+        with self._lock:
+            if self._zip is None or arcname in self._names:
+                return False
+            try:
+                # ZipFile.write はファイルを少しずつ読んで書き込む（全体をメモリに載せない）
+                self._zip.write(path, arcname, compress_type=compress_type, compresslevel=compress_level)
+            except OSError as e:
+                self.failed_files.append({'file': path, 'error': f"ZIP追加エラー: {str(e)}"})
+                return False
+            info = self._zip.getinfo(arcname)
+            self._names.add(arcname)
+            self.entries.append({'name': arcname, 'size': info.file_size, 'compressed_size': info.compress_size})
+        return True
+
+    def add_all(self, paths: Iterable[Optional[str]]) -> int:
+        """複数のファイルを追加し、追加した件数を返す"""
+        return sum(1 for path in paths if self.add(path))
+
+    def close(self) -> Dict[str, Any]:
+        """
+        ZIPを完成させて確定
+
+        Returns:
+            結果辞書（zip_file, entry_count, total_bytes, zip_bytes, failed_files）
+        """
+        with self._lock:
+            if self._zip is None:
+                return {'success': False, 'error': 'ZIPエクスポートは既に終了しています'}
+            zip_file, temp_path = self._zip, self._temp_path
+            self._zip = self._temp_path = None
+            try:
+                zip_file.close()
+            except BaseException:
+                discard(temp_path)
+                raise
+            commit_file(temp_path, self.zip_path)
+        return {
+            'success': True,
+            'zip_file': self.zip_path,
+            'zip_name': os.path.basename(self.zip_path),
+            'entry_count': len(self.entries),
+            'total_bytes': sum(entry['size'] for entry in self.entries),
+            'zip_bytes': os.path.getsize(self.zip_path),
+            'failed_files': self.failed_files
+        }
+
+    def abort(self) -> None:
+        """書き込みを中止して途中のZIPを残さない"""
+        with self._lock:
+            zip_file, temp_path = self._zip, self._temp_path
+            self._zip = self._temp_path = None
+        if zip_file is not None:
+            try:
+                zip_file.close()
+            except Exception:
+                pass
+        discard(temp_path)
+
+
+def exporting_callback(exporter: ZipExporter,
+                       progress_callback: Optional[ProgressCallback] = None) -> ProgressCallback:
+    """
+    PDF変換の進捗コールバックを包み、変換できたPDFをその都度ZIPへ追加する
+
+    変換ループの各ファイルの完了通知（item / status=converted）を利用するため、
+    変換処理の側を変更せずに出力と同時にZIPへ書き込める。
+    """
+    def _callback(event: str, payload: Dict[str, Any]) -> None:
+        if event == 'item' and payload.get('status') == 'converted':
+            exporter.add(payload.get('pdf_file'))
+        if progress_callback is not None:
+            progress_callback(event, payload)
+    return _callback